@@ -65,6 +65,9 @@ def do_run_migrations(connection):
         render_as_batch=False,
         version_table="alembic_version",
         version_table_schema="public",
+        # one transaction per revision so revisions using autocommit_block()
+        # (e.g. CREATE INDEX CONCURRENTLY) only commit their own work
+        transaction_per_migration=True,
     )
     with context.begin_transaction():
         context.run_migrations()
@@ -82,10 +85,10 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 async def run_migrations_online() -> None:
-    """Online mode: begin a real transaction, ensure version table exists, then migrate."""
+    """Online mode: ensure version table exists, then migrate with a transaction per revision."""
     engine = create_async_engine(db_url, poolclass=pool.NullPool, future=True)
     try:
-        async with engine.begin() as conn:
+        async with engine.connect() as conn:
             # helpful debug
             row = await conn.exec_driver_sql(
                 "select current_database(), current_user, current_schema(), current_schemas(true)"
@@ -102,8 +105,11 @@ async def run_migrations_online() -> None:
                     version_num VARCHAR(32) NOT NULL PRIMARY KEY
                 )
             """)
+            # hand Alembic a connection outside any transaction so it owns the transaction boundaries
+            await conn.commit()
 
             await conn.run_sync(do_run_migrations)
+            await conn.commit()
     finally:
         await engine.dispose()
 
@@ -0,0 +1,117 @@
+"""add fact and dimension indexes
+
+Revision ID: 9e9050edb706
+Revises: 3a45236cd916
+Create Date: 2026-10-19 14:05:12.481203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e9050edb706'
+down_revision: Union[str, None] = '3a45236cd916'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns, extra create_index kwargs)
+INDEXES = [
+    # Foreign keys on the per-driver dimension tables
+    ('ix_dim_contact_driver_id', 'dim_contact', ['driver_id'], {}),
+    ('ix_dim_medical_driver_id', 'dim_medical', ['driver_id'], {}),
+    ('ix_dim_settings_driver_id', 'dim_settings', ['driver_id'], {}),
+    ('ix_dim_notification_driver_id', 'dim_notification', ['driver_id'], {}),
+    ('ix_dim_privacy_driver_id', 'dim_privacy', ['driver_id'], {}),
+    ('ix_dim_emergency_driver_id', 'dim_emergency', ['driver_id'], {}),
+    ('ix_dim_emergency_emergency_country_code', 'dim_emergency', ['emergency_country_code'], {}),
+    # Natural key of the time dimension
+    ('uq_dim_time_date_value_hour', 'dim_time', ['date_value', 'hour'], {'unique': True}),
+    # fact_sos
+    ('ix_fact_sos_driver_id', 'fact_sos', ['driver_id'], {}),
+    ('ix_fact_sos_vehicle_id', 'fact_sos', ['vehicle_id'], {}),
+    ('ix_fact_sos_time_id', 'fact_sos', ['time_id'], {}),
+    ('ix_fact_sos_location_id', 'fact_sos', ['location_id'], {}),
+    ('ix_fact_sos_unresolved', 'fact_sos', ['time_id'],
+     {'postgresql_where': sa.text('resolved = false')}),
+    # fact_trip (driver_id is the leading column of the history index)
+    ('ix_fact_trip_vehicle_id', 'fact_trip', ['vehicle_id'], {}),
+    ('ix_fact_trip_time_id', 'fact_trip', ['time_id'], {}),
+    ('ix_fact_trip_driver_history', 'fact_trip', ['driver_id', 'time_id'],
+     {'postgresql_include': ['trip_id', 'distance_km', 'eco_score', 'safety_score']}),
+    # fact_gamification (driver_id is the leading column of driver_time)
+    ('ix_fact_gamification_badge_id', 'fact_gamification', ['badge_id'], {}),
+    ('ix_fact_gamification_leaderboard', 'fact_gamification', ['time_id'],
+     {'postgresql_include': ['driver_id', 'score_change']}),
+    ('ix_fact_gamification_driver_time', 'fact_gamification', ['driver_id', 'time_id'], {}),
+    # fact_security
+    ('ix_fact_security_time_id', 'fact_security', ['time_id'], {}),
+]
+
+FACT_TABLES_WITH_TIME = ['fact_trip', 'fact_sos', 'fact_gamification', 'fact_security']
+
+
+def _dedupe_dim_time() -> None:
+    """
+    Collapse duplicate (date_value, hour) rows so the unique index can be built.
+
+    The services used to race on get-or-create of the time row, so facts may
+    point at duplicates; they are re-pointed to the lowest time_id first.
+    """
+    op.execute("""
+        CREATE TEMP TABLE _dim_time_dupes ON COMMIT DROP AS
+        SELECT time_id,
+               min(time_id) OVER (PARTITION BY date_value, hour) AS keep_id
+        FROM dim_time
+    """)
+    op.execute("DELETE FROM _dim_time_dupes WHERE time_id = keep_id")
+    for table in FACT_TABLES_WITH_TIME:
+        op.execute(f"""
+            UPDATE {table} f SET time_id = d.keep_id
+            FROM _dim_time_dupes d
+            WHERE f.time_id = d.time_id
+        """)
+    op.execute("DELETE FROM dim_time t USING _dim_time_dupes d WHERE t.time_id = d.time_id")
+
+
+def upgrade() -> None:
+    _dedupe_dim_time()
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            # A failed concurrent build leaves an INVALID index behind; drop it so a re-run rebuilds it
+            op.execute(f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = '{name}' AND NOT i.indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {name}';
+                    END IF;
+                END $$
+            """)
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _kwargs in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,47 @@
+"""add sos_notification delivery log
+
+Revision ID: a8c3e6f1d295
+Revises: f5a9d2c7b314
+Create Date: 2026-10-19 20:14:09.552861
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c3e6f1d295'
+down_revision: Union[str, None] = 'f5a9d2c7b314'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sos_notification',
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('sos_id', sa.Integer(), nullable=False),
+        sa.Column('contact_id', sa.Integer(), nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('notification_id'),
+    )
+    op.create_index('ix_sos_notification_sos_id', 'sos_notification', ['sos_id'])
+    op.create_index(
+        'ix_sos_notification_undelivered', 'sos_notification', ['created_at'],
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sos_notification_undelivered', table_name='sos_notification')
+    op.drop_index('ix_sos_notification_sos_id', table_name='sos_notification')
+    op.drop_table('sos_notification')
@@ -0,0 +1,90 @@
+"""add sync change_xid
+
+Revision ID: a9d4e7b2c518
+Revises: f3c8a1d6e247
+Create Date: 2026-10-20 10:02:51.664093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e7b2c518'
+down_revision: Union[str, None] = 'f3c8a1d6e247'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PARTITIONED_TABLES = ['fact_trip', 'fact_gamification']
+TABLES = PARTITIONED_TABLES + ['sync_tombstone']
+
+# Writer's 64-bit transaction id; the sync feed pages by (change_xid, change_seq)
+# and only past the oldest running transaction, so late commits are never skipped
+CURRENT_XID = "(pg_current_xact_id()::text::bigint)"
+
+BUMP_CHANGE_SEQ_FN = f"""
+CREATE OR REPLACE FUNCTION bump_change_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_seq := nextval('fact_change_seq');
+    NEW.change_xid := {CURRENT_XID};
+    RETURN NEW;
+END
+$$;
+"""
+
+OLD_BUMP_CHANGE_SEQ_FN = """
+CREATE OR REPLACE FUNCTION bump_change_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_seq := nextval('fact_change_seq');
+    RETURN NEW;
+END
+$$;
+"""
+
+
+def _partitions(table: str):
+    return op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+        ORDER BY c.relname
+    """), {"parent": table}).scalars().all()
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # Constant default: existing rows read 1 (older than any transaction) without a
+        # table rewrite; rows written from now on get their transaction's id
+        op.execute(f"ALTER TABLE {table} ADD COLUMN change_xid bigint NOT NULL DEFAULT 1")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN change_xid SET DEFAULT {CURRENT_XID}")
+    op.execute(BUMP_CHANGE_SEQ_FN)
+
+    for table in PARTITIONED_TABLES:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_driver_change_xid ON ONLY {table} (driver_id, change_xid, change_seq)"
+        )
+        for partition in _partitions(table):
+            with op.get_context().autocommit_block():
+                op.execute(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_driver_change_xid_idx
+                    ON {partition} (driver_id, change_xid, change_seq)
+                """)
+            op.execute(f"ALTER INDEX ix_{table}_driver_change_xid ATTACH PARTITION {partition}_driver_change_xid_idx")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_driver_change_seq")
+    op.create_index('ix_sync_tombstone_driver_change_xid', 'sync_tombstone', ['driver_id', 'change_xid', 'change_seq'])
+    op.drop_index('ix_sync_tombstone_driver_change_seq', table_name='sync_tombstone')
+
+
+def downgrade() -> None:
+    op.create_index('ix_sync_tombstone_driver_change_seq', 'sync_tombstone', ['driver_id', 'change_seq'])
+    op.drop_index('ix_sync_tombstone_driver_change_xid', table_name='sync_tombstone')
+    for table in PARTITIONED_TABLES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_driver_change_seq ON {table} (driver_id, change_seq)")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_driver_change_xid")
+    op.execute(OLD_BUMP_CHANGE_SEQ_FN)
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} DROP COLUMN change_xid")
@@ -0,0 +1,226 @@
+"""partition fact_trip and fact_gamification by month
+
+Revision ID: b2a9fbd6cdfe
+Revises: 9e9050edb706
+Create Date: 2026-10-19 15:21:47.902114
+
+"""
+import os
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2a9fbd6cdfe'
+down_revision: Union[str, None] = '9e9050edb706'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Rows copied per autocommitted INSERT ... SELECT while converting existing data
+BATCH_SIZE = int(os.getenv("PARTITION_MIGRATION_BATCH_SIZE", "50000"))
+# Months of empty partitions created ahead of "now"; PartitionService keeps this topped up
+PREMAKE_MONTHS = 3
+
+# event_ts is derived from the time dimension for rows written before this revision
+EVENT_TS_FROM_DIM_TIME = "t.date_value + make_interval(hours => t.hour)"
+
+TABLES = {
+    'fact_trip': {
+        'pk': 'trip_id',
+        'ddl': """
+            driver_id integer NOT NULL REFERENCES dim_driver (driver_id),
+            vehicle_id integer NOT NULL REFERENCES dim_vehicle (vehicle_id),
+            time_id integer NOT NULL REFERENCES dim_time (time_id),
+            distance_km double precision,
+            avg_speed double precision,
+            harsh_events integer,
+            eco_score double precision,
+            safety_score double precision,
+            trip_duration_sec integer,
+            max_speed double precision
+        """,
+        'columns': [
+            'driver_id', 'vehicle_id', 'time_id', 'distance_km', 'avg_speed', 'harsh_events',
+            'eco_score', 'safety_score', 'trip_duration_sec', 'max_speed',
+        ],
+        # (name, columns, include) built on the partitioned parent
+        'indexes': [
+            ('ix_fact_trip_driver_history', 'driver_id, event_ts',
+             'trip_id, distance_km, eco_score, safety_score'),
+            ('ix_fact_trip_vehicle_id', 'vehicle_id', None),
+            ('ix_fact_trip_time_id', 'time_id', None),
+        ],
+        # indexes of the unpartitioned table (revision 9e9050edb706), restored on downgrade
+        'legacy_indexes': [
+            ('ix_fact_trip_driver_history', 'driver_id, time_id',
+             'trip_id, distance_km, eco_score, safety_score'),
+            ('ix_fact_trip_vehicle_id', 'vehicle_id', None),
+            ('ix_fact_trip_time_id', 'time_id', None),
+        ],
+    },
+    'fact_gamification': {
+        'pk': 'gamelog_id',
+        'ddl': """
+            driver_id integer NOT NULL REFERENCES dim_driver (driver_id),
+            time_id integer NOT NULL REFERENCES dim_time (time_id),
+            badge_id integer REFERENCES dim_badge (badge_id),
+            score_change integer,
+            streak_days integer
+        """,
+        'columns': ['driver_id', 'time_id', 'badge_id', 'score_change', 'streak_days'],
+        'indexes': [
+            ('ix_fact_gamification_leaderboard', 'event_ts', 'driver_id, score_change'),
+            ('ix_fact_gamification_driver_time', 'driver_id, event_ts', None),
+            ('ix_fact_gamification_time_id', 'time_id', None),
+            ('ix_fact_gamification_badge_id', 'badge_id', None),
+        ],
+        'legacy_indexes': [
+            ('ix_fact_gamification_leaderboard', 'time_id', 'driver_id, score_change'),
+            ('ix_fact_gamification_driver_time', 'driver_id, time_id', None),
+            ('ix_fact_gamification_badge_id', 'badge_id', None),
+        ],
+    },
+}
+
+
+ENSURE_PARTITION_FN = """
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent text, prefix text, month_start date)
+RETURNS text AS $$
+DECLARE
+    part text := format('%s_y%sm%s', prefix, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        part, parent, month_start, (month_start + interval '1 month')::date
+    );
+    RETURN part;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _index_sql(name: str, table: str, columns: str, include: Union[str, None]) -> str:
+    include_sql = f" INCLUDE ({include})" if include else ""
+    return f"CREATE INDEX {name} ON {table} ({columns}){include_sql}"
+
+
+def _month_starts(first: date, last: date):
+    current = first.replace(day=1)
+    while current <= last:
+        yield current
+        current = date(current.year + (current.month // 12), current.month % 12 + 1, 1)
+
+
+def _create_partitioned_copy(table: str, spec: dict) -> None:
+    """Create <table>_p partitioned by event_ts with partitions covering existing data and the near future."""
+    bind = op.get_bind()
+    pk = spec['pk']
+    new = f"{table}_p"
+
+    op.execute(f"""
+        CREATE TABLE {new} (
+            {pk} integer NOT NULL DEFAULT nextval('{table}_{pk}_seq'),
+            event_ts timestamp without time zone NOT NULL,
+            {spec['ddl']},
+            CONSTRAINT {new}_pkey PRIMARY KEY ({pk}, event_ts)
+        ) PARTITION BY RANGE (event_ts)
+    """)
+
+    oldest = bind.execute(sa.text(f"""
+        SELECT min(t.date_value) FROM {table} f JOIN dim_time t ON t.time_id = f.time_id
+    """)).scalar()
+    today = datetime.utcnow().date()
+    last = date(today.year + (today.month + PREMAKE_MONTHS - 1) // 12,
+                (today.month + PREMAKE_MONTHS - 1) % 12 + 1, 1)
+    for month_start in _month_starts(oldest or today, last):
+        bind.execute(
+            sa.text("SELECT ensure_monthly_partition(:parent, :prefix, :month_start)"),
+            {"parent": new, "prefix": table, "month_start": month_start},
+        )
+    # Catches clock-skewed or far-future client timestamps instead of failing the insert
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {new} DEFAULT")
+
+    # Built before the load under temporary names; renamed once the old table is gone
+    for name, columns, include in spec['indexes']:
+        op.execute(_index_sql(f"{name}_p", new, columns, include))
+
+
+def _copy_sql(table: str, spec: dict, lower: int, upper: Union[int, None]) -> str:
+    pk = spec['pk']
+    columns = ", ".join(spec['columns'])
+    selected = ", ".join(f"f.{c}" for c in spec['columns'])
+    upper_sql = f" AND f.{pk} <= {upper}" if upper is not None else ""
+    return f"""
+        INSERT INTO {table}_p ({pk}, event_ts, {columns})
+        SELECT f.{pk}, {EVENT_TS_FROM_DIM_TIME}, {selected}
+        FROM {table} f JOIN dim_time t ON t.time_id = f.time_id
+        WHERE f.{pk} > {lower}{upper_sql}
+    """
+
+
+def _swap_in(table: str, spec: dict, copied_up_to: int) -> None:
+    """Copy rows written during the batched load, then replace the old table."""
+    pk = spec['pk']
+    new = f"{table}_p"
+    op.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+    op.execute(_copy_sql(table, spec, copied_up_to, None))
+    op.execute(f"ALTER SEQUENCE {table}_{pk}_seq OWNED BY NONE")
+    op.execute(f"DROP TABLE {table}")
+    op.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {new}_pkey TO {table}_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_{pk}_seq OWNED BY {table}.{pk}")
+    for name, _columns, _include in spec['indexes']:
+        op.execute(f"ALTER INDEX {name}_p RENAME TO {name}")
+
+
+def upgrade() -> None:
+    op.execute(ENSURE_PARTITION_FN)
+    bind = op.get_bind()
+
+    for table, spec in TABLES.items():
+        pk = spec['pk']
+        _create_partitioned_copy(table, spec)
+        max_id = bind.execute(sa.text(f"SELECT coalesce(max({pk}), 0) FROM {table}")).scalar()
+
+        # Each batch commits on its own so the load never holds one huge transaction
+        with op.get_context().autocommit_block():
+            for lower in range(0, max_id, BATCH_SIZE):
+                op.execute(_copy_sql(table, spec, lower, min(lower + BATCH_SIZE, max_id)))
+
+        _swap_in(table, spec, max_id)
+
+
+def downgrade() -> None:
+    for table, spec in TABLES.items():
+        pk = spec['pk']
+        old = f"{table}_unpartitioned"
+        columns = ", ".join(spec['columns'])
+        op.execute(f"""
+            CREATE TABLE {old} (
+                {pk} integer NOT NULL DEFAULT nextval('{table}_{pk}_seq'),
+                {spec['ddl']},
+                CONSTRAINT {old}_pkey PRIMARY KEY ({pk})
+            )
+        """)
+        op.execute(f"""
+            INSERT INTO {old} ({pk}, {columns})
+            SELECT {pk}, {columns} FROM {table}
+        """)
+        op.execute(f"ALTER SEQUENCE {table}_{pk}_seq OWNED BY NONE")
+        # Partitions detached by PartitionService are standalone tables and are left alone
+        op.execute(f"DROP TABLE {table}")
+        op.execute(f"ALTER TABLE {old} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {old}_pkey TO {table}_pkey")
+        op.execute(f"ALTER SEQUENCE {table}_{pk}_seq OWNED BY {table}.{pk}")
+        for name, columns_sql, include in spec['legacy_indexes']:
+            op.execute(_index_sql(name, table, columns_sql, include))
+
+    op.execute("DROP FUNCTION IF EXISTS ensure_monthly_partition(text, text, date)")
@@ -0,0 +1,33 @@
+"""add trip_route
+
+Revision ID: b4e9f2a6c813
+Revises: e1f7a3c9b802
+Create Date: 2026-10-19 23:12:40.106527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e9f2a6c813'
+down_revision: Union[str, None] = 'e1f7a3c9b802'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trip_route',
+        sa.Column('trip_id', sa.Integer(), nullable=False),
+        sa.Column('zoom', sa.Integer(), nullable=False),
+        sa.Column('point_count', sa.Integer(), nullable=False),
+        sa.Column('polyline', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('trip_id', 'zoom'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('trip_route')
@@ -0,0 +1,60 @@
+"""add driver config versions
+
+Revision ID: c4e1a7d93b20
+Revises: b2a9fbd6cdfe
+Create Date: 2026-10-19 16:20:41.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a7d93b20'
+down_revision: Union[str, None] = 'b2a9fbd6cdfe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Per-driver device configuration sections served as one bundle by /drivers/{id}/config
+CONFIG_TABLES = ['dim_settings', 'dim_notification', 'dim_privacy', 'dim_emergency']
+
+# One sequence shared by all sections, so a driver's bundle version (the max
+# over its sections) only ever grows, whichever section changed
+SEQUENCE = 'driver_config_version_seq'
+
+BUMP_VERSION_FN = f"""
+CREATE OR REPLACE FUNCTION bump_config_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.config_version := nextval('{SEQUENCE}');
+    RETURN NEW;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}")
+    op.execute(BUMP_VERSION_FN)
+    for table in CONFIG_TABLES:
+        op.add_column(table, sa.Column(
+            'config_version', sa.BigInteger(), nullable=False,
+            server_default=sa.text(f"nextval('{SEQUENCE}')"),
+        ))
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_config_version
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION bump_config_version()
+        """)
+
+
+def downgrade() -> None:
+    for table in CONFIG_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_config_version ON {table}")
+        op.drop_column(table, 'config_version')
+    op.execute("DROP FUNCTION IF EXISTS bump_config_version()")
+    op.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
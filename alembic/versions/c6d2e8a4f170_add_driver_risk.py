@@ -0,0 +1,67 @@
+"""add driver_risk
+
+Revision ID: c6d2e8a4f170
+Revises: a8c3e6f1d295
+Create Date: 2026-10-19 21:14:52.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d2e8a4f170'
+down_revision: Union[str, None] = 'a8c3e6f1d295'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Counters only; scores are filled in by `python -m app.services.risk_service`
+# or the nightly risk_rescore job. Speeding above 120 km/h, night 22:00-05:00.
+POPULATE_COUNTERS = """
+INSERT INTO driver_risk (driver_id, trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count, updated_at)
+SELECT d.driver_id,
+       coalesce(t.trips, 0), coalesce(t.distance_km, 0), coalesce(t.harsh_events, 0),
+       coalesce(t.speeding_trips, 0), coalesce(t.night_trips, 0), coalesce(s.sos_count, 0),
+       now() AT TIME ZONE 'utc'
+FROM dim_driver d
+LEFT JOIN (
+    SELECT t.driver_id,
+           count(*) AS trips,
+           sum(coalesce(t.distance_km, 0)) AS distance_km,
+           sum(coalesce(t.harsh_events, 0)) AS harsh_events,
+           count(*) FILTER (WHERE t.max_speed > 120) AS speeding_trips,
+           count(*) FILTER (WHERE h.hour >= 22 OR h.hour < 5) AS night_trips
+    FROM fact_trip t
+    JOIN dim_time h ON h.time_id = t.time_id
+    GROUP BY t.driver_id
+) t ON t.driver_id = d.driver_id
+LEFT JOIN (SELECT driver_id, count(*) AS sos_count FROM fact_sos GROUP BY driver_id) s ON s.driver_id = d.driver_id
+WHERE t.driver_id IS NOT NULL OR s.driver_id IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'driver_risk',
+        sa.Column('driver_id', sa.Integer(), nullable=False),
+        sa.Column('trips', sa.Integer(), nullable=False),
+        sa.Column('distance_km', sa.Float(), nullable=False),
+        sa.Column('harsh_events', sa.Integer(), nullable=False),
+        sa.Column('speeding_trips', sa.Integer(), nullable=False),
+        sa.Column('night_trips', sa.Integer(), nullable=False),
+        sa.Column('sos_count', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['driver_id'], ['dim_driver.driver_id']),
+        sa.PrimaryKeyConstraint('driver_id'),
+    )
+    op.create_index('ix_driver_risk_score', 'driver_risk', ['score'])
+    op.execute(POPULATE_COUNTERS)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_driver_risk_score', table_name='driver_risk')
+    op.drop_table('driver_risk')
@@ -0,0 +1,84 @@
+"""move default-partition rows into new monthly partitions
+
+Revision ID: c8f2d4a7b915
+Revises: a9d4e7b2c518
+Create Date: 2026-10-20 14:37:05.218846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2d4a7b915'
+down_revision: Union[str, None] = 'a9d4e7b2c518'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Client timestamps beyond the premade months land in the DEFAULT partition
+# (revision b2a9fbd6cdfe). CREATE TABLE ... PARTITION OF then fails for their
+# month, so the partition is built standalone, the rows are moved in, and it
+# is attached; ATTACH re-checks the default partition under its lock.
+ENSURE_PARTITION_FN = """
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent text, prefix text, month_start date)
+RETURNS text AS $$
+DECLARE
+    part text := format('%s_y%sm%s', prefix, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+    month_end date := (month_start + interval '1 month')::date;
+    default_part text;
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT c.relname INTO default_part
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(parent) AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+    IF default_part IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            part, parent, month_start, month_end
+        );
+        RETURN part;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part, parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE event_ts >= %L AND event_ts < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        default_part, month_start, month_end, part
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        parent, part, month_start, month_end
+    );
+    RETURN part;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+OLD_ENSURE_PARTITION_FN = """
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent text, prefix text, month_start date)
+RETURNS text AS $$
+DECLARE
+    part text := format('%s_y%sm%s', prefix, to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        part, parent, month_start, (month_start + interval '1 month')::date
+    );
+    RETURN part;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.execute(ENSURE_PARTITION_FN)
+
+
+def downgrade() -> None:
+    op.execute(OLD_ENSURE_PARTITION_FN)
@@ -0,0 +1,34 @@
+"""add archive_batch
+
+Revision ID: d5b8e1f4a263
+Revises: c8f2d4a7b915
+Create Date: 2026-10-20 15:12:40.735118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b8e1f4a263'
+down_revision: Union[str, None] = 'c8f2d4a7b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'archive_batch',
+        sa.Column('batch_id', sa.Integer(), nullable=False),
+        sa.Column('table_name', sa.String(length=50), nullable=False),
+        sa.Column('record_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('batch_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('archive_batch')
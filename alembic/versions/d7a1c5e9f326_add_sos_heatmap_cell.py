@@ -0,0 +1,33 @@
+"""add sos_heatmap_cell
+
+Revision ID: d7a1c5e9f326
+Revises: b4e9f2a6c813
+Create Date: 2026-10-19 23:48:05.731942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a1c5e9f326'
+down_revision: Union[str, None] = 'b4e9f2a6c813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sos_heatmap_cell',
+        sa.Column('zoom', sa.Integer(), nullable=False),
+        sa.Column('x', sa.Integer(), nullable=False),
+        sa.Column('y', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('zoom', 'x', 'y'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sos_heatmap_cell')
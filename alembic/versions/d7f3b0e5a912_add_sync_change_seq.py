@@ -0,0 +1,111 @@
+"""add sync change sequence and tombstones
+
+Revision ID: d7f3b0e5a912
+Revises: c4e1a7d93b20
+Create Date: 2026-10-19 17:02:13.540917
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3b0e5a912'
+down_revision: Union[str, None] = 'c4e1a7d93b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Rows stamped per autocommitted UPDATE while backfilling existing data
+BATCH_SIZE = int(os.getenv("SYNC_MIGRATION_BATCH_SIZE", "50000"))
+
+# One sequence for inserts, updates and tombstones of every synced table, so
+# a single cursor orders all of a driver's changes
+SEQUENCE = 'fact_change_seq'
+
+# partitioned table -> primary key column
+TABLES = {
+    'fact_trip': 'trip_id',
+    'fact_gamification': 'gamelog_id',
+}
+
+BUMP_CHANGE_SEQ_FN = f"""
+CREATE OR REPLACE FUNCTION bump_change_seq() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_seq := nextval('{SEQUENCE}');
+    RETURN NEW;
+END
+$$;
+"""
+
+
+def _partitions(table: str):
+    return op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+        ORDER BY c.relname
+    """), {"parent": table}).scalars().all()
+
+
+def upgrade() -> None:
+    op.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}")
+    op.execute(BUMP_CHANGE_SEQ_FN)
+
+    for table, pk in TABLES.items():
+        # Nullable with a plain default: no table rewrite, new rows are stamped
+        # straight away and existing rows are backfilled below. Enforcing NOT
+        # NULL would need a full scan under an exclusive lock of every partition.
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), nullable=True))
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN change_seq SET DEFAULT nextval('{SEQUENCE}')")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_driver_change_seq ON ONLY {table} (driver_id, change_seq)")
+    op.create_table(
+        'sync_tombstone',
+        sa.Column('change_seq', sa.BigInteger(), server_default=sa.text(f"nextval('{SEQUENCE}')"), nullable=False),
+        sa.Column('table_name', sqlmodel.sql.sqltypes.AutoString(length=50), nullable=False),
+        sa.Column('record_id', sa.BigInteger(), nullable=False),
+        sa.Column('driver_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), server_default=sa.text("(now() AT TIME ZONE 'utc')"), nullable=False),
+        sa.PrimaryKeyConstraint('change_seq'),
+    )
+    op.create_index('ix_sync_tombstone_driver_change_seq', 'sync_tombstone', ['driver_id', 'change_seq'])
+
+    bind = op.get_bind()
+    for table, pk in TABLES.items():
+        for partition in _partitions(table):
+            min_id, max_id = bind.execute(
+                sa.text(f"SELECT coalesce(min({pk}) - 1, 0), coalesce(max({pk}), 0) FROM {partition}")
+            ).one()
+            with op.get_context().autocommit_block():
+                for lower in range(min_id, max_id, BATCH_SIZE):
+                    op.execute(f"""
+                        UPDATE {partition} SET change_seq = nextval('{SEQUENCE}')
+                        WHERE change_seq IS NULL AND {pk} > {lower} AND {pk} <= {lower + BATCH_SIZE}
+                    """)
+                # Built per partition without blocking writes, then attached to the parent index
+                op.execute(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_driver_change_seq_idx
+                    ON {partition} (driver_id, change_seq)
+                """)
+            op.execute(f"ALTER INDEX ix_{table}_driver_change_seq ATTACH PARTITION {partition}_driver_change_seq_idx")
+        # Created after the backfill so stamping old rows does not fire it
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_change_seq
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION bump_change_seq()
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sync_tombstone_driver_change_seq', table_name='sync_tombstone')
+    op.drop_table('sync_tombstone')
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_driver_change_seq")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_change_seq ON {table}")
+        op.drop_column(table, 'change_seq')
+    op.execute("DROP FUNCTION IF EXISTS bump_change_seq()")
+    op.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
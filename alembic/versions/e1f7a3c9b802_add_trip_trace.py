@@ -0,0 +1,44 @@
+"""add trip_trace
+
+Revision ID: e1f7a3c9b802
+Revises: c6d2e8a4f170
+Create Date: 2026-10-19 22:03:11.487215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f7a3c9b802'
+down_revision: Union[str, None] = 'c6d2e8a4f170'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # No FK to fact_trip: its primary key is (trip_id, event_ts) across
+    # partitions; trip delete and archiving remove the trace explicitly
+    op.create_table(
+        'trip_trace',
+        sa.Column('trip_id', sa.Integer(), nullable=False),
+        sa.Column('start_ts', sa.DateTime(), nullable=False),
+        sa.Column('end_ts', sa.DateTime(), nullable=False),
+        sa.Column('point_count', sa.Integer(), nullable=False),
+        sa.Column('block_size', sa.Integer(), nullable=False),
+        sa.Column('encoding', sa.String(length=10), nullable=False),
+        sa.Column('compressed', sa.Boolean(), nullable=False),
+        sa.Column('block_index', sa.LargeBinary(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('trip_id'),
+    )
+    # Blocks are already encoded/compressed; EXTERNAL skips pglz and lets
+    # substring() fetch only the TOAST chunks a block spans
+    op.execute("ALTER TABLE trip_trace ALTER COLUMN data SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    op.drop_table('trip_trace')
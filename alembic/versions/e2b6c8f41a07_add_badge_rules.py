@@ -0,0 +1,113 @@
+"""add badge rules, driver aggregates and badge awards
+
+Revision ID: e2b6c8f41a07
+Revises: d7f3b0e5a912
+Create Date: 2026-10-19 18:11:52.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6c8f41a07'
+down_revision: Union[str, None] = 'd7f3b0e5a912'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Criteria for the badges seeded by app.seed_db, keyed by badge_name
+DEFAULT_RULES = {
+    'Eco Driver': ('trip_count >= 10 and avg_eco_score > 80', 50),
+    'Safe Driver': ('days_since_last_sos >= 30 and days_active >= 30', 50),
+    'Marathoner': ('max_trip_distance_km > 500', 100),
+}
+
+# Initial aggregates from existing history, one grouped pass per fact table
+POPULATE_AGGREGATES = """
+INSERT INTO driver_aggregate (
+    driver_id, trip_count, total_distance_km, max_trip_distance_km, total_harsh_events,
+    eco_score_sum, eco_score_count, safety_score_sum, safety_score_count,
+    first_trip_at, last_trip_at, sos_count, last_sos_at, updated_at
+)
+SELECT
+    d.driver_id,
+    coalesce(t.trip_count, 0), coalesce(t.total_distance_km, 0), t.max_trip_distance_km,
+    coalesce(t.total_harsh_events, 0), coalesce(t.eco_score_sum, 0), coalesce(t.eco_score_count, 0),
+    coalesce(t.safety_score_sum, 0), coalesce(t.safety_score_count, 0),
+    t.first_trip_at, t.last_trip_at, coalesce(s.sos_count, 0), s.last_sos_at,
+    now() AT TIME ZONE 'utc'
+FROM dim_driver d
+LEFT JOIN (
+    SELECT driver_id, count(*) AS trip_count, sum(distance_km) AS total_distance_km,
+           max(distance_km) AS max_trip_distance_km, sum(harsh_events) AS total_harsh_events,
+           sum(eco_score) AS eco_score_sum, count(eco_score) AS eco_score_count,
+           sum(safety_score) AS safety_score_sum, count(safety_score) AS safety_score_count,
+           min(event_ts) AS first_trip_at, max(event_ts) AS last_trip_at
+    FROM fact_trip GROUP BY driver_id
+) t ON t.driver_id = d.driver_id
+LEFT JOIN (
+    SELECT f.driver_id, count(*) AS sos_count,
+           max(tm.date_value + make_interval(hours => tm.hour)) AS last_sos_at
+    FROM fact_sos f JOIN dim_time tm ON tm.time_id = f.time_id
+    GROUP BY f.driver_id
+) s ON s.driver_id = d.driver_id
+WHERE t.driver_id IS NOT NULL OR s.driver_id IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    op.add_column('dim_badge', sa.Column('criteria', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('dim_badge', sa.Column('points', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+    op.create_table(
+        'driver_aggregate',
+        sa.Column('driver_id', sa.Integer(), nullable=False),
+        sa.Column('trip_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('total_distance_km', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('max_trip_distance_km', sa.Float(), nullable=True),
+        sa.Column('total_harsh_events', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('eco_score_sum', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('eco_score_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('safety_score_sum', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('safety_score_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('first_trip_at', sa.DateTime(), nullable=True),
+        sa.Column('last_trip_at', sa.DateTime(), nullable=True),
+        sa.Column('sos_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('last_sos_at', sa.DateTime(), nullable=True),
+        sa.Column('awarded_badge_ids', postgresql.ARRAY(sa.Integer()), server_default=sa.text("'{}'"), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['driver_id'], ['dim_driver.driver_id']),
+        sa.PrimaryKeyConstraint('driver_id'),
+    )
+    op.create_table(
+        'driver_badge_award',
+        sa.Column('driver_id', sa.Integer(), nullable=False),
+        sa.Column('badge_id', sa.Integer(), nullable=False),
+        sa.Column('awarded_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['driver_id'], ['dim_driver.driver_id']),
+        sa.ForeignKeyConstraint(['badge_id'], ['dim_badge.badge_id']),
+        sa.PrimaryKeyConstraint('driver_id', 'badge_id'),
+    )
+    op.create_index('ix_driver_badge_award_badge_id', 'driver_badge_award', ['badge_id'])
+
+    bind = op.get_bind()
+    for name, (criteria, points) in DEFAULT_RULES.items():
+        bind.execute(
+            sa.text("UPDATE dim_badge SET criteria = :criteria, points = :points "
+                    "WHERE badge_name = :name AND criteria IS NULL"),
+            {"criteria": criteria, "points": points, "name": name},
+        )
+    op.execute(POPULATE_AGGREGATES)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_driver_badge_award_badge_id', table_name='driver_badge_award')
+    op.drop_table('driver_badge_award')
+    op.drop_table('driver_aggregate')
+    op.drop_column('dim_badge', 'points')
+    op.drop_column('dim_badge', 'criteria')
@@ -0,0 +1,40 @@
+"""add fact_trip event_ts index
+
+Revision ID: f3c8a1d6e247
+Revises: d7a1c5e9f326
+Create Date: 2026-10-20 09:14:37.208341
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6e247'
+down_revision: Union[str, None] = 'd7a1c5e9f326'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partitions(table: str):
+    return op.get_bind().execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+        ORDER BY c.relname
+    """), {"parent": table}).scalars().all()
+
+
+def upgrade() -> None:
+    # Newest-first trip lists: an ordered Append walks the partitions from the
+    # newest and stops once the LIMIT is filled, instead of sorting every row
+    op.execute("CREATE INDEX IF NOT EXISTS ix_fact_trip_event_ts ON ONLY fact_trip (event_ts)")
+    for partition in _partitions('fact_trip'):
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_event_ts_idx ON {partition} (event_ts)")
+        op.execute(f"ALTER INDEX ix_fact_trip_event_ts ATTACH PARTITION {partition}_event_ts_idx")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_fact_trip_event_ts")
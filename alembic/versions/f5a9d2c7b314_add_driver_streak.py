@@ -0,0 +1,69 @@
+"""add driver_streak
+
+Revision ID: f5a9d2c7b314
+Revises: e2b6c8f41a07
+Create Date: 2026-10-19 19:02:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a9d2c7b314'
+down_revision: Union[str, None] = 'e2b6c8f41a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Gaps-and-islands over distinct active days: day - row_number() is constant
+# within a run of consecutive days. Later refreshes use the vectorised
+# backfill in app.services.streak_service.
+POPULATE_STREAKS = """
+INSERT INTO driver_streak (driver_id, last_active_day, current_streak, best_streak, updated_at)
+WITH days AS (
+    SELECT DISTINCT driver_id, CAST(event_ts AS date) AS day FROM fact_trip
+), runs AS (
+    SELECT driver_id, max(day) AS run_end, count(*) AS run_length
+    FROM (
+        SELECT driver_id, day,
+               day - CAST(row_number() OVER (PARTITION BY driver_id ORDER BY day) AS integer) AS island
+        FROM days
+    ) d
+    GROUP BY driver_id, island
+)
+SELECT DISTINCT ON (driver_id)
+    driver_id, run_end, run_length,
+    max(run_length) OVER (PARTITION BY driver_id),
+    now() AT TIME ZONE 'utc'
+FROM runs
+ORDER BY driver_id, run_end DESC
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'driver_streak',
+        sa.Column('driver_id', sa.Integer(), nullable=False),
+        sa.Column('last_active_day', sa.Date(), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=False),
+        sa.Column('best_streak', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['driver_id'], ['dim_driver.driver_id']),
+        sa.PrimaryKeyConstraint('driver_id'),
+    )
+    op.execute(POPULATE_STREAKS)
+    op.execute(
+        "UPDATE dim_badge SET criteria = 'best_streak >= 7', points = 25 "
+        "WHERE badge_name = 'Streak Keeper' AND criteria IS NULL"
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "UPDATE dim_badge SET criteria = NULL, points = 0 "
+        "WHERE badge_name = 'Streak Keeper' AND criteria = 'best_streak >= 7'"
+    )
+    op.drop_table('driver_streak')
@@ -1,15 +1,25 @@
 # api package
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.core.rate_limit import rate_limit
 from app.api.routers.driver_router import router as driver_router
 from app.api.routers.vehicle_router import router as vehicle_router
 # Add others as you build them:
 from app.api.routers.trip_router import router as trip_router
 from app.api.routers.sos_router import router as sos_router
 from app.api.routers.gamification_router import router as gamification_router
+from app.api.routers.sync_router import router as sync_router
+from app.api.routers.admin_router import router as admin_router
+from app.api.routers.batch_router import router as batch_router
+from app.api.routers.heatmap_router import router as heatmap_router
 
-api_router = APIRouter()
+# Every API route is charged to its driver / IP / route-class token buckets; SOS is exempt
+api_router = APIRouter(dependencies=[Depends(rate_limit)])
 api_router.include_router(driver_router)
 api_router.include_router(vehicle_router)
 api_router.include_router(trip_router)
 api_router.include_router(sos_router)
 api_router.include_router(gamification_router)
+api_router.include_router(sync_router)
+api_router.include_router(admin_router)
+api_router.include_router(batch_router)
+api_router.include_router(heatmap_router)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query, Request
+from typing import Literal
+from app.core.admission import get_admission_controller
+from app.core.database import get_db_provider
+from app.core.dependencies import require_admin
+from app.core.loop_monitor import get_loop_monitor
+from app.core.slow_queries import get_slow_query_log
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/slow-queries")
+async def list_slow_queries(
+    order_by: Literal["total_ms", "max_ms", "count", "last_seen"] = "total_ms",
+    limit: int = Query(50, ge=1, le=500),
+):
+    slow_query_log = get_slow_query_log()
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "queries": slow_query_log.entries(order_by=order_by, limit=limit),
+    }
+
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries():
+    get_slow_query_log().clear()
+
+
+@router.get("/loop-stalls")
+async def list_loop_stalls():
+    loop_monitor = get_loop_monitor()
+    return {
+        "threshold_ms": loop_monitor.threshold * 1000,
+        "lag_percentiles_ms": {str(q): round(v * 1000, 3) for q, v in loop_monitor.percentiles().items()},
+        "stalls": loop_monitor.recent_stalls(),
+    }
+
+
+@router.get("/admission")
+async def admission_status():
+    return {
+        "bulkheads": get_admission_controller().snapshot(),
+        "pools": get_db_provider().pool_status(),
+    }
+
+
+@router.get("/jobs")
+async def list_jobs(request: Request):
+    return request.app.state.jobs.status()
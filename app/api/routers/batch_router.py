@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Body, HTTPException, Request
+from typing import Any, Dict, List
+from app.services.batch_service import BatchService
+
+router = APIRouter(tags=["batch"])
+
+
+@router.post("/batch")
+async def run_batch(request: Request, requests: List[Dict[str, Any]] = Body(..., embed=True)):
+    """
+    Run several GET requests in one call, e.g.
+    {"requests": [{"id": "driver", "path": "/drivers/7"}, {"id": "trips", "path": "/trips/?fields=trip_id,eco_score"}]}.
+    Each response carries its own status; a failing item does not fail the batch.
+    """
+    try:
+        responses = await BatchService(request.app).run(requests, request.scope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"responses": responses}
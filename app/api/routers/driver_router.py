@@ -1,18 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from typing import Any, Dict, List, Literal, Optional
 from app.services.driver_service import DriverService
-from app.core.dependencies import get_driver_service
+from app.services.driver_config_service import DriverConfigService
+from app.services.risk_service import RiskService
+from app.core.dependencies import get_driver_config_service, get_driver_service, get_risk_service
+from app.core.idempotency import idempotent
+from app.core.projection import parse_fields, sparse_response
+from app.services.bulk_operations import BulkDeleteConflict
 from app.data.schemas.models import Driver
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
 
 @router.get("/", response_model=List[Driver])
-async def list_drivers(driver_service: DriverService = Depends(get_driver_service)):
+async def list_drivers(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. driver_id,name"),
+    driver_service: DriverService = Depends(get_driver_service),
+):
+    columns = parse_fields(Driver, fields)
     try:
-        return await driver_service.get_all_drivers()
+        drivers = await driver_service.get_all_drivers(fields=columns)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch drivers: {str(e)}")
+    return sparse_response(drivers) if columns else drivers
+
+
+@router.get("/risk")
+async def riskiest_drivers(
+    limit: int = Query(50, ge=1, le=1000),
+    min_trips: int = Query(0, ge=0),
+    risk_service: RiskService = Depends(get_risk_service),
+):
+    """Drivers with the highest risk scores, optionally only those with at least `min_trips` trips."""
+    try:
+        return await risk_service.riskiest(limit=limit, min_trips=min_trips)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch risk scores: {str(e)}")
 
 
 @router.get("/{driver_id}", response_model=Driver)
@@ -23,7 +46,7 @@ async def get_driver(driver_id: int, driver_service: DriverService = Depends(get
     return driver
 
 
-@router.post("/", response_model=Driver, status_code=201)
+@router.post("/", response_model=Driver, status_code=201, dependencies=[Depends(idempotent)])
 async def create_driver(
     name: str,
     license_type: Optional[str] = None,
@@ -35,6 +58,43 @@ async def create_driver(
         raise HTTPException(status_code=500, detail=f"Failed to create driver: {str(e)}")
 
 
+@router.patch("/bulk")
+async def bulk_update_drivers(
+    updates: Dict[str, Any] = Body(...),
+    ids: Optional[List[int]] = Body(None),
+    filters: Optional[Dict[str, Any]] = Body(None, alias="filter"),
+    driver_service: DriverService = Depends(get_driver_service),
+):
+    """
+    Set `updates` on the drivers listed in `ids` and/or matching `filter`
+    (equality, a list for IN, null for IS NULL) in a single statement.
+    """
+    try:
+        ids = await driver_service.bulk_update_drivers(ids, filters, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update drivers: {str(e)}")
+    return {"updated": len(ids), "ids": ids}
+
+
+@router.delete("/bulk")
+async def bulk_delete_drivers(
+    ids: Optional[List[int]] = Body(None),
+    filters: Optional[Dict[str, Any]] = Body(None, alias="filter"),
+    driver_service: DriverService = Depends(get_driver_service),
+):
+    try:
+        deleted = await driver_service.bulk_delete_drivers(ids, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BulkDeleteConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete drivers: {str(e)}")
+    return {"deleted": deleted}
+
+
 @router.patch("/{driver_id}", response_model=Driver)
 async def update_driver(
     driver_id: int,
@@ -53,3 +113,65 @@ async def delete_driver(driver_id: int, driver_service: DriverService = Depends(
     if not success:
         raise HTTPException(status_code=404, detail="Driver not found")
     return None
+
+
+@router.get("/{driver_id}/risk")
+async def get_driver_risk(driver_id: int, risk_service: RiskService = Depends(get_risk_service)):
+    """Risk score (0 safest to 100 riskiest) with the counters and rates behind it."""
+    try:
+        risk = await risk_service.get_risk(driver_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch driver risk: {str(e)}")
+    if risk is None:
+        raise HTTPException(status_code=404, detail="No trips or SOS recorded for this driver")
+    return risk
+
+
+@router.get("/{driver_id}/config")
+async def get_driver_config(
+    driver_id: int,
+    response: Response,
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    config_service: DriverConfigService = Depends(get_driver_config_service),
+):
+    """
+    Device configuration bundle. Pass the last seen version as `since` (or
+    its ETag as If-None-Match) to receive only the changed sections, or 304
+    when nothing changed.
+    """
+    if since is None and if_none_match:
+        try:
+            since = int(if_none_match.strip('W/"'))
+        except ValueError:
+            since = None
+    try:
+        bundle = await config_service.get_bundle(driver_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch driver config: {str(e)}")
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Driver not found")
+
+    etag = f'"{bundle["version"]}"'
+    delta = config_service.delta(bundle, since)
+    if delta is None:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return delta
+
+
+@router.patch("/{driver_id}/config/{section}")
+async def update_driver_config(
+    driver_id: int,
+    section: Literal["settings", "notification", "privacy", "emergency"],
+    updates: dict,
+    config_service: DriverConfigService = Depends(get_driver_config_service),
+):
+    if await config_service.get_bundle(driver_id) is None:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    try:
+        return await config_service.update_section(driver_id, section, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update driver config: {str(e)}")
@@ -3,6 +3,7 @@ from typing import List, Optional
 from datetime import datetime
 from app.services.gamification_service import GamificationService
 from app.core.dependencies import get_gamification_service
+from app.core.idempotency import idempotent
 from app.data.schemas.models import Badge, FactGamification
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
@@ -13,11 +14,11 @@ async def list_badges(gamification_service: GamificationService = Depends(get_ga
     return await gamification_service.get_badges()
 
 
-@router.post("/events", response_model=FactGamification, status_code=201)
+@router.post("/events", response_model=FactGamification, status_code=201, dependencies=[Depends(idempotent)])
 async def add_event(
     driver_id: int,
     score_change: int,
-    streak_days: Optional[int] = None,
+    streak_days: Optional[int] = Query(None, deprecated=True, description="Ignored; streaks are computed server-side"),
     badge_id: Optional[int] = None,
     timestamp: Optional[datetime] = None,
     gamification_service: GamificationService = Depends(get_gamification_service),
@@ -34,6 +35,14 @@ async def add_event(
         raise HTTPException(status_code=500, detail=f"Failed to log gamification event: {str(e)}")
 
 
+@router.get("/streaks/{driver_id}")
+async def get_streak(driver_id: int, gamification_service: GamificationService = Depends(get_gamification_service)):
+    try:
+        return await gamification_service.get_streak(driver_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch streak: {str(e)}")
+
+
 @router.get("/leaderboard")
 async def leaderboard(
     days: int = Query(7, ge=1, le=90),
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.dependencies import get_heatmap_service
+from app.services.heatmap_service import HeatmapService
+
+router = APIRouter(prefix="/heatmap", tags=["heatmap"])
+
+
+@router.get("/{z}/{x}/{y}")
+async def get_heatmap_tile(z: int, x: int, y: int, heatmap_service: HeatmapService = Depends(get_heatmap_service)):
+    """SOS incident counts of slippy-map tile z/x/y on a 32 x 32 grid, as sparse [col, row, count] cells."""
+    try:
+        return await heatmap_service.get_tile(z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load heatmap tile: {str(e)}")
@@ -1,15 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
+from datetime import datetime
 from app.services.sos_service import SOSService
 from app.core.dependencies import get_sos_service
+from app.core.idempotency import idempotent
+from app.core.projection import parse_fields, sparse_response
 from app.data.schemas.models import FactSOS
 
 router = APIRouter(prefix="/sos", tags=["sos"])
 
 
 @router.get("/unresolved", response_model=List[FactSOS])
-async def list_unresolved(sos_service: SOSService = Depends(get_sos_service)):
-    return await sos_service.get_all_unresolved()
+async def list_unresolved(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. sos_id,driver_id,severity"),
+    sos_service: SOSService = Depends(get_sos_service),
+):
+    columns = parse_fields(FactSOS, fields)
+    sos = await sos_service.get_all_unresolved(fields=columns)
+    return sparse_response(sos) if columns else sos
+
+
+@router.get("/export")
+async def export_sos(
+    driver_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sos_service: SOSService = Depends(get_sos_service),
+):
+    """SOS events in [start, end) with location, including history moved to the archive."""
+    try:
+        return await sos_service.export_sos(driver_id=driver_id, start=start, end=end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export SOS events: {str(e)}")
 
 
 @router.get("/{sos_id}", response_model=FactSOS)
@@ -20,7 +42,7 @@ async def get_sos(sos_id: int, sos_service: SOSService = Depends(get_sos_service
     return sos
 
 
-@router.post("/", response_model=FactSOS, status_code=201)
+@router.post("/", response_model=FactSOS, status_code=201, dependencies=[Depends(idempotent)])
 async def create_sos(
     driver_id: int,
     vehicle_id: int,
@@ -45,7 +67,7 @@ async def create_sos(
         raise HTTPException(status_code=500, detail=f"Failed to create SOS: {str(e)}")
 
 
-@router.post("/{sos_id}/resolve", response_model=FactSOS)
+@router.post("/{sos_id}/resolve", response_model=FactSOS, dependencies=[Depends(idempotent)])
 async def resolve_sos(sos_id: int, sos_service: SOSService = Depends(get_sos_service)):
     sos = await sos_service.resolve_sos(sos_id)
     if not sos:
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from app.services.sync_service import SyncService
+from app.core.dependencies import get_sync_service
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get("/drivers/{driver_id}")
+async def sync_driver(
+    driver_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    sync_service: SyncService = Depends(get_sync_service),
+):
+    """
+    Trips and gamification events created, changed or deleted since `cursor`.
+    Start without a cursor, store the returned one, and repeat while `has_more`.
+    """
+    try:
+        return await sync_service.changes_since(driver_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to sync driver: {str(e)}")
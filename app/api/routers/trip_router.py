@@ -1,19 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from typing import List, Optional
 from datetime import datetime
 from app.services.trip_service import TripService
-from app.core.dependencies import get_trip_service
+from app.services.trace_service import TraceService
+from app.core.dependencies import get_trace_service, get_trip_service
+from app.core.idempotency import idempotent
+from app.core.projection import parse_fields, sparse_response
 from app.data.schemas.models import FactTrip
+from app.data.trace_codec import ENCODINGS, VARINT
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
 
 @router.get("/", response_model=List[FactTrip])
-async def list_trips(trip_service: TripService = Depends(get_trip_service)):
+async def list_trips(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. trip_id,driver_id,eco_score"),
+    trip_service: TripService = Depends(get_trip_service),
+):
+    columns = parse_fields(FactTrip, fields)
     try:
-        return await trip_service.get_all_trips()
+        trips = await trip_service.get_all_trips(fields=columns)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch trips: {str(e)}")
+    return sparse_response(trips) if columns else trips
+
+
+@router.get("/export")
+async def export_trips(
+    driver_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    trip_service: TripService = Depends(get_trip_service),
+):
+    """Trips in [start, end), including history moved to the archive."""
+    try:
+        return await trip_service.export_trips(driver_id=driver_id, start=start, end=end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export trips: {str(e)}")
+
+
+@router.get("/stats")
+async def trip_stats(
+    driver_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    trip_service: TripService = Depends(get_trip_service),
+):
+    """Trip aggregates over [start, end), including archived history."""
+    try:
+        return await trip_service.get_trip_stats(driver_id=driver_id, start=start, end=end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute trip stats: {str(e)}")
 
 
 @router.get("/{trip_id}", response_model=FactTrip)
@@ -24,7 +61,61 @@ async def get_trip(trip_id: int, trip_service: TripService = Depends(get_trip_se
     return trip
 
 
-@router.post("/", response_model=FactTrip, status_code=201)
+@router.put("/{trip_id}/trace")
+async def store_trip_trace(
+    trip_id: int,
+    t: List[int] = Body(..., description="Epoch milliseconds per point"),
+    lat: List[float] = Body(...),
+    lon: List[float] = Body(...),
+    speed: List[float] = Body(..., description="km/h"),
+    encoding: str = Body(VARINT, description=f"One of {', '.join(ENCODINGS)}"),
+    compress: bool = Body(True, description="zstd-compress each block"),
+    trace_service: TraceService = Depends(get_trace_service),
+):
+    try:
+        stored = await trace_service.store_trace(trip_id, t, lat, lon, speed, encoding=encoding, compress=compress)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store trip trace: {str(e)}")
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return stored
+
+
+@router.get("/{trip_id}/trace")
+async def get_trip_trace(
+    trip_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: Optional[int] = Query(None, ge=2, description="Evenly downsample to at most this many points"),
+    trace_service: TraceService = Depends(get_trace_service),
+):
+    try:
+        trace = await trace_service.get_trace(trip_id, start=start, end=end, max_points=max_points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read trip trace: {str(e)}")
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+
+@router.get("/{trip_id}/trace/polyline")
+async def get_trip_route(
+    trip_id: int,
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level the route will be drawn at"),
+    trace_service: TraceService = Depends(get_trace_service),
+):
+    try:
+        route = await trace_service.get_route(trip_id, zoom)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read trip route: {str(e)}")
+    if route is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return route
+
+
+@router.post("/", response_model=FactTrip, status_code=201, dependencies=[Depends(idempotent)])
 async def create_trip(
     driver_id: int,
     vehicle_id: int,
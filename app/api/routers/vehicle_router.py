@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from typing import Any, Dict, List, Optional
 from app.services.vehicle_service import VehicleService
 from app.core.dependencies import get_vehicle_service
+from app.core.idempotency import idempotent
+from app.core.projection import parse_fields, sparse_response
+from app.services.bulk_operations import BulkDeleteConflict
 from app.data.schemas.models import Vehicle
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
 
 @router.get("/", response_model=List[Vehicle])
-async def list_vehicles(vehicle_service: VehicleService = Depends(get_vehicle_service)):
+async def list_vehicles(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. vehicle_id,make,model"),
+    vehicle_service: VehicleService = Depends(get_vehicle_service),
+):
+    columns = parse_fields(Vehicle, fields)
     try:
-        return await vehicle_service.get_all_vehicles()
+        vehicles = await vehicle_service.get_all_vehicles(fields=columns)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch vehicles: {str(e)}")
+    return sparse_response(vehicles) if columns else vehicles
 
 
 @router.get("/{vehicle_id}", response_model=Vehicle)
@@ -23,7 +31,7 @@ async def get_vehicle(vehicle_id: int, vehicle_service: VehicleService = Depends
     return vehicle
 
 
-@router.post("/", response_model=Vehicle, status_code=201)
+@router.post("/", response_model=Vehicle, status_code=201, dependencies=[Depends(idempotent)])
 async def create_vehicle(
     make: str,
     model: str,
@@ -37,6 +45,43 @@ async def create_vehicle(
         raise HTTPException(status_code=500, detail=f"Failed to create vehicle: {str(e)}")
 
 
+@router.patch("/bulk")
+async def bulk_update_vehicles(
+    updates: Dict[str, Any] = Body(...),
+    ids: Optional[List[int]] = Body(None),
+    filters: Optional[Dict[str, Any]] = Body(None, alias="filter"),
+    vehicle_service: VehicleService = Depends(get_vehicle_service),
+):
+    """
+    Set `updates` on the vehicles listed in `ids` and/or matching `filter`
+    (equality, a list for IN, null for IS NULL) in a single statement.
+    """
+    try:
+        ids = await vehicle_service.bulk_update_vehicles(ids, filters, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update vehicles: {str(e)}")
+    return {"updated": len(ids), "ids": ids}
+
+
+@router.delete("/bulk")
+async def bulk_delete_vehicles(
+    ids: Optional[List[int]] = Body(None),
+    filters: Optional[Dict[str, Any]] = Body(None, alias="filter"),
+    vehicle_service: VehicleService = Depends(get_vehicle_service),
+):
+    try:
+        deleted = await vehicle_service.bulk_delete_vehicles(ids, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BulkDeleteConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete vehicles: {str(e)}")
+    return {"deleted": deleted}
+
+
 @router.patch("/{vehicle_id}", response_model=Vehicle)
 async def update_vehicle(
     vehicle_id: int,
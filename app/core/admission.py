@@ -0,0 +1,175 @@
+# admission.py
+"""
+Priority-aware admission control (bulkheads).
+
+Each route class (app/core/route_classes.py) has its own concurrency limit
+and its own database connection pool, so a burst of analytics requests can
+fill the bulk lane but never take a slot or a connection from SOS traffic.
+A request waits for a slot in its class; interactive and bulk requests that
+would wait longer than their class's queue budget, or that find the queue
+already full, are shed with 503 and Retry-After instead of piling up.
+Critical requests are never shed.
+
+    ADMISSION_LIMITS        "critical=50,interactive=40,bulk=8"      concurrent requests
+    ADMISSION_QUEUE_BUDGET  "interactive=2000,bulk=500"              max queue wait, ms
+    ADMISSION_MAX_QUEUE     "interactive=200,bulk=50"                max waiting requests
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.route_classes import (
+    BULK, CRITICAL, INTERACTIVE, ROUTE_CLASSES, SUB_REQUEST, current_route_class, route_class,
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot", ["route_class"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding an admission slot", ["route_class"],
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds", "Time spent waiting for an admission slot", ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control", ["route_class", "reason"],
+)
+
+DEFAULT_LIMITS = {CRITICAL: 50, INTERACTIVE: 40, BULK: 8}
+DEFAULT_QUEUE_BUDGET_MS = {INTERACTIVE: 2000, BULK: 500}
+DEFAULT_MAX_QUEUE = {INTERACTIVE: 200, BULK: 50}
+
+
+def parse_class_settings(raw: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """`defaults` with overrides like "interactive=40,bulk=8" applied."""
+    settings = dict(defaults)
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        cls, _, value = item.partition("=")
+        if cls.strip() not in ROUTE_CLASSES:
+            raise ValueError(f"Unknown route class {cls.strip()!r}")
+        settings[cls.strip()] = float(value)
+    return settings
+
+
+class Bulkhead:
+    """Concurrency slots and queue accounting for one route class."""
+
+    def __init__(self, name: str, limit: int, queue_budget: Optional[float], max_queue: Optional[int]):
+        self.name = name
+        self.limit = limit
+        # None: wait as long as it takes and never shed
+        self.queue_budget = queue_budget
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns the shed reason instead if the request should be rejected."""
+        if self.max_queue is not None and self._slots.locked() and self.waiting >= self.max_queue:
+            return "queue_full"
+        started = time.perf_counter()
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+        try:
+            if self.queue_budget is None:
+                await self._slots.acquire()
+            else:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_budget)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+            ADMISSION_QUEUE_WAIT.labels(self.name).observe(time.perf_counter() - started)
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        self._slots.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "queue_budget_ms": None if self.queue_budget is None else self.queue_budget * 1000,
+            "max_queue": self.max_queue,
+        }
+
+
+class AdmissionController:
+    """One Bulkhead per route class, configured from the environment."""
+
+    def __init__(self):
+        limits = parse_class_settings(os.environ.get("ADMISSION_LIMITS", ""), DEFAULT_LIMITS)
+        budgets = parse_class_settings(os.environ.get("ADMISSION_QUEUE_BUDGET", ""), DEFAULT_QUEUE_BUDGET_MS)
+        max_queue = parse_class_settings(os.environ.get("ADMISSION_MAX_QUEUE", ""), DEFAULT_MAX_QUEUE)
+        self.bulkheads = {
+            cls: Bulkhead(
+                cls,
+                int(limits[cls]),
+                None if cls == CRITICAL or cls not in budgets else budgets[cls] / 1000,
+                None if cls == CRITICAL or cls not in max_queue else int(max_queue[cls]),
+            )
+            for cls in ROUTE_CLASSES
+        }
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {cls: bulkhead.snapshot() for cls, bulkhead in self.bulkheads.items()}
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting each HTTP request through its class's bulkhead
+    and binding the class to the request so its sessions use the class's pool.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or get_admission_controller()
+
+    async def __call__(self, scope, receive, send):
+        # Sub-requests run under their parent's slot (and pick their own pool);
+        # a second slot from the same class could deadlock a full bulkhead
+        if scope["type"] != "http" or scope.get(SUB_REQUEST):
+            await self.app(scope, receive, send)
+            return
+
+        cls = route_class(scope["method"], scope["path"])
+        bulkhead = self.controller.bulkheads[cls]
+        shed = await bulkhead.acquire()
+        if shed is not None:
+            ADMISSION_SHED.labels(cls, shed).inc()
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, retry later"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        token = current_route_class.set(cls)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route_class.reset(token)
+            bulkhead.release()
@@ -1,19 +1,49 @@
 # caching.py
 import os
+import time
 from typing import Optional
 
 import redis
+import redis.asyncio
+
+from app.core.metrics import record_redis_call
+
+
+class InstrumentedRedis(redis.Redis):
+    """redis.Redis that attributes command count and time to the current request."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis_call(time.perf_counter() - started)
+
+
+class InstrumentedAsyncRedis(redis.asyncio.Redis):
+    """redis.asyncio.Redis that attributes command count and time to the current request."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis_call(time.perf_counter() - started)
+
+
+def _redis_url() -> str:
+    return os.environ.get("REDIS_URL") or os.environ.get("REDIS_HOST", "redis")
 
 
 def get_redis_client() -> redis.Redis:
     """Create a redis.Redis client using REDIS_URL or default localhost."""
-    url = os.environ.get("REDIS_URL") or os.environ.get("REDIS_HOST", "redis")
+    url = _redis_url()
     # If REDIS_URL like redis://host:6379/0, redis.from_url handles it
     if url.startswith("redis://"):
-        return redis.from_url(url, decode_responses=True)
+        return InstrumentedRedis.from_url(url, decode_responses=True)
     # otherwise construct
     port = os.environ.get("REDIS_PORT", "6379")
-    return redis.Redis(host=url, port=int(port), decode_responses=True)
+    return InstrumentedRedis(host=url, port=int(port), decode_responses=True)
 
 
 _client: Optional[redis.Redis] = None
@@ -24,3 +54,29 @@ def redis_client() -> redis.Redis:
     if _client is None:
         _client = get_redis_client()
     return _client
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Create a redis.asyncio client; use this from request handlers and services."""
+    url = _redis_url()
+    if url.startswith("redis://"):
+        return InstrumentedAsyncRedis.from_url(url, decode_responses=True)
+    port = os.environ.get("REDIS_PORT", "6379")
+    return InstrumentedAsyncRedis(host=url, port=int(port), decode_responses=True)
+
+
+_async_client: Optional[redis.asyncio.Redis] = None
+
+
+def async_redis_client() -> redis.asyncio.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = get_async_redis_client()
+    return _async_client
+
+
+async def close_async_redis_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
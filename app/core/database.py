@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     create_async_engine,
@@ -8,6 +8,10 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import sessionmaker
 from contextlib import asynccontextmanager
 
+from app.core.metrics import instrument_engine
+from app.core.route_classes import BULK, CRITICAL, INTERACTIVE, current_route_class
+from app.core.slow_queries import get_slow_query_log
+
 
 def build_async_db_url() -> str:
     """Build async database URL from environment variables."""
@@ -19,44 +23,90 @@ def build_async_db_url() -> str:
     return f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{database}"
 
 
+# route class -> (pool_size, max_overflow). Each class gets its own engine so
+# bulk work can never hold the connections SOS requests need.
+DEFAULT_POOL_SIZES: Dict[str, Tuple[int, int]] = {
+    CRITICAL: (2, 3),
+    INTERACTIVE: (10, 20),
+    BULK: (3, 2),
+}
+
+
+def parse_pool_sizes(raw: str) -> Dict[str, Tuple[int, int]]:
+    """DEFAULT_POOL_SIZES with overrides like "critical=2:3,bulk=3:2" (pool_size:max_overflow) applied."""
+    sizes = dict(DEFAULT_POOL_SIZES)
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        cls, _, value = item.partition("=")
+        size, _, overflow = value.partition(":")
+        if cls.strip() not in sizes:
+            raise ValueError(f"Unknown route class {cls.strip()!r} in DB_POOL_SIZES")
+        sizes[cls.strip()] = (int(size), int(overflow or 0))
+    return sizes
+
+
 class DatabaseProvider:
     """Async database provider for PostgreSQL."""
 
     def __init__(self):
-        self._engine: Optional[AsyncEngine] = None
-        self._session_factory: Optional[sessionmaker] = None
+        self._engines: Dict[str, AsyncEngine] = {}
+        self._session_factories: Dict[str, sessionmaker] = {}
+        self._pool_sizes = parse_pool_sizes(os.environ.get("DB_POOL_SIZES", ""))
 
     # -----------------------------------------------------------------
     # Engine and session factory
     # -----------------------------------------------------------------
-    def get_engine(self) -> AsyncEngine:
-        """Get or create async database engine."""
-        if self._engine is None:
+    def get_engine(self, route_class: Optional[str] = None) -> AsyncEngine:
+        """
+        Get or create the async engine (connection pool) of a route class.
+
+        Defaults to the class of the current request (see
+        app/core/admission.py), or the interactive pool outside requests.
+        """
+        route_class = route_class or current_route_class.get()
+        if route_class not in self._engines:
+            pool_size, max_overflow = self._pool_sizes[route_class]
             db_url = build_async_db_url()
-            self._engine = create_async_engine(
+            engine = create_async_engine(
                 db_url,
                 pool_pre_ping=True,
-                pool_size=10,
-                max_overflow=20,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
                 echo=False,  # set True for SQL debug logging
             )
-        return self._engine
+            instrument_engine(engine)
+            get_slow_query_log().instrument(engine)
+            self._engines[route_class] = engine
+        return self._engines[route_class]
 
-    def get_session_factory(self) -> sessionmaker:
+    def get_session_factory(self, route_class: Optional[str] = None) -> sessionmaker:
         """
-        Return a session factory for creating AsyncSession objects.
+        Return a session factory for creating AsyncSession objects, bound to
+        the pool of `route_class` (default: the current request's class).
 
         Use this when services want explicit control over commits/rollbacks:
             async with session_factory() as session:
                 ...
         """
-        if self._session_factory is None:
-            self._session_factory = sessionmaker(
-                bind=self.get_engine(),
+        route_class = route_class or current_route_class.get()
+        if route_class not in self._session_factories:
+            self._session_factories[route_class] = sessionmaker(
+                bind=self.get_engine(route_class),
                 class_=AsyncSession,
                 expire_on_commit=False,
             )
-        return self._session_factory
+        return self._session_factories[route_class]
+
+    def pool_status(self) -> Dict[str, dict]:
+        """Checked-out and idle connections per route-class pool opened so far."""
+        return {
+            route_class: {
+                "size": engine.pool.size(),
+                "checked_out": engine.pool.checkedout(),
+                "idle": engine.pool.checkedin(),
+                "overflow": engine.pool.overflow(),
+            }
+            for route_class, engine in self._engines.items()
+        }
 
     # -----------------------------------------------------------------
     # Context-managed session (auto commit/rollback)
@@ -85,9 +135,11 @@ class DatabaseProvider:
     # Cleanup
     # -----------------------------------------------------------------
     async def close(self):
-        """Close database engine (e.g., on shutdown)."""
-        if self._engine:
-            await self._engine.dispose()
+        """Close database engines (e.g., on shutdown)."""
+        for engine in self._engines.values():
+            await engine.dispose()
+        self._engines.clear()
+        self._session_factories.clear()
 
 
 # Global database provider singleton
@@ -1,13 +1,24 @@
+import os
+import secrets
 from functools import lru_cache
+from typing import Optional
+
+from fastapi import Header, HTTPException
 from app.core.database import get_db_provider
 from app.data.repositories.template_repository import TemplateRepository
+from app.data.repositories.archive_repository import ArchiveRepository
 from app.services.cache_service import CacheService
 from app.services.template_service import TemplateService
 from app.services.driver_service import DriverService
+from app.services.driver_config_service import DriverConfigService
+from app.services.risk_service import RiskService
 from app.services.vehicle_service import VehicleService
 from app.services.trip_service import TripService
+from app.services.trace_service import TraceService
 from app.services.sos_service import SOSService
 from app.services.gamification_service import GamificationService
+from app.services.heatmap_service import HeatmapService
+from app.services.sync_service import SyncService
 
 
 # --------------------------------------------------------------------
@@ -27,6 +38,12 @@ def get_template_repository() -> TemplateRepository:
     return TemplateRepository(db_provider)
 
 
+@lru_cache()
+def get_archive_repository() -> ArchiveRepository:
+    """Parquet archive of cold fact rows (singleton)."""
+    return ArchiveRepository()
+
+
 @lru_cache()
 def get_cache_service() -> CacheService:
     """Cache service (singleton)."""
@@ -41,6 +58,26 @@ def get_template_service() -> TemplateService:
     return TemplateService(repository, cache_service)
 
 
+# --------------------------------------------------------------------
+# Admin access
+# --------------------------------------------------------------------
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Guard for /admin endpoints.
+
+    With ADMIN_TOKEN set the X-Admin-Token header must match it. Without it
+    admin endpoints are denied, unless APP_ENV is explicitly "development"
+    (an unset or empty APP_ENV, as docker-compose passes by default, is not).
+    """
+    expected = os.environ.get("ADMIN_TOKEN")
+    if expected:
+        if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif os.environ.get("APP_ENV", "").strip().lower() != "development":
+        raise HTTPException(status_code=403, detail="Admin endpoints require ADMIN_TOKEN")
+
+
 # --------------------------------------------------------------------
 # Request-scoped, DB-session–bound services
 # --------------------------------------------------------------------
@@ -56,6 +93,20 @@ async def get_driver_service():
         yield DriverService(session)
 
 
+async def get_driver_config_service():
+    db_provider = get_db_provider()
+    session_factory = db_provider.get_session_factory()
+    async with session_factory() as session:
+        yield DriverConfigService(session, get_cache_service())
+
+
+async def get_risk_service():
+    db_provider = get_db_provider()
+    session_factory = db_provider.get_session_factory()
+    async with session_factory() as session:
+        yield RiskService(session)
+
+
 async def get_vehicle_service():
     """
     Provide VehicleService with a per-request DB session.
@@ -71,18 +122,39 @@ async def get_trip_service():
     db_provider = get_db_provider()
     session_factory = db_provider.get_session_factory()
     async with session_factory() as session:
-        yield TripService(session)
+        yield TripService(session, get_archive_repository())
+
+
+async def get_trace_service():
+    db_provider = get_db_provider()
+    session_factory = db_provider.get_session_factory()
+    async with session_factory() as session:
+        yield TraceService(session, get_cache_service())
 
 
 async def get_sos_service():
     db_provider = get_db_provider()
     session_factory = db_provider.get_session_factory()
     async with session_factory() as session:
-        yield SOSService(session)
+        yield SOSService(session, get_archive_repository())
+
+
+async def get_heatmap_service():
+    db_provider = get_db_provider()
+    session_factory = db_provider.get_session_factory()
+    async with session_factory() as session:
+        yield HeatmapService(session, get_cache_service(), get_archive_repository())
 
 
 async def get_gamification_service():
     db_provider = get_db_provider()
     session_factory = db_provider.get_session_factory()
     async with session_factory() as session:
-        yield GamificationService(session)
+        yield GamificationService(session, get_cache_service())
+
+
+async def get_sync_service():
+    db_provider = get_db_provider()
+    session_factory = db_provider.get_session_factory()
+    async with session_factory() as session:
+        yield SyncService(session)
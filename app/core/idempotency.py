@@ -0,0 +1,285 @@
+# idempotency.py
+"""
+Idempotency-Key support for POST endpoints.
+
+The `idempotent` dependency claims the key in Redis with SET NX before the
+endpoint runs. A retry of a completed request is answered from the stored
+response without touching Postgres, a retry that arrives while the first
+attempt is still running waits for it, and reusing a key for a different
+request is rejected. IdempotencyMiddleware captures the claimed request's
+response and stores it just before the last body chunk is sent, so a client
+that has seen the response can always replay it. Failed attempts (5xx or an
+exception) release the key so the client can retry.
+
+Stored responses expire after IDEMPOTENCY_TTL seconds; bodies larger than
+IDEMPOTENCY_MAX_BODY_BYTES are not stored (a retry gets 409 instead of the
+request running twice) and at most IDEMPOTENCY_MAX_KEYS responses are kept,
+oldest evicted first. If Redis is unavailable requests run without
+idempotency rather than failing.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import redis
+from fastapi import Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import Counter
+
+from app.core.caching import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key, by outcome",
+    ["outcome"],
+)
+
+KEY_PREFIX = "idempotency:"
+INDEX_KEY = "idempotency:index"
+MAX_KEY_LENGTH = 255
+# Response headers worth replaying; timing and length headers are regenerated
+REPLAYED_HEADERS = {b"content-type", b"location"}
+
+# Compare-and-delete, so a request whose claim expired never releases the
+# claim a retry has taken since
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class IdempotentReplay(Exception):
+    """Raised by the dependency to short-circuit a retry with the stored response."""
+
+    def __init__(self, entry: dict):
+        self.entry = entry
+
+
+def replay_response(entry: dict) -> Response:
+    if entry["body"] is None:
+        # Completed, but the response was too large to keep; the request must not run twice
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Request already processed; its response is too large to replay"},
+            headers={"idempotent-replayed": "true"},
+        )
+    headers = {name: value for name, value in entry["headers"]}
+    headers["idempotent-replayed"] = "true"
+    return Response(content=base64.b64decode(entry["body"]), status_code=entry["status"], headers=headers)
+
+
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay) -> Response:
+    return replay_response(exc.entry)
+
+
+@dataclass
+class IdempotencyClaim:
+    key: str
+    fingerprint: str
+    # The pending value written by claim(); release only deletes the key while it still holds it
+    pending: str
+    status: Optional[int] = None
+    headers: List[Tuple[str, str]] = field(default_factory=list)
+    body: bytearray = field(default_factory=bytearray)
+    oversize: bool = False
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        lock_ttl: Optional[int] = None,
+        wait: Optional[float] = None,
+        max_body_bytes: Optional[int] = None,
+        max_keys: Optional[int] = None,
+    ):
+        self.redis = async_redis_client()
+        self._release = self.redis.register_script(RELEASE_LUA)
+        self.ttl = ttl if ttl is not None else int(os.environ.get("IDEMPOTENCY_TTL", "86400"))
+        # A claim whose holder died is released after this long
+        self.lock_ttl = lock_ttl if lock_ttl is not None else int(os.environ.get("IDEMPOTENCY_LOCK_TTL", "30"))
+        self.wait = wait if wait is not None else float(os.environ.get("IDEMPOTENCY_WAIT", "10"))
+        self.max_body_bytes = (
+            max_body_bytes if max_body_bytes is not None
+            else int(os.environ.get("IDEMPOTENCY_MAX_BODY_BYTES", str(64 * 1024)))
+        )
+        self.max_keys = max_keys if max_keys is not None else int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+    @staticmethod
+    def pending_value(fingerprint: str) -> str:
+        """A claim's value; the random token makes it unique to this attempt."""
+        return json.dumps({"state": "pending", "fingerprint": fingerprint, "token": uuid.uuid4().hex})
+
+    async def claim(self, key: str, fingerprint: str, pending: str) -> Optional[dict]:
+        """
+        Claim `key` for this request by storing `pending`. Returns None once
+        claimed, or the stored entry of a completed earlier request with the same key.
+        """
+        deadline = time.monotonic() + self.wait
+        delay = 0.02
+        while True:
+            if await self.redis.set(key, pending, nx=True, ex=self.lock_ttl):
+                return None
+            raw = await self.redis.get(key)
+            if raw is None:
+                continue  # released or expired between the two calls; try again
+            entry = json.loads(raw)
+            if entry["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if entry["state"] == "done":
+                return entry
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": str(max(1, int(self.wait)))},
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def complete(self, claim: IdempotencyClaim) -> None:
+        entry = {
+            "state": "done",
+            "fingerprint": claim.fingerprint,
+            "status": claim.status,
+            "headers": claim.headers,
+            "body": None if claim.oversize else base64.b64encode(bytes(claim.body)).decode("ascii"),
+        }
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(claim.key, json.dumps(entry), ex=self.ttl)
+            pipe.zadd(INDEX_KEY, {claim.key: time.time()})
+            # Drop index entries whose responses have already expired
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", time.time() - self.ttl)
+            pipe.zcard(INDEX_KEY)
+            stored = (await pipe.execute())[-1]
+        if stored > self.max_keys:
+            evicted = await self.redis.zpopmin(INDEX_KEY, stored - self.max_keys)
+            if evicted:
+                await self.redis.delete(*(key for key, _score in evicted))
+
+    async def release(self, key: str, pending: str) -> None:
+        """Drop our claim on `key`; a no-op if it expired and was claimed again."""
+        await self._release(keys=[key], args=[pending])
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    if _store is None:
+        _store = IdempotencyStore()
+    return _store
+
+
+async def idempotent(request: Request, idempotency_key: Optional[str] = Header(None)) -> None:
+    """
+    Route dependency making a POST endpoint safe to retry with an
+    Idempotency-Key header. Requests without the header are unaffected.
+    """
+    if idempotency_key is None:
+        return
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    slot = request.scope.get("idempotency")
+    if slot is None:
+        raise RuntimeError("IdempotencyMiddleware is not installed")
+
+    # Keys are scoped to the route; the fingerprint covers everything the endpoint reads
+    key = f"{KEY_PREFIX}{request.method}:{request.url.path}:{idempotency_key}"
+    digest = hashlib.sha256(request.url.query.encode())
+    digest.update(b"\0")
+    digest.update(await request.body())
+    fingerprint = digest.hexdigest()
+
+    store = get_idempotency_store()
+    pending = store.pending_value(fingerprint)
+    try:
+        entry = await store.claim(key, fingerprint, pending)
+    except redis.RedisError as e:
+        IDEMPOTENCY_REQUESTS.labels("unavailable").inc()
+        logger.warning("Idempotency store unavailable, processing %s without it: %s", request.url.path, e)
+        return
+    if entry is not None:
+        IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+        raise IdempotentReplay(entry)
+    IDEMPOTENCY_REQUESTS.labels("claimed").inc()
+    slot.append(IdempotencyClaim(key, fingerprint, pending))
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware storing the response of requests whose key `idempotent` claimed."""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self._store = store
+
+    @property
+    def store(self) -> IdempotencyStore:
+        return self._store or get_idempotency_store()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        slot: List[IdempotencyClaim] = []
+        scope["idempotency"] = slot
+        completed = False
+
+        async def send_and_capture(message):
+            nonlocal completed
+            claim = slot[0] if slot else None
+            if claim is None:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                claim.status = message["status"]
+                claim.headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                    if name.lower() in REPLAYED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                if not claim.oversize:
+                    claim.body.extend(message.get("body", b""))
+                    if len(claim.body) > self.store.max_body_bytes:
+                        claim.oversize = True
+                        claim.body = bytearray()
+                if not message.get("more_body", False):
+                    # Store before the client can see the response, so its retry replays it
+                    completed = await self._finish(claim)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            if slot and not completed:
+                await self._release(slot[0])
+
+    async def _finish(self, claim: IdempotencyClaim) -> bool:
+        if claim.status is None or claim.status >= 500:
+            return False
+        try:
+            await self.store.complete(claim)
+            return True
+        except redis.RedisError as e:
+            logger.warning("Failed to store idempotent response for %s: %s", claim.key, e)
+            return False
+
+    async def _release(self, claim: IdempotencyClaim) -> None:
+        try:
+            await self.store.release(claim.key, claim.pending)
+        except redis.RedisError as e:
+            # The claim expires after IDEMPOTENCY_LOCK_TTL anyway
+            logger.warning("Failed to release idempotency key %s: %s", claim.key, e)
@@ -0,0 +1,281 @@
+# jobs.py
+"""
+In-process background job runner.
+
+Every worker process runs a JobRunner started from the app lifespan. Each
+job has a cron or interval schedule whose ticks fall on the same wall-clock
+instants in every worker; at each tick the workers race to claim the tick in
+Redis (SET NX), so exactly one of them runs it. A per-job lease lock keeps a
+slow run from overlapping the next tick. Runs are bounded by a timeout,
+retried with exponential backoff and limited to JOB_CONCURRENCY at a time
+per process. Jobs run on the bulk connection pool.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import redis
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.caching import async_redis_client
+from app.core.route_classes import BULK, current_route_class
+
+logger = logging.getLogger(__name__)
+
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run time, including retries", ["job"],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+JOB_RUNS = Counter("job_runs_total", "Background job runs by outcome", ["job", "outcome"])
+JOB_LAST_SUCCESS = Gauge("job_last_success_timestamp_seconds", "Unix time of the last successful run", ["job"])
+
+# Compare-and-delete, so a worker never releases a lease another worker now holds
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+# ---------------------------------------------------------------------
+# Schedules
+# ---------------------------------------------------------------------
+class Interval:
+    """Every `seconds`, on multiples of `seconds` since the epoch so all workers agree on the ticks."""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+
+    def next_after(self, now: datetime) -> datetime:
+        epoch = now.timestamp()
+        return datetime.fromtimestamp((epoch // self.seconds + 1) * self.seconds)
+
+    def __repr__(self) -> str:
+        return f"@every {self.seconds:g}s"
+
+
+def _parse_cron_field(spec: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Cron field {spec!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in server local time."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # 0 and 7 are both Sunday
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: if both are restricted, either may match
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, now: datetime) -> datetime:
+        moment = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 4)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+    def __repr__(self) -> str:
+        return self.expression
+
+
+def parse_schedule(spec: str):
+    """"@every 30s" / "@every 5m" / "@every 1h" or a five-field cron expression."""
+    spec = spec.strip()
+    if spec.startswith("@every"):
+        value = spec[len("@every"):].strip()
+        units = {"s": 1, "m": 60, "h": 3600}
+        if value and value[-1] in units:
+            return Interval(float(value[:-1]) * units[value[-1]])
+        return Interval(float(value))
+    return Cron(spec)
+
+
+# ---------------------------------------------------------------------
+# Jobs and runner
+# ---------------------------------------------------------------------
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    schedule: Any  # Interval or Cron
+    timeout: float = 600
+    retries: int = 2
+    retry_delay: float = 5
+    # Status, reported on /admin/jobs
+    next_run: Optional[datetime] = None
+    last_started: Optional[datetime] = None
+    last_finished: Optional[datetime] = None
+    last_outcome: Optional[str] = None
+    last_error: Optional[str] = None
+    last_result: Any = None
+    running: bool = False
+
+    @property
+    def lease_seconds(self) -> int:
+        # Covers every attempt and the backoff between them
+        backoff = sum(self.retry_delay * 2 ** attempt for attempt in range(self.retries))
+        return int(self.timeout * (self.retries + 1) + backoff) + 1
+
+    def status(self) -> dict:
+        return {
+            "schedule": repr(self.schedule),
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "running": self.running,
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_finished": self.last_finished.isoformat() if self.last_finished else None,
+            "last_outcome": self.last_outcome,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+        }
+
+
+class JobRunner:
+    def __init__(self, concurrency: Optional[int] = None, key_prefix: str = "jobs"):
+        self.jobs: Dict[str, Job] = {}
+        self.concurrency = concurrency if concurrency is not None else int(os.environ.get("JOB_CONCURRENCY", "2"))
+        self.key_prefix = key_prefix
+        self.redis = async_redis_client()
+        self._release = self.redis.register_script(RELEASE_LUA)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, job: Job) -> None:
+        if job.name in self.jobs:
+            raise ValueError(f"Duplicate job {job.name!r}")
+        self.jobs[job.name] = job
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._slots = asyncio.Semaphore(self.concurrency)
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+        logger.info("Job runner started: %s", ", ".join(f"{j.name} ({j.schedule!r})" for j in self.jobs.values()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> Dict[str, dict]:
+        return {name: job.status() for name, job in self.jobs.items()}
+
+    async def _loop(self, job: Job) -> None:
+        # Background work never competes with request traffic for connections
+        current_route_class.set(BULK)
+        while True:
+            job.next_run = job.schedule.next_after(datetime.now())
+            await asyncio.sleep(max(0.0, (job.next_run - datetime.now()).total_seconds()))
+            try:
+                await self.run_tick(job, job.next_run)
+            except Exception:
+                # Never let one bad tick end the schedule
+                logger.exception("Job %s tick failed", job.name)
+
+    async def run_tick(self, job: Job, tick: datetime) -> bool:
+        """Run `job` for `tick` if this worker wins it; returns whether it ran here."""
+        tick_key = f"{self.key_prefix}:tick:{job.name}:{int(tick.timestamp())}"
+        lease_key = f"{self.key_prefix}:lease:{job.name}"
+        token = secrets.token_hex(8)
+        try:
+            # Tick keys only need to outlive clock skew between workers
+            if not await self.redis.set(tick_key, token, nx=True, ex=max(60, int(job.timeout))):
+                return False
+            if not await self.redis.set(lease_key, token, nx=True, ex=job.lease_seconds):
+                JOB_RUNS.labels(job.name, "skipped_overlap").inc()
+                logger.warning("Job %s still running from an earlier tick; skipping %s", job.name, tick)
+                return False
+        except redis.RedisError as e:
+            JOB_RUNS.labels(job.name, "lock_unavailable").inc()
+            logger.warning("Job %s skipped, lock store unavailable: %s", job.name, e)
+            return False
+
+        try:
+            async with self._slots:
+                await self._run(job)
+        finally:
+            try:
+                await self._release(keys=[lease_key], args=[token])
+            except redis.RedisError as e:
+                logger.warning("Failed to release lease of job %s (expires on its own): %s", job.name, e)
+        return True
+
+    async def _run(self, job: Job) -> None:
+        job.running = True
+        job.last_started = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            for attempt in range(job.retries + 1):
+                try:
+                    job.last_result = await asyncio.wait_for(job.func(), timeout=job.timeout)
+                    job.last_outcome, job.last_error = "success", None
+                    JOB_RUNS.labels(job.name, "success").inc()
+                    JOB_LAST_SUCCESS.labels(job.name).set(time.time())
+                    return
+                except Exception as e:
+                    job.last_error = f"{type(e).__name__}: {e}"
+                    if attempt == job.retries:
+                        job.last_outcome = "failure"
+                        JOB_RUNS.labels(job.name, "failure").inc()
+                        logger.exception("Job %s failed after %d attempts", job.name, attempt + 1)
+                        return
+                    delay = job.retry_delay * 2 ** attempt
+                    JOB_RUNS.labels(job.name, "retry").inc()
+                    logger.warning("Job %s attempt %d failed, retrying in %.0fs: %s",
+                                   job.name, attempt + 1, delay, job.last_error)
+                    await asyncio.sleep(delay)
+        finally:
+            job.running = False
+            job.last_finished = datetime.utcnow()
+            JOB_DURATION.labels(job.name).observe(time.perf_counter() - started)
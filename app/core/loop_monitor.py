@@ -0,0 +1,205 @@
+# loop_monitor.py
+"""
+Event-loop lag monitor and blocking-call detector.
+
+LoopLagMonitor runs a task on the loop that sleeps for a fixed interval and
+measures how late it wakes up; the overshoot is the loop lag. A watchdog
+thread watches the task's heartbeat and, when the loop has not ticked for
+longer than the threshold, snapshots the loop thread's stack so the code
+that is blocking it shows up in the logs and on GET /admin/loop-stalls.
+
+install_blocking_guard() (enabled outside production, see
+blocking_guard_enabled) wraps known synchronous I/O calls so they raise
+BlockingCallError when invoked on a thread that is running an event loop.
+"""
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_QUANTILES = Gauge(
+    "event_loop_lag_quantile_seconds", "Event loop lag percentiles over the recent window", ["quantile"],
+)
+LOOP_STALLS = Counter("event_loop_stalls_total", "Event loop stalls longer than the lag threshold")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class BlockingCallError(RuntimeError):
+    """A known synchronous I/O call ran on the event loop thread."""
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and captures the stack of whatever blocks the loop."""
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        threshold: Optional[float] = None,
+        window: int = 600,
+        max_stalls: int = 50,
+    ):
+        self.interval = float(interval if interval is not None else os.environ.get("LOOP_LAG_INTERVAL_MS", "100")) / 1000
+        self.threshold = float(threshold if threshold is not None else os.environ.get("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+        self._samples: deque = deque(maxlen=window)
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self._heartbeat = time.monotonic()
+        self._captured_heartbeat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+    def start(self) -> None:
+        """Start the lag task on the running loop and the watchdog thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval * 2)
+            self._watchdog = None
+
+    # -----------------------------------------------------------------
+    # Measurement
+    # -----------------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = now = time.monotonic()
+            self.observe(max(0.0, now - started - self.interval))
+
+    def observe(self, lag: float) -> None:
+        self._samples.append(lag)
+        LOOP_LAG.observe(lag)
+        for quantile, value in self.percentiles().items():
+            LOOP_LAG_QUANTILES.labels(str(quantile)).set(value)
+
+    def percentiles(self) -> dict:
+        if not self._samples:
+            return {}
+        ordered = sorted(self._samples)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+    # -----------------------------------------------------------------
+    # Stall capture
+    # -----------------------------------------------------------------
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            # One capture per stall: the heartbeat does not move until the loop recovers
+            if blocked_for > self.threshold and self._captured_heartbeat != heartbeat:
+                self._captured_heartbeat = heartbeat
+                self._capture(blocked_for)
+
+    def _capture(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<loop thread not found>"
+        LOOP_STALLS.inc()
+        self.stalls.append({
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "blocked_ms": round(blocked_for * 1000, 1),
+            "stack": stack,
+        })
+        logger.warning("Event loop blocked for %.0f ms; loop thread stack:\n%s", blocked_for * 1000, stack)
+
+    def recent_stalls(self) -> List[dict]:
+        return list(reversed(self.stalls))
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Return the process-wide LoopLagMonitor (singleton)."""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
+
+
+# ---------------------------------------------------------------------
+# Blocking-call guard
+# ---------------------------------------------------------------------
+def blocking_guard_enabled() -> bool:
+    """
+    LOOP_BLOCKING_GUARD=1/0 overrides; otherwise on only when APP_ENV is
+    explicitly development or test (unset counts as production, as in require_admin).
+    """
+    explicit = os.environ.get("LOOP_BLOCKING_GUARD")
+    if explicit is not None:
+        return explicit.lower() in ("1", "true", "yes")
+    return os.environ.get("APP_ENV", "").strip().lower() in ("development", "dev", "test")
+
+
+def _on_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _guarded(func, name: str):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _on_loop_thread():
+            raise BlockingCallError(
+                f"{name} called on the event loop thread; use the async client or asyncio.to_thread"
+            )
+        return func(*args, **kwargs)
+
+    wrapper.__blocking_guard__ = True
+    return wrapper
+
+
+def _blocking_targets():
+    import smtplib
+    import redis
+
+    return [
+        (time, "sleep", "time.sleep"),
+        (redis.Redis, "execute_command", "redis.Redis (sync client)"),
+        (smtplib.SMTP, "connect", "smtplib.SMTP.connect"),
+        (smtplib.SMTP, "send", "smtplib.SMTP.send"),
+    ]
+
+
+def install_blocking_guard() -> None:
+    """Make known synchronous I/O calls raise BlockingCallError on the loop thread (idempotent)."""
+    for owner, attribute, name in _blocking_targets():
+        current = getattr(owner, attribute)
+        if not getattr(current, "__blocking_guard__", False):
+            setattr(owner, attribute, _guarded(current, name))
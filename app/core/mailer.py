@@ -0,0 +1,127 @@
+# mailer.py
+"""
+Pooled, persistent SMTP connections for sending from async code.
+
+smtplib is blocking, so every SMTP call runs in a worker thread via
+asyncio.to_thread. Up to SMTP_POOL_SIZE connections are kept open and
+reused between messages (no TCP/TLS handshake and login per email); a
+connection idle for longer than SMTP_IDLE_SECONDS, or one the server has
+dropped, is replaced transparently. Sends beyond the pool size wait for a
+free connection, which bounds concurrency against the SMTP server.
+
+    SMTP_HOST (mailhog), SMTP_PORT (1025), SMTP_USER, SMTP_PASSWORD,
+    SMTP_STARTTLS (false), SMTP_FROM (alerts@fleet.local)
+"""
+import asyncio
+import os
+import smtplib
+import time
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: Optional[bool] = None,
+        size: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+        timeout: float = 30.0,
+    ):
+        self.host = host or os.environ.get("SMTP_HOST") or "mailhog"
+        self.port = port or int(os.environ.get("SMTP_PORT") or "1025")
+        self.user = user if user is not None else os.environ.get("SMTP_USER") or None
+        self.password = password if password is not None else os.environ.get("SMTP_PASSWORD") or None
+        self.starttls = (
+            starttls if starttls is not None
+            else os.environ.get("SMTP_STARTTLS", "false").lower() in ("1", "true", "yes")
+        )
+        self.size = size if size is not None else int(os.environ.get("SMTP_POOL_SIZE", "2"))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.environ.get("SMTP_IDLE_SECONDS", "60"))
+        self.timeout = timeout
+        self.sender = os.environ.get("SMTP_FROM", "alerts@fleet.local")
+        self._slots = asyncio.Semaphore(self.size)
+        # Idle connections with the time they were last used
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+
+    # -----------------------------------------------------------------
+    # Blocking helpers (run in worker threads)
+    # -----------------------------------------------------------------
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.user:
+            conn.login(self.user, self.password or "")
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    def _send_blocking(self, conn: Optional[smtplib.SMTP], message: EmailMessage) -> smtplib.SMTP:
+        """Send on `conn` (or a new connection); returns the connection to pool, closes it on failure."""
+        pooled = conn is not None
+        if conn is None:
+            conn = self._connect()
+        try:
+            conn.send_message(message)
+            return conn
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            conn.close()
+            if not pooled:
+                raise
+        except BaseException:
+            self._close(conn)
+            raise
+        # The server dropped a pooled connection; one attempt on a fresh one
+        conn = self._connect()
+        try:
+            conn.send_message(message)
+            return conn
+        except BaseException:
+            self._close(conn)
+            raise
+
+    # -----------------------------------------------------------------
+    # Async API
+    # -----------------------------------------------------------------
+    def _checkout(self) -> Optional[smtplib.SMTP]:
+        now = time.monotonic()
+        while self._idle:
+            conn, last_used = self._idle.pop()
+            if now - last_used <= self.idle_seconds:
+                return conn
+            # Servers drop idle sessions; close it off the loop thread
+            asyncio.get_running_loop().run_in_executor(None, self._close, conn)
+        return None
+
+    async def send(self, message: EmailMessage) -> None:
+        """Send one message on a pooled connection; raises smtplib/OS errors for the caller to retry."""
+        if "From" not in message:
+            message["From"] = self.sender
+        async with self._slots:
+            conn = await asyncio.to_thread(self._send_blocking, self._checkout(), message)
+            self._idle.append((conn, time.monotonic()))
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn, _last_used in idle:
+            await asyncio.to_thread(self._close, conn)
+
+
+_pool: Optional[SMTPPool] = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    global _pool
+    if _pool is None:
+        _pool = SMTPPool()
+    return _pool
@@ -0,0 +1,207 @@
+# metrics.py
+"""
+Per-request performance accounting and Prometheus metrics.
+
+A RequestStats object is bound to a ContextVar for the lifetime of each HTTP
+request. SQLAlchemy engine events (see instrument_engine) and the
+instrumented Redis client add their timings to it, and PerformanceMiddleware
+turns it into metrics, a Server-Timing header and query-budget checks.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ["method", "route"], buckets=COUNT_BUCKETS,
+)
+REQUEST_REDIS_CALLS = Histogram(
+    "http_request_redis_calls", "Redis commands issued per request",
+    ["method", "route"], buckets=COUNT_BUCKETS,
+)
+QUERY_BUDGET_VIOLATIONS = Counter(
+    "http_request_query_budget_violations_total", "Requests that exceeded their SQL query budget",
+    ["method", "route"],
+)
+
+
+@dataclass
+class RequestStats:
+    db_time: float = 0.0
+    query_count: int = 0
+    redis_time: float = 0.0
+    redis_calls: int = 0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+# ---------------------------------------------------------------------
+# Instrumentation hooks
+# ---------------------------------------------------------------------
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Attribute SQL statement count and time to the current request."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.query_count += 1
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        # so the list on the pooled connection does not grow for the connection's lifetime
+        conn = exception_context.connection
+        if conn is not None and exception_context.statement is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def record_redis_call(elapsed: float) -> None:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.redis_time += elapsed
+        stats.redis_calls += 1
+
+
+# ---------------------------------------------------------------------
+# Query budgets
+# ---------------------------------------------------------------------
+def parse_query_budgets(raw: str) -> Dict[str, int]:
+    """
+    Parse QUERY_BUDGETS, e.g. "GET /gamification/leaderboard=2,POST /trips/=4".
+
+    Keys are "<METHOD> <route template>" as registered on the router.
+    """
+    budgets = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        key, _, value = item.rpartition("=")
+        budgets[key.strip()] = int(value)
+    return budgets
+
+
+# ---------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------
+class PerformanceMiddleware:
+    """
+    ASGI middleware recording per-route latency, DB time, query count and
+    Redis calls, and adding a Server-Timing header to every response.
+    """
+
+    def __init__(self, app, default_query_budget: Optional[int] = None, query_budgets: Optional[Dict[str, int]] = None):
+        self.app = app
+        if default_query_budget is None and os.environ.get("QUERY_BUDGET_DEFAULT"):
+            default_query_budget = int(os.environ["QUERY_BUDGET_DEFAULT"])
+        self.default_query_budget = default_query_budget
+        self.query_budgets = (
+            query_budgets if query_budgets is not None
+            else parse_query_budgets(os.environ.get("QUERY_BUDGETS", ""))
+        )
+
+    @staticmethod
+    def _route(scope) -> str:
+        # Route templates keep label cardinality bounded; unmatched paths share one label
+        route = scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                server_timing = (
+                    f'app;dur={total_ms:.1f}, '
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries", '
+                    f'redis;dur={stats.redis_time * 1000:.1f};desc="{stats.redis_calls} calls"'
+                )
+                message.setdefault("headers", []).append((b"server-timing", server_timing.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            self._observe(scope, status, time.perf_counter() - started, stats)
+
+    def _observe(self, scope, status: int, elapsed: float, stats: RequestStats) -> None:
+        method, route = scope["method"], self._route(scope)
+        REQUEST_LATENCY.labels(method, route, str(status)).observe(elapsed)
+        REQUEST_DB_TIME.labels(method, route).observe(stats.db_time)
+        REQUEST_QUERIES.labels(method, route).observe(stats.query_count)
+        REQUEST_REDIS_CALLS.labels(method, route).observe(stats.redis_calls)
+
+        budget = self.query_budgets.get(f"{method} {route}", self.default_query_budget)
+        if budget is not None and stats.query_count > budget:
+            QUERY_BUDGET_VIOLATIONS.labels(method, route).inc()
+            logger.warning(
+                "Query budget exceeded: %s %s ran %d queries (budget %d, db %.1f ms)",
+                method, route, stats.query_count, budget, stats.db_time * 1000,
+            )
+
+
+# ---------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------
+def render_metrics() -> tuple:
+    """
+    Prometheus text exposition as (body, content type).
+
+    With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR so every
+    worker's samples are aggregated instead of only the serving worker's.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
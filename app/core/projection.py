@@ -0,0 +1,36 @@
+# projection.py
+"""
+Sparse fieldsets for list endpoints (`?fields=trip_id,driver_id,eco_score`).
+
+The parsed column names go down to the service, which selects only those
+columns, so the narrowing happens in SQL rather than after loading whole
+rows. Projected rows are returned as plain dicts in a JSONResponse, which
+also skips response_model validation of the full model.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def parse_fields(model, fields: Optional[str]) -> Optional[List[str]]:
+    """Column names requested in `fields`, in request order; None means whole rows."""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}; available: {', '.join(model.model_fields)}",
+        )
+    return names or None
+
+
+def columns(model, fields: List[str]) -> list:
+    return [getattr(model, name) for name in fields]
+
+
+def sparse_response(rows) -> JSONResponse:
+    return JSONResponse(content=jsonable_encoder([dict(row) for row in rows]))
@@ -0,0 +1,248 @@
+# rate_limit.py
+"""
+Token-bucket rate limiting per driver, per client IP and per route class.
+
+Every request except raising or resolving an SOS is charged against three buckets of its route class
+(see app/core/route_classes.py): the driver's, the client IP's and the
+class-wide one shared by all clients. One Lua script refills and debits all
+three atomically in Redis.
+
+To keep Redis off the hot path the script hands out a small lease of tokens
+(RATE_LIMIT_LEASE, capped at a tenth of each bucket's burst) that this
+process then spends locally for up to RATE_LIMIT_LEASE_TTL seconds, and a
+denial is remembered locally until its Retry-After has passed.
+RateLimitMiddleware uses that memory to turn away a throttled IP before
+routing; the `rate_limit` dependency makes the authoritative decision.
+If Redis is unavailable requests are let through.
+
+Limits are "rate per second:burst" per class and scope, overridable with
+RATE_LIMITS, e.g. "interactive.driver=5:20,bulk.all=50:100".
+"""
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+
+from app.core.caching import async_redis_client
+from app.core.route_classes import BULK, CRITICAL, INTERACTIVE, SUB_REQUEST, route_class
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate limit decisions by route class, where they were made and outcome",
+    ["route_class", "source", "outcome"],
+)
+
+# Refill and debit every bucket in KEYS, or none of them.
+# ARGV[1] = tokens wanted (the lease), then rate and burst per key.
+# Returns {granted, retry_after_seconds, index of the limiting key}.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local grant = tonumber(ARGV[1])
+local wait, limiting = 0, 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    available = math.min(burst, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < 1 and (1 - available) / rate > wait then
+        wait, limiting = (1 - available) / rate, i
+    end
+    grant = math.min(grant, math.floor(available))
+end
+if wait > 0 then
+    return {0, tostring(wait), limiting}
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - grant), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return {grant, '0', 0}
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float  # tokens per second
+    burst: int
+
+
+DEFAULT_LIMITS: Dict[str, Dict[str, Limit]] = {
+    INTERACTIVE: {"driver": Limit(5, 20), "ip": Limit(50, 100), "all": Limit(1000, 2000)},
+    BULK: {"driver": Limit(0.5, 5), "ip": Limit(5, 10), "all": Limit(50, 100)},
+}
+
+
+def parse_rate_limits(raw: str) -> Dict[str, Dict[str, Limit]]:
+    """DEFAULT_LIMITS with overrides like "interactive.driver=5:20,bulk.all=50:100" applied."""
+    limits = {cls: dict(scopes) for cls, scopes in DEFAULT_LIMITS.items()}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, value = item.partition("=")
+        cls, _, scope = name.strip().partition(".")
+        rate, _, burst = value.partition(":")
+        if cls not in limits or scope not in ("driver", "ip", "all"):
+            raise ValueError(f"Unknown rate limit {name!r}; expected <interactive|bulk>.<driver|ip|all>")
+        limits[cls][scope] = Limit(float(rate), int(burst or math.ceil(float(rate))))
+    return limits
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, Limit]]] = None,
+        lease: Optional[int] = None,
+        lease_ttl: Optional[float] = None,
+    ):
+        self.redis = async_redis_client()
+        self.limits = limits if limits is not None else parse_rate_limits(os.environ.get("RATE_LIMITS", ""))
+        self.lease = lease if lease is not None else int(os.environ.get("RATE_LIMIT_LEASE", "5"))
+        self.lease_ttl = lease_ttl if lease_ttl is not None else float(os.environ.get("RATE_LIMIT_LEASE_TTL", "1"))
+        self._script = self.redis.register_script(TOKEN_BUCKET_LUA)
+        # bucket keys -> [tokens left, expires at]; bucket key -> blocked until (monotonic)
+        self._leases: Dict[Tuple[str, ...], List[float]] = {}
+        self._blocked: Dict[str, float] = {}
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def bucket_key(cls: str, scope: str, ident) -> str:
+        return f"ratelimit:{cls}:{scope}:{ident}"
+
+    def buckets(self, cls: str, driver_id: Optional[str], ip: Optional[str]) -> List[Tuple[str, Limit]]:
+        limits = self.limits[cls]
+        buckets = [(self.bucket_key(cls, "all", "*"), limits["all"])]
+        if ip:
+            buckets.append((self.bucket_key(cls, "ip", ip), limits["ip"]))
+        if driver_id:
+            buckets.append((self.bucket_key(cls, "driver", driver_id), limits["driver"]))
+        return buckets
+
+    def blocked_for(self, keys) -> float:
+        """Seconds until every one of `keys` is known to have tokens again; 0 if none is blocked locally."""
+        now = time.monotonic()
+        return max((self._blocked.get(key, 0.0) - now for key in keys), default=0.0)
+
+    def _prune(self, now: float) -> None:
+        if len(self._leases) > 10_000:
+            self._leases = {k: v for k, v in self._leases.items() if v[1] > now and v[0] >= 1}
+        if len(self._blocked) > 10_000:
+            self._blocked = {k: v for k, v in self._blocked.items() if v > now}
+
+    async def acquire(self, cls: str, driver_id: Optional[str] = None, ip: Optional[str] = None) -> float:
+        """Take one token from each of the request's buckets; returns 0 if allowed, else seconds to wait."""
+        if cls == CRITICAL:
+            return 0.0
+        buckets = self.buckets(cls, driver_id, ip)
+        keys = tuple(key for key, _limit in buckets)
+        now = time.monotonic()
+
+        wait = self.blocked_for(keys)
+        if wait > 0:
+            RATE_LIMIT_DECISIONS.labels(cls, "local", "throttled").inc()
+            return wait
+        lease = self._leases.get(keys)
+        if lease is not None and lease[0] >= 1 and lease[1] > now:
+            lease[0] -= 1
+            RATE_LIMIT_DECISIONS.labels(cls, "local", "allowed").inc()
+            return 0.0
+        if now < self._redis_down_until:
+            return 0.0
+
+        want = max(1, min([self.lease] + [limit.burst // 10 for _key, limit in buckets]))
+        args = [want]
+        for _key, limit in buckets:
+            args += [limit.rate, limit.burst]
+        try:
+            granted, wait, limiting = await self._script(keys=list(keys), args=args)
+        except redis.RedisError as e:
+            logger.warning("Rate limiter unavailable, allowing requests for 5s: %s", e)
+            self._redis_down_until = now + 5
+            return 0.0
+
+        self._prune(now)
+        granted, wait = int(granted), float(wait)
+        if granted < 1:
+            self._blocked[keys[int(limiting) - 1]] = now + wait
+            RATE_LIMIT_DECISIONS.labels(cls, "redis", "throttled").inc()
+            return wait
+        self._leases[keys] = [granted - 1, now + self.lease_ttl]
+        RATE_LIMIT_DECISIONS.labels(cls, "redis", "allowed").inc()
+        return 0.0
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+def client_ip(scope) -> Optional[str]:
+    if os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes"):
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def throttled_response(wait: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Rate limit exceeded"},
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+async def rate_limit(request: Request) -> None:
+    """Router dependency charging the request to its driver, IP and route-class buckets."""
+    cls = route_class(request.method, request.url.path)
+    if cls == CRITICAL:
+        return
+    driver_id = request.path_params.get("driver_id") or request.query_params.get("driver_id")
+    wait = await get_rate_limiter().acquire(cls, driver_id, client_ip(request.scope))
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests from an IP that this process already
+    knows is throttled, before routing, body parsing or any Redis call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope.get(SUB_REQUEST):
+            cls = route_class(scope["method"], scope["path"])
+            ip = client_ip(scope)
+            if cls != CRITICAL and ip:
+                limiter = get_rate_limiter()
+                wait = limiter.blocked_for([limiter.bucket_key(cls, "ip", ip), limiter.bucket_key(cls, "all", "*")])
+                if wait > 0:
+                    RATE_LIMIT_DECISIONS.labels(cls, "middleware", "throttled").inc()
+                    await throttled_response(wait)(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
@@ -0,0 +1,56 @@
+# route_classes.py
+"""
+Request classification shared by rate limiting and admission control.
+
+    critical     raising and resolving SOS alerts, and health probes: never
+                 throttled, never shed
+    interactive  per-driver reads and writes from the mobile app
+    bulk         analytics, exports, heatmap tiles, sync feeds, bulk edits, batch
+                 and admin work that can wait
+"""
+import re
+from contextvars import ContextVar
+from typing import Tuple
+
+CRITICAL = "critical"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+ROUTE_CLASSES = (CRITICAL, INTERACTIVE, BULK)
+
+# Class of the request being served; selects its connection pool in app/core/database.py
+current_route_class: ContextVar[str] = ContextVar("current_route_class", default=INTERACTIVE)
+
+# Scope flag of requests run in-process inside an admitted request (POST /batch
+# sub-requests): they share the parent's slot, so admission and the rate-limit
+# middleware let them through; they use the interactive pool (see BatchService)
+SUB_REQUEST = "sub_request"
+
+# POST /sos/ and POST /sos/{id}/resolve; other /sos routes are ordinary reads
+_SOS_ALERT = re.compile(r"/sos/?|/sos/[^/]+/resolve/?")
+
+# Checked in order; the first matching path prefix wins
+_PREFIXES: Tuple[Tuple[str, str], ...] = (
+    ("/healthz", CRITICAL),
+    ("/readyz", CRITICAL),
+    ("/metrics", CRITICAL),
+    ("/gamification/leaderboard", BULK),
+    ("/sos/export", BULK),
+    ("/trips/export", BULK),
+    ("/trips/stats", BULK),
+    ("/drivers/risk", BULK),
+    ("/heatmap/", BULK),
+    ("/drivers/bulk", BULK),
+    ("/vehicles/bulk", BULK),
+    ("/sync/", BULK),
+    ("/batch", BULK),
+    ("/admin/", BULK),
+)
+
+
+def route_class(method: str, path: str) -> str:
+    if method == "POST" and _SOS_ALERT.fullmatch(path):
+        return CRITICAL
+    for prefix, cls in _PREFIXES:
+        if path.startswith(prefix):
+            return cls
+    return INTERACTIVE
@@ -0,0 +1,261 @@
+# slow_queries.py
+"""
+Slow-query capture.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are recorded by normalized
+fingerprint (literals and bind placeholders collapsed) together with their
+last bound parameters and the service/repository method that issued them.
+A sampled fraction of slow SELECTs is re-run as EXPLAIN (ANALYZE, BUFFERS)
+out of band on a dedicated single-connection engine so the plan is captured
+without holding up the request. Fingerprints live in a bounded ring buffer
+served by GET /admin/slow-queries.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+logger = logging.getLogger(__name__)
+
+# Frames from these packages identify the "calling service method"
+CALLER_PACKAGES = ("app/services/", "app/data/repositories/")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+_WRITES_OR_LOCKS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b|\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE)\b", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> str:
+    """Collapse literals, bind parameters and IN lists so equivalent statements group together."""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _BIND_PARAM.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _frames():
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # Under the asyncio engine the cursor runs in a child greenlet; the awaiting
+    # coroutine chain (services, routers) hangs off the parent greenlet's frame.
+    parent = getcurrent().parent
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def calling_method() -> Optional[str]:
+    """The innermost app service/repository frame on the stack, as module.function:line."""
+    for frame in _frames():
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        if any(package in filename for package in CALLER_PACKAGES):
+            module = frame.f_globals.get("__name__", filename)
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+    return None
+
+
+def _short_repr(parameters, limit: int = 500) -> Optional[str]:
+    if parameters is None:
+        return None
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    last_parameters: Optional[str] = None
+    callers: List[str] = field(default_factory=list)
+    first_seen: Optional[str] = None
+    last_seen: Optional[str] = None
+    plan: Optional[str] = None
+    plan_captured_at: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["mean_ms"] = round(self.total_ms / self.count, 3) if self.count else 0.0
+        return data
+
+
+class SlowQueryLog:
+    """Ring buffer of slow-query fingerprints with sampled EXPLAIN plans."""
+
+    def __init__(
+        self,
+        threshold_ms: Optional[float] = None,
+        capacity: Optional[int] = None,
+        explain_sample_rate: Optional[float] = None,
+        explain_interval: Optional[float] = None,
+    ):
+        self.threshold_ms = float(
+            threshold_ms if threshold_ms is not None else os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200")
+        )
+        self.capacity = int(capacity if capacity is not None else os.environ.get("SLOW_QUERY_CAPACITY", "200"))
+        self.explain_sample_rate = float(
+            explain_sample_rate if explain_sample_rate is not None
+            else os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1")
+        )
+        # Minimum seconds between two EXPLAINs of the same fingerprint
+        self.explain_interval = float(
+            explain_interval if explain_interval is not None
+            else os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL", "300")
+        )
+        self._entries: "OrderedDict[str, SlowQuery]" = OrderedDict()
+        self._last_explained: dict = {}
+        self._pending: set = set()
+        self._explain_engine: Optional[AsyncEngine] = None
+        self._db_url: Optional[str] = None
+
+    # -----------------------------------------------------------------
+    # Capture
+    # -----------------------------------------------------------------
+    def instrument(self, engine: AsyncEngine) -> None:
+        self._db_url = engine.url
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                self.record(statement, parameters, elapsed_ms, calling_method(), executemany)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _handle_error(exception_context):
+            # Failed statements skip after_cursor_execute; slow ones (e.g. cancelled by
+            # statement_timeout) are still worth recording
+            conn = exception_context.connection
+            if conn is None or exception_context.statement is None or not conn.info.get("slow_query_start"):
+                return
+            elapsed_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                self.record(
+                    exception_context.statement, exception_context.parameters, elapsed_ms, calling_method(),
+                    bool(exception_context.execution_context and exception_context.execution_context.executemany),
+                )
+
+    def record(self, statement: str, parameters, elapsed_ms: float, caller: Optional[str] = None,
+               executemany: bool = False) -> SlowQuery:
+        key = fingerprint(statement)
+        now = datetime.now(timezone.utc).isoformat()
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            entry = SlowQuery(fingerprint=key, statement=statement, first_seen=now)
+            while len(self._entries) >= self.capacity:
+                self._entries.popitem(last=False)
+        self._entries[key] = entry  # most recently seen last
+
+        entry.count += 1
+        entry.total_ms += elapsed_ms
+        entry.max_ms = max(entry.max_ms, elapsed_ms)
+        entry.last_ms = elapsed_ms
+        entry.last_seen = now
+        entry.last_parameters = _short_repr(parameters)
+        if caller and caller not in entry.callers:
+            entry.callers = (entry.callers + [caller])[-5:]
+        logger.warning("Slow query (%.1f ms) from %s: %s", elapsed_ms, caller or "unknown", key)
+
+        if not executemany and self._should_explain(key, statement):
+            self._schedule_explain(key, statement, parameters)
+        return entry
+
+    # -----------------------------------------------------------------
+    # Sampled EXPLAIN
+    # -----------------------------------------------------------------
+    def _should_explain(self, key: str, statement: str) -> bool:
+        # ANALYZE executes the statement, so only read-only statements are replayed
+        if not _READ_ONLY.match(statement) or _WRITES_OR_LOCKS.search(statement) or self._db_url is None:
+            return False
+        if key in self._pending:
+            return False
+        if time.monotonic() - self._last_explained.get(key, float("-inf")) < self.explain_interval:
+            return False
+        return random.random() < self.explain_sample_rate
+
+    def _schedule_explain(self, key: str, statement: str, parameters) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending.add(key)
+        self._last_explained[key] = time.monotonic()
+        loop.create_task(self._explain(key, statement, parameters))
+
+    def _get_explain_engine(self) -> AsyncEngine:
+        if self._explain_engine is None:
+            # Deliberately not instrumented: EXPLAIN runs must not feed back into the log
+            self._explain_engine = create_async_engine(self._db_url, pool_size=1, max_overflow=0, pool_pre_ping=True)
+        return self._explain_engine
+
+    async def _explain(self, key: str, statement: str, parameters) -> None:
+        timeout_ms = int(os.environ.get("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000"))
+        try:
+            async with self._get_explain_engine().connect() as conn:
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) {statement}", parameters or ()
+                )
+                plan = "\n".join(row[0] for row in result)
+                await conn.rollback()
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.plan = plan
+                entry.plan_captured_at = datetime.now(timezone.utc).isoformat()
+        except Exception as e:
+            logger.warning("EXPLAIN of slow query failed: %s (%s)", key, e)
+        finally:
+            self._pending.discard(key)
+
+    # -----------------------------------------------------------------
+    # Reporting
+    # -----------------------------------------------------------------
+    def entries(self, order_by: str = "total_ms", limit: Optional[int] = None) -> List[dict]:
+        ordered = sorted(self._entries.values(), key=lambda e: getattr(e, order_by), reverse=True)
+        return [entry.to_dict() for entry in ordered[:limit]]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._last_explained.clear()
+
+    async def close(self) -> None:
+        if self._explain_engine is not None:
+            await self._explain_engine.dispose()
+            self._explain_engine = None
+
+
+_slow_query_log: Optional[SlowQueryLog] = None
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    """Return the process-wide SlowQueryLog (singleton)."""
+    global _slow_query_log
+    if _slow_query_log is None:
+        _slow_query_log = SlowQueryLog()
+    return _slow_query_log
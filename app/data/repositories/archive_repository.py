@@ -0,0 +1,262 @@
+# archive_repository.py
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+
+def get_archive_uri() -> str:
+    """Archive root: a local directory or any URI pyarrow understands (e.g. s3://bucket/prefix)."""
+    return os.environ.get("ARCHIVE_URI", "archive")
+
+
+# Explicit schemas so every file of a table agrees even when a batch is all-null in a column
+ARCHIVE_SCHEMAS: Dict[str, pa.Schema] = {
+    "fact_trip": pa.schema([
+        ("trip_id", pa.int64()),
+        ("event_ts", pa.timestamp("us")),
+        ("driver_id", pa.int64()),
+        ("vehicle_id", pa.int64()),
+        ("time_id", pa.int64()),
+        ("distance_km", pa.float64()),
+        ("avg_speed", pa.float64()),
+        ("harsh_events", pa.int64()),
+        ("eco_score", pa.float64()),
+        ("safety_score", pa.float64()),
+        ("trip_duration_sec", pa.int64()),
+        ("max_speed", pa.float64()),
+    ]),
+    "fact_sos": pa.schema([
+        ("sos_id", pa.int64()),
+        ("event_ts", pa.timestamp("us")),
+        ("driver_id", pa.int64()),
+        ("vehicle_id", pa.int64()),
+        ("time_id", pa.int64()),
+        ("location_id", pa.int64()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("severity", pa.string()),
+        ("signature_valid", pa.bool_()),
+        ("anomaly_score", pa.float64()),
+        ("resolved", pa.bool_()),
+    ]),
+    # Filed under its trip's event_ts, so a trace sits in the same month as the trip
+    "trip_trace": pa.schema([
+        ("trip_id", pa.int64()),
+        ("event_ts", pa.timestamp("us")),
+        ("start_ts", pa.timestamp("us")),
+        ("end_ts", pa.timestamp("us")),
+        ("point_count", pa.int64()),
+        ("block_size", pa.int64()),
+        ("encoding", pa.string()),
+        ("compressed", pa.bool_()),
+        ("block_index", pa.binary()),
+        ("data", pa.binary()),
+        ("created_at", pa.timestamp("us")),
+    ]),
+}
+
+# Hive-style directories: <table>/year=YYYY/month=M/<file>.parquet
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+
+class ArchiveRepository:
+    """
+    Columnar archive of cold fact rows stored as zstd-compressed Parquet.
+
+    Files are laid out per table and month so reads prune whole directories,
+    and row-group statistics let the remaining filters skip data inside files.
+    """
+
+    def __init__(self, uri: Optional[str] = None, compression: str = "zstd"):
+        self.filesystem, self.root = fs.FileSystem.from_uri(self._absolute(uri or get_archive_uri()))
+        self.compression = compression
+
+    @staticmethod
+    def _absolute(uri: str) -> str:
+        return uri if "://" in uri else os.path.abspath(uri)
+
+    def _table_root(self, table: str) -> str:
+        return f"{self.root.rstrip('/')}/{table}"
+
+    # -----------------------------------------------------------------
+    # Writes
+    # -----------------------------------------------------------------
+    def _write_month(self, table: str, year: int, month: int, rows: List[dict]) -> str:
+        schema = ARCHIVE_SCHEMAS[table]
+        directory = f"{self._table_root(table)}/year={year}/month={month}"
+        self.filesystem.create_dir(directory, recursive=True)
+        pk = schema.names[0]
+        path = f"{directory}/part-{rows[0][pk]}-{rows[-1][pk]}.parquet"
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        batch = pa.Table.from_pylist(rows, schema=schema)
+        # Write under a temporary name so readers never see a half-written file
+        pq.write_table(batch, tmp_path, filesystem=self.filesystem, compression=self.compression)
+        self.filesystem.move(tmp_path, path)
+        return path
+
+    def _write_rows(self, table: str, rows: List[dict]) -> List[str]:
+        by_month: Dict[tuple, List[dict]] = {}
+        for row in rows:
+            ts: datetime = row["event_ts"]
+            by_month.setdefault((ts.year, ts.month), []).append(row)
+        return [
+            self._write_month(table, year, month, month_rows)
+            for (year, month), month_rows in sorted(by_month.items())
+        ]
+
+    async def write_rows(self, table: str, rows: List[dict]) -> List[str]:
+        """Write one batch of rows (each with an event_ts) and return the file paths."""
+        if not rows:
+            return []
+        return await asyncio.to_thread(self._write_rows, table, rows)
+
+    # -----------------------------------------------------------------
+    # Reads
+    # -----------------------------------------------------------------
+    def _filtered(
+        self,
+        table: str,
+        driver_id: Optional[int],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        columns: Optional[List[str]],
+        limit: Optional[int] = None,
+        exclude_ids: Optional[Sequence[int]] = None,
+        only_ids: Optional[Sequence[int]] = None,
+    ) -> pa.Table:
+        schema = ARCHIVE_SCHEMAS[table]
+        columns = columns or schema.names
+        try:
+            dataset = ds.dataset(
+                self._table_root(table),
+                schema=schema.append(pa.field("year", pa.int16())).append(pa.field("month", pa.int8())),
+                format="parquet",
+                filesystem=self.filesystem,
+                partitioning=PARTITIONING,
+            )
+        except FileNotFoundError:
+            return schema.empty_table().select(columns)
+
+        expression = None
+
+        def _and(condition):
+            nonlocal expression
+            expression = condition if expression is None else expression & condition
+
+        if driver_id is not None:
+            _and(ds.field("driver_id") == driver_id)
+        # year/month prune directories; event_ts is pushed down to row-group statistics
+        if start is not None:
+            _and(ds.field("event_ts") >= pa.scalar(start, pa.timestamp("us")))
+            _and(ds.field("year") >= start.year)
+            _and((ds.field("year") > start.year) | (ds.field("month") >= start.month))
+        if end is not None:
+            _and(ds.field("event_ts") < pa.scalar(end, pa.timestamp("us")))
+            _and(ds.field("year") <= end.year)
+            _and((ds.field("year") < end.year) | (ds.field("month") <= end.month))
+        if exclude_ids:
+            _and(~ds.field(schema.names[0]).isin(pa.array(exclude_ids, pa.int64())))
+        if only_ids is not None:
+            _and(ds.field(schema.names[0]).isin(pa.array(only_ids, pa.int64())))
+        if limit is None:
+            return dataset.to_table(columns=columns, filter=expression)
+
+        # Months hold disjoint event_ts ranges: read them oldest first and stop
+        # once `limit` rows are in hand instead of loading the whole archive
+        scan_columns = columns if "event_ts" in columns else [*columns, "event_ts"]
+        months: Dict[tuple, list] = {}
+        for fragment in dataset.get_fragments(filter=expression):
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            months.setdefault((keys["year"], keys["month"]), []).append(fragment)
+        parts, rows = [], 0
+        for month in sorted(months):
+            for fragment in months[month]:
+                part = fragment.to_table(schema=dataset.schema, columns=scan_columns, filter=expression)
+                parts.append(part)
+                rows += part.num_rows
+            if rows >= limit:
+                break
+        if not parts:
+            return schema.empty_table().select(columns)
+        return pa.concat_tables(parts).sort_by("event_ts").slice(0, limit).select(columns)
+
+    async def query(
+        self,
+        table: str,
+        driver_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Archived rows of a table matching the filters, ordered by event_ts; the oldest `limit` when given."""
+        result = await asyncio.to_thread(self._filtered, table, driver_id, start, end, columns, limit)
+        if "event_ts" in result.column_names:
+            result = result.sort_by("event_ts")
+        return result.to_pylist()
+
+    def _archived_ids(self, table, ids) -> List[int]:
+        pk = ARCHIVE_SCHEMAS[table].names[0]
+        return self._filtered(table, None, None, None, [pk], only_ids=ids)[pk].to_pylist()
+
+    async def archived_ids(self, table: str, ids: Sequence[int]) -> List[int]:
+        """Which of the primary keys `ids` are already in the archive."""
+        return await asyncio.to_thread(self._archived_ids, table, ids)
+
+    def _column_arrays(self, table, columns, exclude_ids) -> Dict[str, np.ndarray]:
+        result = self._filtered(table, None, None, None, columns, exclude_ids=exclude_ids)
+        arrays = {}
+        for name in columns:
+            column = result[name]
+            if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+                column = pc.fill_null(column, 0)
+            arrays[name] = column.to_numpy()
+        return arrays
+
+    async def column_arrays(
+        self,
+        table: str,
+        columns: List[str],
+        exclude_ids: Optional[Sequence[int]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Whole archived columns as NumPy arrays (numeric nulls as 0), skipping primary keys in `exclude_ids`."""
+        return await asyncio.to_thread(self._column_arrays, table, columns, exclude_ids)
+
+    def _trip_totals(self, driver_id, start, end, exclude_trip_ids) -> dict:
+        trips = self._filtered(
+            "fact_trip", driver_id, start, end,
+            ["distance_km", "harsh_events", "eco_score", "safety_score", "max_speed"],
+            exclude_ids=exclude_trip_ids,
+        )
+        return {
+            "trip_count": trips.num_rows,
+            "total_distance_km": pc.sum(trips["distance_km"]).as_py() or 0.0,
+            "total_harsh_events": pc.sum(trips["harsh_events"]).as_py() or 0,
+            "eco_score_sum": pc.sum(trips["eco_score"]).as_py() or 0.0,
+            "eco_score_count": pc.count(trips["eco_score"]).as_py(),
+            "safety_score_sum": pc.sum(trips["safety_score"]).as_py() or 0.0,
+            "safety_score_count": pc.count(trips["safety_score"]).as_py(),
+            "max_speed": pc.max(trips["max_speed"]).as_py(),
+        }
+
+    async def trip_totals(
+        self,
+        driver_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        exclude_trip_ids: Optional[Sequence[int]] = None,
+    ) -> dict:
+        """
+        Additive trip aggregates over the archive, mergeable with the same
+        totals from Postgres; `exclude_trip_ids` are left out (rows counted there).
+        """
+        return await asyncio.to_thread(self._trip_totals, driver_id, start, end, exclude_trip_ids)
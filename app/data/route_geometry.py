@@ -0,0 +1,123 @@
+"""
+Map geometry for trip traces: Douglas–Peucker simplification per zoom level
+and Google encoded polylines.
+
+Points are projected to Web Mercator metres, where one screen pixel at zoom
+``z`` is ``MERCATOR_PIXEL_M / 2**z`` metres everywhere on the map. A level
+for zoom ``z`` keeps every point that moves the line by more than
+``TOLERANCE_PX`` pixels, so it draws the same as the full trace at that
+zoom and any zoom below it.
+
+Douglas–Peucker runs once, at the finest level's tolerance, and records for
+each kept point the distance at which it was split off, capped by its
+parents' distances. A point then belongs to the level with tolerance ``tol``
+exactly when that importance exceeds ``tol``, which gives every coarser
+level from the same pass.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6378137.0
+MERCATOR_PIXEL_M = 2 * np.pi * EARTH_RADIUS_M / 256  # metres per pixel at zoom 0
+TOLERANCE_PX = 1.0
+ZOOM_LEVELS = (6, 9, 12, 15, 18)
+POLYLINE_PRECISION = 5
+
+
+def tolerance_m(zoom: int) -> float:
+    return TOLERANCE_PX * MERCATOR_PIXEL_M / 2 ** zoom
+
+
+def level_for_zoom(zoom: int, levels: Sequence[int] = ZOOM_LEVELS) -> int:
+    """The coarsest stored level that is still exact at `zoom`."""
+    return next((level for level in sorted(levels) if level >= zoom), max(levels))
+
+
+def to_mercator(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = EARTH_RADIUS_M * np.radians(np.asarray(lon, dtype=np.float64))
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def _segment_distances(x: np.ndarray, y: np.ndarray, first: int, last: int) -> np.ndarray:
+    """Distance of points first+1..last-1 from the segment first→last."""
+    px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+    dx, dy = x[last] - x[first], y[last] - y[first]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0.0:
+        return np.hypot(px, py)
+    along = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+    return np.hypot(px - along * dx, py - along * dy)
+
+
+def dp_importance(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas–Peucker importance per point: inf for the endpoints, 0 for points
+    dropped at `tolerance`, otherwise the (parent-capped) split distance.
+    """
+    n = len(x)
+    importance = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+    # Iterative: long traces would overflow the recursion limit
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(x, y, first, last)
+        split = int(np.argmax(distances))
+        distance = float(distances[split])
+        if distance <= tolerance:
+            continue
+        split += first + 1
+        importance[split] = min(distance, cap)
+        stack.append((first, split, importance[split]))
+        stack.append((split, last, importance[split]))
+    return importance
+
+
+def simplify_levels(lat, lon, zooms: Sequence[int] = ZOOM_LEVELS) -> Dict[int, np.ndarray]:
+    """Indices of the points kept at each zoom level, from one Douglas–Peucker pass."""
+    x, y = to_mercator(lat, lon)
+    importance = dp_importance(x, y, tolerance_m(max(zooms)))
+    return {zoom: np.flatnonzero(importance > tolerance_m(zoom)) for zoom in zooms}
+
+
+def encode_polyline(lat, lon, precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline of the points, vectorised."""
+    scale = 10 ** precision
+    values = np.column_stack((
+        np.round(np.asarray(lat, dtype=np.float64) * scale).astype(np.int64),
+        np.round(np.asarray(lon, dtype=np.float64) * scale).astype(np.int64),
+    ))
+    if not len(values):
+        return ""
+    # Interleaved lat/lon deltas, zigzag-shifted like the reference encoder
+    deltas = np.diff(values, axis=0, prepend=0).ravel()
+    shifted = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    lengths = np.ones(len(shifted), dtype=np.int64)
+    remaining = shifted >> 5
+    while remaining.any():
+        lengths += remaining > 0
+        remaining >>= 5
+    owner = np.repeat(np.arange(len(shifted)), lengths)
+    position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    chunks = (shifted[owner] >> (5 * position)) & 0x1F
+    chunks |= np.where(position < lengths[owner] - 1, 0x20, 0)
+    return (chunks + 63).astype(np.uint8).tobytes().decode("ascii")
+
+
+def decode_polyline(polyline: str, precision: int = POLYLINE_PRECISION) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of encode_polyline; (lat, lon) arrays."""
+    raw = np.frombuffer(polyline.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    ends = np.flatnonzero(raw < 0x20)
+    starts = np.r_[0, ends[:-1] + 1]
+    position = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    shifted = np.add.reduceat((raw & 0x1F) << (5 * position), starts) if len(raw) else raw
+    deltas = np.where(shifted & 1, ~(shifted >> 1), shifted >> 1)
+    values = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return values[:, 0], values[:, 1]
@@ -1,7 +1,9 @@
 #models.py
 from __future__ import annotations
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime, timezone
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, LargeBinary, Text, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlmodel import SQLModel, Field
 from datetime import date as dt_date, datetime
 
@@ -11,6 +13,43 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def change_seq_field():
+    """
+    Position in the sync change feed: drawn from fact_change_seq on insert
+    and bumped by trigger on update (revision d7f3b0e5a912).
+    """
+    return Field(
+        default=None,
+        sa_type=BigInteger(),
+        sa_column_kwargs={"server_default": text("nextval('fact_change_seq')")},
+    )
+
+
+def change_xid_field():
+    """
+    Id of the transaction that last wrote the row, set alongside change_seq
+    (revision a9d4e7b2c518); the sync feed only pages past rows whose writer
+    is older than every running transaction.
+    """
+    return Field(
+        default=None,
+        sa_type=BigInteger(),
+        sa_column_kwargs={"server_default": text("(pg_current_xact_id()::text::bigint)")},
+    )
+
+
+def config_version_field():
+    """
+    Version stamp of a per-driver config section, drawn from one shared
+    sequence on insert and bumped by trigger on update (revision c4e1a7d93b20).
+    """
+    return Field(
+        default=None,
+        sa_type=BigInteger(),
+        sa_column_kwargs={"server_default": text("nextval('driver_config_version_seq')")},
+    )
+
+
 ##########################################################
 # Dimension Tables
 ##########################################################
@@ -26,7 +65,7 @@ class Driver(SQLModel, table=True):
 class Contact(SQLModel, table=True):
     __tablename__ = "dim_contact"
     contact_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     name: str = Field(max_length=100, nullable=False)
     relationship: Optional[str] = Field(default=None, max_length=50)
     phone: Optional[str] = Field(default=None, max_length=20)
@@ -37,7 +76,7 @@ class Contact(SQLModel, table=True):
 class Medical(SQLModel, table=True):
     __tablename__ = "dim_medical"
     medical_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     blood_type: Optional[str] = Field(default=None, max_length=5)
     insurance: Optional[str] = Field(default=None, max_length=100)
     allergies: Optional[str] = None
@@ -57,6 +96,10 @@ class Vehicle(SQLModel, table=True):
 
 class Time(SQLModel, table=True):
     __tablename__ = "dim_time"
+    __table_args__ = (
+        # Natural key: year/month/day/weekday are all derived from (date_value, hour)
+        Index("uq_dim_time_date_value_hour", "date_value", "hour", unique=True),
+    )
     time_id: Optional[int] = Field(default=None, primary_key=True)
     date_value: dt_date = Field(default_factory=lambda: datetime.now().date())
     year: int
@@ -80,37 +123,44 @@ class Badge(SQLModel, table=True):
     badge_name: str = Field(max_length=50, nullable=False)
     description: Optional[str] = None
     category: Optional[str] = Field(default=None, max_length=20)
+    # Award rule over DriverAggregate metrics, e.g. "trip_count >= 10 and avg_eco_score > 80"
+    # (see app/services/badge_rules_service.py); NULL for manually awarded badges
+    criteria: Optional[str] = None
+    points: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
 
 
 class Settings(SQLModel, table=True):
     __tablename__ = "dim_settings"
     settings_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     detection_sensitivity: Optional[int] = None
     auto_sos_delay: Optional[int] = None
     accelerometer_enabled: Optional[bool] = None
     gyroscope_enabled: Optional[bool] = None
     gps_enabled: Optional[bool] = None
     microphone_enabled: Optional[bool] = None
+    config_version: Optional[int] = config_version_field()
 
 
 class Notification(SQLModel, table=True):
     __tablename__ = "dim_notification"
     notification_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     push_enabled: Optional[bool] = None
     sound_enabled: Optional[bool] = None
     vibration_enabled: Optional[bool] = None
     volume: Optional[int] = None
+    config_version: Optional[int] = config_version_field()
 
 
 class Privacy(SQLModel, table=True):
     __tablename__ = "dim_privacy"
     privacy_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     data_sharing_mode: Optional[str] = Field(default=None, max_length=50)
     location_accuracy: Optional[str] = Field(default=None, max_length=50)
     local_caching: Optional[bool] = None
+    config_version: Optional[int] = config_version_field()
 
 
 class EmergencyNumber(SQLModel, table=True):
@@ -127,13 +177,14 @@ class EmergencyNumber(SQLModel, table=True):
 class Emergency(SQLModel, table=True):
     __tablename__ = "dim_emergency"
     emergency_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
     auto_contact_enabled: Optional[bool] = None
     emergency_country_code: Optional[str] = Field(
-        default=None, foreign_key="dim_emergency_number.country_code"
+        default=None, foreign_key="dim_emergency_number.country_code", index=True
     )
     share_location: Optional[bool] = None
     share_medical_info: Optional[bool] = None
+    config_version: Optional[int] = config_version_field()
 
 
 ##########################################################
@@ -142,11 +193,19 @@ class Emergency(SQLModel, table=True):
 
 class FactSOS(SQLModel, table=True):
     __tablename__ = "fact_sos"
+    __table_args__ = (
+        # Keeps the unresolved-SOS scan proportional to open incidents only
+        Index(
+            "ix_fact_sos_unresolved",
+            "time_id",
+            postgresql_where=text("resolved = false"),
+        ),
+    )
     sos_id: Optional[int] = Field(default=None, primary_key=True)
-    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
-    vehicle_id: int = Field(foreign_key="dim_vehicle.vehicle_id", nullable=False)
-    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False)
-    location_id: int = Field(foreign_key="dim_location.location_id", nullable=False)
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False, index=True)
+    vehicle_id: int = Field(foreign_key="dim_vehicle.vehicle_id", nullable=False, index=True)
+    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False, index=True)
+    location_id: int = Field(foreign_key="dim_location.location_id", nullable=False, index=True)
 
     severity: Optional[str] = Field(default=None, max_length=10)
     signature_valid: Optional[bool] = None
@@ -155,11 +214,33 @@ class FactSOS(SQLModel, table=True):
 
 
 class FactTrip(SQLModel, table=True):
+    """
+    Trips, range-partitioned by month on event_ts (see PartitionService).
+
+    event_ts denormalizes dim_time so time-windowed queries prune partitions.
+    """
     __tablename__ = "fact_trip"
-    trip_id: Optional[int] = Field(default=None, primary_key=True)
+    __table_args__ = (
+        # Per-driver trip history; also serves plain driver_id lookups
+        Index(
+            "ix_fact_trip_driver_history",
+            "driver_id",
+            "event_ts",
+            postgresql_include=["trip_id", "distance_km", "eco_score", "safety_score"],
+        ),
+        # Sync feed: a driver's changes after a cursor
+        Index("ix_fact_trip_driver_change_xid", "driver_id", "change_xid", "change_seq"),
+        # Newest-first lists read the newest partitions first and stop at the LIMIT
+        Index("ix_fact_trip_event_ts", "event_ts"),
+        {"postgresql_partition_by": "RANGE (event_ts)"},
+    )
+    trip_id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
+    event_ts: datetime = Field(default_factory=datetime.utcnow, primary_key=True, sa_type=DateTime())
     driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
-    vehicle_id: int = Field(foreign_key="dim_vehicle.vehicle_id", nullable=False)
-    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False)
+    vehicle_id: int = Field(foreign_key="dim_vehicle.vehicle_id", nullable=False, index=True)
+    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False, index=True)
 
     distance_km: Optional[float] = None
     avg_speed: Optional[float] = None
@@ -168,23 +249,214 @@ class FactTrip(SQLModel, table=True):
     safety_score: Optional[float] = None
     trip_duration_sec: Optional[int] = None
     max_speed: Optional[float] = None
+    change_seq: Optional[int] = change_seq_field()
+    change_xid: Optional[int] = change_xid_field()
 
 
 class FactGamification(SQLModel, table=True):
+    """Gamification events, range-partitioned by month on event_ts like FactTrip."""
     __tablename__ = "fact_gamification"
-    gamelog_id: Optional[int] = Field(default=None, primary_key=True)
+    __table_args__ = (
+        # Leaderboard: index-only scan over the time window, grouped by driver
+        Index(
+            "ix_fact_gamification_leaderboard",
+            "event_ts",
+            postgresql_include=["driver_id", "score_change"],
+        ),
+        Index("ix_fact_gamification_driver_time", "driver_id", "event_ts"),
+        Index("ix_fact_gamification_driver_change_xid", "driver_id", "change_xid", "change_seq"),
+        {"postgresql_partition_by": "RANGE (event_ts)"},
+    )
+    gamelog_id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
+    event_ts: datetime = Field(default_factory=datetime.utcnow, primary_key=True, sa_type=DateTime())
     driver_id: int = Field(foreign_key="dim_driver.driver_id", nullable=False)
-    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False)
-    badge_id: Optional[int] = Field(default=None, foreign_key="dim_badge.badge_id")
+    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False, index=True)
+    badge_id: Optional[int] = Field(default=None, foreign_key="dim_badge.badge_id", index=True)
 
     score_change: Optional[int] = None
     streak_days: Optional[int] = None
+    change_seq: Optional[int] = change_seq_field()
+    change_xid: Optional[int] = change_xid_field()
+
+
+class DriverAggregate(SQLModel, table=True):
+    """
+    Running per-driver totals, updated in the same transaction as each trip
+    or SOS write, that badge rules are evaluated against.
+    """
+    __tablename__ = "driver_aggregate"
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", primary_key=True)
+    trip_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    total_distance_km: float = Field(default=0.0, sa_column_kwargs={"server_default": text("0")})
+    max_trip_distance_km: Optional[float] = None
+    total_harsh_events: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    eco_score_sum: float = Field(default=0.0, sa_column_kwargs={"server_default": text("0")})
+    eco_score_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    safety_score_sum: float = Field(default=0.0, sa_column_kwargs={"server_default": text("0")})
+    safety_score_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    first_trip_at: Optional[datetime] = Field(default=None, sa_type=DateTime())
+    last_trip_at: Optional[datetime] = Field(default=None, sa_type=DateTime())
+    sos_count: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+    last_sos_at: Optional[datetime] = Field(default=None, sa_type=DateTime())
+    # Fast-path filter so satisfied rules are not re-awarded on every write
+    awarded_badge_ids: List[int] = Field(
+        default_factory=list,
+        sa_column=Column(ARRAY(Integer()), nullable=False, server_default=text("'{}'")),
+    )
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class DriverBadgeAward(SQLModel, table=True):
+    """One row per badge a driver holds; the primary key makes awarding idempotent."""
+    __tablename__ = "driver_badge_award"
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", primary_key=True)
+    badge_id: int = Field(foreign_key="dim_badge.badge_id", primary_key=True, index=True)
+    awarded_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class DriverStreak(SQLModel, table=True):
+    """
+    Server-maintained driving streak. current_streak is the length of the run
+    of consecutive days ending at last_active_day; it lapses once a whole day
+    passes without a trip (see app.services.streak_service.effective_streak).
+    """
+    __tablename__ = "driver_streak"
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", primary_key=True)
+    last_active_day: dt_date
+    current_streak: int = Field(default=1)
+    best_streak: int = Field(default=1)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class TripTrace(SQLModel, table=True):
+    """
+    GPS/speed trace of one trip as block-encoded binary (see
+    app.data.trace_codec). block_index is read on its own; data is stored
+    uncompressed by TOAST (STORAGE EXTERNAL) so single blocks can be read
+    with substring() without fetching the whole value. No foreign key:
+    fact_trip is partitioned with primary key (trip_id, event_ts), so one
+    would have to carry event_ts and be checked on every partition drop.
+    Trip deletion removes the trace and routes explicitly; archiving moves
+    the trace to the Parquet archive and drops the routes.
+    """
+    __tablename__ = "trip_trace"
+    trip_id: int = Field(primary_key=True)
+    start_ts: datetime = Field(sa_type=DateTime())
+    end_ts: datetime = Field(sa_type=DateTime())
+    point_count: int
+    block_size: int
+    encoding: str = Field(max_length=10)
+    compressed: bool
+    block_index: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class TripRoute(SQLModel, table=True):
+    """
+    Map geometry of a trip trace simplified for one zoom level, as a Google
+    encoded polyline (see app.data.route_geometry). Built with the trace
+    and, like it, without a foreign key to fact_trip.
+    """
+    __tablename__ = "trip_route"
+    trip_id: int = Field(primary_key=True)
+    zoom: int = Field(primary_key=True)
+    point_count: int
+    polyline: str = Field(sa_type=Text())
+
+
+class SOSHeatmapCell(SQLModel, table=True):
+    """
+    SOS incidents per slippy-map cell (see app.services.heatmap_service);
+    one row per occupied cell at every cell zoom.
+    """
+    __tablename__ = "sos_heatmap_cell"
+    zoom: int = Field(primary_key=True)
+    x: int = Field(primary_key=True)
+    y: int = Field(primary_key=True)
+    count: int = 0
+
+
+class DriverRisk(SQLModel, table=True):
+    """
+    Additive risk counters per driver and the score derived from them
+    (see app.services.risk_service). score is NULL until first computed.
+    """
+    __tablename__ = "driver_risk"
+    driver_id: int = Field(foreign_key="dim_driver.driver_id", primary_key=True)
+    trips: int = Field(default=0)
+    distance_km: float = Field(default=0.0)
+    harsh_events: int = Field(default=0)
+    speeding_trips: int = Field(default=0)
+    night_trips: int = Field(default=0)
+    sos_count: int = Field(default=0)
+    score: Optional[float] = Field(default=None, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class SOSNotification(SQLModel, table=True):
+    """
+    Delivery log of SOS alert emails, one row per SOS and contact. Rows are
+    written with the SOS (status "pending") and then sent asynchronously.
+    No FKs, so archiving the SOS or deleting the contact keeps its history.
+    """
+    __tablename__ = "sos_notification"
+    __table_args__ = (
+        Index("ix_sos_notification_sos_id", "sos_id"),
+        # Keeps the recovery scan proportional to undelivered rows only
+        Index("ix_sos_notification_undelivered", "created_at",
+              postgresql_where=text("status IN ('pending', 'sending')")),
+    )
+    notification_id: Optional[int] = Field(default=None, primary_key=True)
+    sos_id: int
+    contact_id: int
+    email: str = Field(max_length=100)
+    status: str = Field(default="pending", max_length=10)  # pending | sending | sent | failed
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+    claimed_at: Optional[datetime] = Field(default=None, sa_type=DateTime())
+    sent_at: Optional[datetime] = Field(default=None, sa_type=DateTime())
+
+
+class SyncTombstone(SQLModel, table=True):
+    """Deleted fact rows, kept so the sync feed can tell devices to drop them."""
+    __tablename__ = "sync_tombstone"
+    __table_args__ = (
+        Index("ix_sync_tombstone_driver_change_xid", "driver_id", "change_xid", "change_seq"),
+    )
+    change_seq: Optional[int] = Field(
+        default=None,
+        primary_key=True,
+        sa_type=BigInteger(),
+        sa_column_kwargs={"server_default": text("nextval('fact_change_seq')"), "autoincrement": False},
+    )
+    change_xid: Optional[int] = change_xid_field()
+    table_name: str = Field(max_length=50, nullable=False)
+    record_id: int = Field(sa_type=BigInteger(), nullable=False)
+    driver_id: int = Field(nullable=False)
+    deleted_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
+
+
+class ArchiveBatch(SQLModel, table=True):
+    """
+    Archive batch in flight: committed before its rows are written to Parquet
+    and deleted with the rows. A row left behind marks a batch that may sit in
+    both Postgres and the archive (see app.services.archive_service).
+    """
+    __tablename__ = "archive_batch"
+    batch_id: Optional[int] = Field(default=None, primary_key=True)
+    table_name: str = Field(max_length=50, nullable=False)
+    record_ids: List[int] = Field(sa_column=Column(ARRAY(Integer()), nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow, sa_type=DateTime())
 
 
 class FactSecurity(SQLModel, table=True):
     __tablename__ = "fact_security"
     sec_id: Optional[int] = Field(default=None, primary_key=True)
-    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False)
+    time_id: int = Field(foreign_key="dim_time.time_id", nullable=False, index=True)
 
     event_type: str = Field(max_length=50, nullable=False)  # "SOS", "Trip", "Gamification"
     ref_id: int = Field(nullable=False)                     # references fact IDs
@@ -0,0 +1,369 @@
+# synthetic.py
+"""
+Deterministic synthetic dataset generation for capacity testing.
+
+Every generator is a pure function of a seeded NumPy Generator and returns
+column arrays keyed by column name, ready for COPY. Foreign keys are either
+real ids (computed from the caller's id offsets) or, for the time dimension,
+an ``hour_index`` into the generated hour range that the loader maps onto
+``dim_time.time_id``.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+Columns = Dict[str, object]
+
+FIRST_NAMES = [
+    "Alice", "Michael", "Sofia", "Andrei", "Elena", "David", "Maria", "Ion", "Laura", "Stefan",
+    "Anna", "Lukas", "Emma", "Mihai", "Julia", "Paul", "Ioana", "Thomas", "Clara", "Radu",
+]
+LAST_NAMES = [
+    "Johnson", "Smith", "Martinez", "Popescu", "Ionescu", "Muller", "Schmidt", "Rossi", "Dubois", "Novak",
+    "Georgescu", "Weber", "Fischer", "Moreau", "Kowalski", "Dumitru", "Stan", "Meyer", "Bauer", "Costa",
+]
+LICENSE_TYPES = (["B", "C", "D", "A", "BE", "CE"], [0.62, 0.15, 0.06, 0.08, 0.05, 0.04])
+VEHICLE_MODELS = [
+    ("Toyota", "Corolla", "Sedan"), ("Volkswagen", "Golf", "Hatchback"), ("Dacia", "Logan", "Sedan"),
+    ("Ford", "Transit", "Van"), ("Tesla", "Model 3", "EV"), ("Skoda", "Octavia", "Wagon"),
+    ("Renault", "Clio", "Hatchback"), ("Mercedes", "Sprinter", "Van"), ("BMW", "X3", "SUV"),
+    ("Hyundai", "Kona", "EV"),
+]
+RELATIONSHIPS = ["Spouse", "Parent", "Sibling", "Friend", "Child"]
+BLOOD_TYPES = (["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"],
+               [0.37, 0.34, 0.09, 0.04, 0.07, 0.06, 0.02, 0.01])
+INSURERS = ["Allianz", "Generali", "AXA", "Groupama", "Omniasig", None]
+# (city, latitude, longitude, relative weight) used as SOS cluster centres
+CITIES = [
+    ("Bucharest", 44.4268, 26.1025, 10), ("Cluj-Napoca", 46.7712, 23.6236, 4),
+    ("Timisoara", 45.7489, 21.2087, 3), ("Iasi", 47.1585, 27.6014, 3),
+    ("Berlin", 52.5200, 13.4050, 8), ("Munich", 48.1351, 11.5820, 5),
+    ("Paris", 48.8566, 2.3522, 9), ("Lyon", 45.7640, 4.8357, 4),
+    ("Milan", 45.4642, 9.1900, 6), ("Vienna", 48.2082, 16.3738, 5),
+    ("Warsaw", 52.2297, 21.0122, 5), ("Budapest", 47.4979, 19.0402, 5),
+]
+ROAD_TYPES = (["Urban", "Highway", "Suburban", "Rural"], [0.45, 0.25, 0.2, 0.1])
+SEVERITIES = (["low", "moderate", "high"], [0.5, 0.35, 0.15])
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    drivers: int
+    trips: int
+    sos: int
+    start: date
+    end: date
+    seed: int = 42
+    vehicles_per_driver: float = 1.0
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    @property
+    def hours(self) -> int:
+        return self.days * 24
+
+    @property
+    def vehicles(self) -> int:
+        return max(1, int(round(self.drivers * self.vehicles_per_driver)))
+
+    def rng(self, *stream: int) -> np.random.Generator:
+        """Independent, reproducible stream per table (and per chunk)."""
+        return np.random.default_rng([self.seed, *stream])
+
+
+def _choice(rng: np.random.Generator, options: Sequence, n: int, p=None) -> List:
+    return [options[i] for i in rng.choice(len(options), size=n, p=p)]
+
+
+def _start_ts(spec: DatasetSpec) -> np.datetime64:
+    return np.datetime64(spec.start, "us")
+
+
+# ---------------------------------------------------------------------------
+# Dimensions
+# ---------------------------------------------------------------------------
+def time_dimension(spec: DatasetSpec) -> Columns:
+    """One dim_time row per hour of the range; row i has hour_index i."""
+    hours = _start_ts(spec).astype("datetime64[h]") + np.arange(spec.hours)
+    days = hours.astype("datetime64[D]")
+    stamps = hours.astype(datetime)
+    return {
+        "date_value": days.tolist(),
+        "year": [ts.year for ts in stamps],
+        "month": [ts.month for ts in stamps],
+        "day": [ts.day for ts in stamps],
+        "hour": (np.arange(spec.hours) % 24).tolist(),
+        # Monday == 0, like datetime.weekday()
+        "weekday": ((days.astype(np.int64) + 3) % 7).tolist(),
+    }
+
+
+def drivers(spec: DatasetSpec, first_id: int) -> Columns:
+    rng = spec.rng(1)
+    n = spec.drivers
+    first = rng.integers(0, len(FIRST_NAMES), n)
+    last = rng.integers(0, len(LAST_NAMES), n)
+    birth_days = rng.integers(
+        np.datetime64("1950-01-01").astype(np.int64),
+        np.datetime64("2005-12-31").astype(np.int64),
+        n,
+    ).astype("datetime64[D]")
+    return {
+        "driver_id": np.arange(first_id, first_id + n).tolist(),
+        "name": [f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in zip(first, last)],
+        "license_type": _choice(rng, LICENSE_TYPES[0], n, LICENSE_TYPES[1]),
+        "date_of_birth": birth_days.tolist(),
+    }
+
+
+def vehicles(spec: DatasetSpec, first_id: int) -> Columns:
+    rng = spec.rng(2)
+    n = spec.vehicles
+    models = rng.integers(0, len(VEHICLE_MODELS), n)
+    return {
+        "vehicle_id": np.arange(first_id, first_id + n).tolist(),
+        "make": [VEHICLE_MODELS[m][0] for m in models],
+        "model": [VEHICLE_MODELS[m][1] for m in models],
+        # Skewed towards newer cars
+        "year": (2025 - np.minimum(rng.geometric(0.12, n) - 1, 20)).tolist(),
+        "type": [VEHICLE_MODELS[m][2] for m in models],
+    }
+
+
+def contacts(spec: DatasetSpec, driver_ids: np.ndarray, first_id: int) -> Columns:
+    rng = spec.rng(3)
+    per_driver = rng.integers(1, 4, len(driver_ids))
+    owner = np.repeat(driver_ids, per_driver)
+    n = len(owner)
+    # The first contact of every driver is the primary one
+    is_primary = np.ones(n, dtype=bool)
+    is_primary[1:] = owner[1:] != owner[:-1]
+    first = rng.integers(0, len(FIRST_NAMES), n)
+    last = rng.integers(0, len(LAST_NAMES), n)
+    phones = rng.integers(700_000_000, 799_999_999, n)
+    ids = np.arange(first_id, first_id + n)
+    return {
+        "contact_id": ids.tolist(),
+        "driver_id": owner.tolist(),
+        "name": [f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in zip(first, last)],
+        "relationship": _choice(rng, RELATIONSHIPS, n),
+        "phone": [f"+40{p}" for p in phones],
+        "email": [f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{i}@example.com"
+                  for f, l, i in zip(first, last, ids)],
+        "is_primary": is_primary.tolist(),
+    }
+
+
+def medical(spec: DatasetSpec, driver_ids: np.ndarray, first_id: int) -> Columns:
+    rng = spec.rng(4)
+    n = len(driver_ids)
+    has_allergy = rng.random(n) < 0.2
+    return {
+        "medical_id": np.arange(first_id, first_id + n).tolist(),
+        "driver_id": driver_ids.tolist(),
+        "blood_type": _choice(rng, BLOOD_TYPES[0], n, BLOOD_TYPES[1]),
+        "insurance": _choice(rng, INSURERS, n),
+        "allergies": [
+            allergy if has else None
+            for allergy, has in zip(_choice(rng, ["Penicillin", "Pollen", "Latex"], n), has_allergy)
+        ],
+        "medications": [None] * n,
+        "conditions": [None] * n,
+        "instructions": [None] * n,
+    }
+
+
+def driver_preferences(spec: DatasetSpec, driver_ids: np.ndarray, country_codes: Sequence[str]) -> Dict[str, Columns]:
+    """dim_settings / dim_notification / dim_privacy / dim_emergency, one row per driver."""
+    rng = spec.rng(5)
+    n = len(driver_ids)
+    ids = driver_ids.tolist()
+    flag = lambda p: (rng.random(n) < p).tolist()
+    return {
+        "dim_settings": {
+            "driver_id": ids,
+            "detection_sensitivity": rng.integers(1, 6, n).tolist(),
+            "auto_sos_delay": rng.choice([10, 15, 30, 60], n).tolist(),
+            "accelerometer_enabled": flag(0.95),
+            "gyroscope_enabled": flag(0.9),
+            "gps_enabled": flag(0.98),
+            "microphone_enabled": flag(0.4),
+        },
+        "dim_notification": {
+            "driver_id": ids,
+            "push_enabled": flag(0.85),
+            "sound_enabled": flag(0.7),
+            "vibration_enabled": flag(0.8),
+            "volume": rng.integers(0, 101, n).tolist(),
+        },
+        "dim_privacy": {
+            "driver_id": ids,
+            "data_sharing_mode": _choice(rng, ["full", "anonymized", "none"], n, [0.5, 0.4, 0.1]),
+            "location_accuracy": _choice(rng, ["precise", "approximate"], n, [0.8, 0.2]),
+            "local_caching": flag(0.6),
+        },
+        "dim_emergency": {
+            "driver_id": ids,
+            "auto_contact_enabled": flag(0.75),
+            "emergency_country_code": _choice(rng, list(country_codes), n) if country_codes else [None] * n,
+            "share_location": flag(0.9),
+            "share_medical_info": flag(0.5),
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Facts
+# ---------------------------------------------------------------------------
+def driver_profiles(spec: DatasetSpec) -> Dict[str, np.ndarray]:
+    """Per-driver activity weight (heavy-tailed) and aggressiveness, shared by the fact generators."""
+    rng = spec.rng(6)
+    activity = rng.lognormal(0.0, 1.0, spec.drivers)
+    return {
+        "activity": activity / activity.sum(),
+        "aggressiveness": rng.gamma(2.0, 0.5, spec.drivers),
+        "vehicle": rng.integers(0, spec.vehicles, spec.drivers),
+    }
+
+
+def trips_chunk(
+    spec: DatasetSpec,
+    profiles: Dict[str, np.ndarray],
+    chunk: int,
+    size: int,
+    first_driver_id: int,
+    first_vehicle_id: int,
+) -> Columns:
+    """
+    One chunk of fact_trip rows.
+
+    Trips cluster around the morning and evening commute, distances are
+    log-normal, and harsh events scale with distance and the driver's
+    aggressiveness; scores follow from harsh events and speeding.
+    """
+    rng = spec.rng(7, chunk)
+    driver = rng.choice(spec.drivers, size=size, p=profiles["activity"])
+    day = rng.integers(0, spec.days, size)
+    commute = rng.random(size)
+    hour = np.where(
+        commute < 0.35, rng.normal(8.0, 1.2, size),
+        np.where(commute < 0.7, rng.normal(17.5, 1.5, size), rng.uniform(0, 24, size)),
+    )
+    hour = np.clip(hour, 0, 23).astype(np.int64)
+    hour_index = day * 24 + hour
+    event_ts = _start_ts(spec) + hour_index.astype("timedelta64[h]") + rng.integers(0, 3600, size).astype("timedelta64[s]")
+
+    distance = np.clip(rng.lognormal(np.log(15), 0.9, size), 0.5, 900.0)
+    avg_speed = np.clip(rng.normal(35 + 10 * np.log1p(distance / 10), 8), 10, 130)
+    duration = (distance / avg_speed * 3600).astype(np.int64)
+    max_speed = np.minimum(avg_speed + rng.gamma(2.0, 10.0, size), 220)
+    harsh = rng.poisson(profiles["aggressiveness"][driver] * (distance / 25 + 0.2))
+    speeding = np.maximum(0, max_speed - 110)
+    eco = np.clip(95 - 4 * harsh - 0.25 * speeding + rng.normal(0, 5, size), 0, 100)
+    safety = np.clip(98 - 6 * harsh - 0.4 * speeding + rng.normal(0, 4, size), 0, 100)
+
+    return {
+        "driver_id": (driver + first_driver_id).tolist(),
+        "vehicle_id": (profiles["vehicle"][driver] + first_vehicle_id).tolist(),
+        "hour_index": hour_index,
+        "event_ts": event_ts.tolist(),
+        "distance_km": np.round(distance, 2).tolist(),
+        "avg_speed": np.round(avg_speed, 1).tolist(),
+        "harsh_events": harsh.tolist(),
+        "eco_score": np.round(eco, 1).tolist(),
+        "safety_score": np.round(safety, 1).tolist(),
+        "trip_duration_sec": duration.tolist(),
+        "max_speed": np.round(max_speed, 1).tolist(),
+        # Kept for the streak computation, not loaded
+        "_driver_index": driver,
+        "_day": day,
+    }
+
+
+def sos_events(
+    spec: DatasetSpec,
+    profiles: Dict[str, np.ndarray],
+    first_location_id: int,
+    first_driver_id: int,
+    first_vehicle_id: int,
+) -> Dict[str, Columns]:
+    """SOS events clustered around cities, with one dim_location row each."""
+    rng = spec.rng(8)
+    n = spec.sos
+    weights = np.array([c[3] for c in CITIES], dtype=float)
+    city = rng.choice(len(CITIES), size=n, p=weights / weights.sum())
+    lat = np.array([c[1] for c in CITIES])[city] + rng.normal(0, 0.04, n)
+    lon = np.array([c[2] for c in CITIES])[city] + rng.normal(0, 0.06, n)
+
+    risk = profiles["activity"] * profiles["aggressiveness"]
+    driver = rng.choice(spec.drivers, size=n, p=risk / risk.sum())
+    hour_index = rng.integers(0, spec.hours, n)
+    severity_idx = rng.choice(3, size=n, p=SEVERITIES[1])
+    anomaly = np.clip(rng.beta(2, 5, n) + 0.2 * severity_idx, 0, 1)
+    # Everything older than two days has been handled; recent ones are open about half the time
+    recent = hour_index >= spec.hours - 48
+    resolved = ~recent | (rng.random(n) < 0.5)
+    location_ids = np.arange(first_location_id, first_location_id + n)
+
+    return {
+        "dim_location": {
+            "location_id": location_ids.tolist(),
+            "latitude": np.round(lat, 6).tolist(),
+            "longitude": np.round(lon, 6).tolist(),
+            "city": [CITIES[c][0] for c in city],
+            "road_type": _choice(rng, ROAD_TYPES[0], n, ROAD_TYPES[1]),
+        },
+        "fact_sos": {
+            "driver_id": (driver + first_driver_id).tolist(),
+            "vehicle_id": (profiles["vehicle"][driver] + first_vehicle_id).tolist(),
+            "hour_index": hour_index,
+            "location_id": location_ids.tolist(),
+            "severity": [SEVERITIES[0][s] for s in severity_idx],
+            "signature_valid": (rng.random(n) < 0.97).tolist(),
+            "anomaly_score": np.round(anomaly, 4).tolist(),
+            "resolved": resolved.tolist(),
+        },
+    }
+
+
+def gamification_streaks(
+    spec: DatasetSpec,
+    driver_index: np.ndarray,
+    day: np.ndarray,
+    first_driver_id: int,
+    streak_badge_id: Optional[int] = None,
+) -> Columns:
+    """
+    One gamification event per active driver-day, with streak_days counting
+    consecutive active days; every 7th day of a streak awards the badge.
+    """
+    key = np.unique(driver_index.astype(np.int64) * spec.days + day)
+    driver = key // spec.days
+    active_day = key % spec.days
+    new_run = np.ones(len(key), dtype=bool)
+    new_run[1:] = (driver[1:] != driver[:-1]) | (active_day[1:] != active_day[:-1] + 1)
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(len(key)), 0))
+    streak = np.arange(len(key)) - run_start + 1
+
+    rng = spec.rng(9)
+    hour_index = active_day * 24 + 23
+    milestone = streak % 7 == 0
+    badge = [streak_badge_id if m and streak_badge_id is not None else None for m in milestone]
+    score = 5 + np.minimum(streak, 30) + rng.integers(0, 6, len(key)) + np.where(milestone, 50, 0)
+    return {
+        "driver_id": (driver + first_driver_id).tolist(),
+        "hour_index": hour_index,
+        "event_ts": (_start_ts(spec) + hour_index.astype("timedelta64[h]")).tolist(),
+        "badge_id": badge,
+        "score_change": score.tolist(),
+        "streak_days": streak.tolist(),
+    }
+
+
+def default_range(days: int, end: Optional[date] = None) -> tuple:
+    end = end or datetime.utcnow().date()
+    return end - timedelta(days=days - 1), end
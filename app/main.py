@@ -1,15 +1,49 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import asyncio
+import os
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from app.api import api_router
+from app.core.admission import AdmissionMiddleware
+from app.core.caching import close_async_redis_client
+from app.core.compression import CompressionMiddleware
 from app.core.database import get_db_provider
+from app.core.idempotency import IdempotencyMiddleware, IdempotentReplay, idempotent_replay_handler
+from app.core.loop_monitor import blocking_guard_enabled, get_loop_monitor, install_blocking_guard
+from app.core.metrics import PerformanceMiddleware, render_metrics
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.slow_queries import get_slow_query_log
+from app.core.dependencies import get_cache_service
+from app.services.dimension_cache import get_dimension_cache
+from app.services.scheduled_jobs import ScheduledJobs
+from app.services.sos_notification_service import get_sos_notifier
+from app.services.warmup_service import WarmupService
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
+    if blocking_guard_enabled():
+        install_blocking_guard()
+    loop_monitor = get_loop_monitor()
+    loop_monitor.start()
+    # Warm up in the background so /healthz answers immediately; /readyz gates traffic
+    app.state.warmup = WarmupService(get_db_provider(), get_cache_service(), get_dimension_cache())
+    warmup_task = asyncio.create_task(app.state.warmup.run())
+    get_sos_notifier().start()
+    # Every worker schedules the jobs; a Redis claim per tick lets exactly one run each
+    app.state.jobs = ScheduledJobs(get_db_provider(), get_cache_service()).build_runner()
+    if os.environ.get("JOBS_ENABLED", "true").lower() in ("1", "true", "yes"):
+        app.state.jobs.start()
     yield
+    await app.state.jobs.stop()
+    await get_sos_notifier().stop()
+    warmup_task.cancel()
+    await loop_monitor.stop()
+    await close_async_redis_client()
     db_provider = get_db_provider()
     await db_provider.close()
+    await get_slow_query_log().close()
 
 
 app = FastAPI(
@@ -18,11 +52,37 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Stores responses of POSTs sent with an Idempotency-Key; see app/core/idempotency.py
+app.add_middleware(IdempotencyMiddleware)
+app.add_exception_handler(IdempotentReplay, idempotent_replay_handler)
+# Outside the idempotency store so replays are encoded per request; see app/core/compression.py
+app.add_middleware(CompressionMiddleware)
+# Per-route-class concurrency slots and DB pools, shedding low-priority work; see app/core/admission.py
+app.add_middleware(AdmissionMiddleware)
+# Turns away already-throttled clients before routing; see app/core/rate_limit.py
+app.add_middleware(RateLimitMiddleware)
+# Per-route latency, DB time, query count and Redis calls; see app/core/metrics.py
+app.add_middleware(PerformanceMiddleware)
+
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+async def readyz(request: Request):
+    warmup = request.app.state.warmup
+    if not warmup.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "error": warmup.error})
+    return {"status": "ready", "warmup": warmup.report}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # ✅ Only include the real app routers
 app.include_router(api_router)
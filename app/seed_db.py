@@ -1,158 +1,318 @@
+"""
+Synthetic data generator / seeder.
+
+    python -m app.seed_db                                   # small dev dataset
+    python -m app.seed_db --drivers 50000 --trips 1000000 --sos 20000 --days 365
+    python -m app.seed_db --truncate --seed 7
+
+Rows are generated deterministically (same arguments and --seed, same data)
+by app.data.synthetic and bulk-loaded with binary COPY. New rows are
+appended after the current max ids unless --truncate is given.
+emergency_numbers.csv is upserted, so re-running is safe.
+"""
+import argparse
 import asyncio
-from datetime import date, datetime
-from sqlmodel import SQLModel
-from app.core.database import get_db_provider
-from app.data.schemas.models import (
-    Driver, Vehicle, Location, Time, Badge,
-    FactTrip, FactSOS, FactGamification, EmergencyNumber
-)
-
-
-async def seed():
-    db_provider = get_db_provider()
-    session_factory = db_provider.get_session_factory()
-
-    async with session_factory() as session:
-        # --- Drivers ---
-        d1 = Driver(name="Alice Johnson", license_type="B", date_of_birth=date(1987, 4, 12))
-        d2 = Driver(name="Michael Smith", license_type="C", date_of_birth=date(1979, 8, 23))
-        d3 = Driver(name="Sofia Martinez", license_type="B", date_of_birth=date(1992, 1, 30))
-        session.add_all([d1, d2, d3])
-        await session.commit()
-        await session.refresh(d1)
-        await session.refresh(d2)
-        await session.refresh(d3)
-
-        # --- Vehicles ---
-        v1 = Vehicle(make="Toyota", model="Corolla", year=2019, type="Sedan")
-        v2 = Vehicle(make="Ford", model="Transit", year=2021, type="Van")
-        v3 = Vehicle(make="Tesla", model="Model 3", year=2022, type="EV")
-        session.add_all([v1, v2, v3])
-        await session.commit()
-
-        # --- Locations ---
-        loc1 = Location(latitude=40.7128, longitude=-74.0060, city="New York", road_type="Highway")
-        loc2 = Location(latitude=34.0522, longitude=-118.2437, city="Los Angeles", road_type="Urban")
-        loc3 = Location(latitude=41.8781, longitude=-87.6298, city="Chicago", road_type="Suburban")
-        session.add_all([loc1, loc2, loc3])
-        await session.commit()
-
-        # --- Time ---
-        now = datetime.utcnow()
-        t1 = Time(date=now.date(), year=now.year, month=now.month,
-                  day=now.day, hour=now.hour, weekday=now.weekday())
-        session.add(t1)
-        await session.commit()
-
-        # --- Badges ---
-        b1 = Badge(badge_name="Eco Driver", description="Maintained >80 eco score", category="Eco")
-        b2 = Badge(badge_name="Safe Driver", description="No incidents in 30 days", category="Safety")
-        b3 = Badge(badge_name="Marathoner", description="Completed trip >500 km", category="Endurance")
-        session.add_all([b1, b2, b3])
-        await session.commit()
-
-        # --- Trips ---
-        trip1 = FactTrip(driver_id=d1.driver_id, vehicle_id=v1.vehicle_id, time_id=t1.time_id,
-                         distance_km=120.5, avg_speed=75.3, harsh_events=1,
-                         eco_score=82.0, safety_score=90.0, trip_duration_sec=5800, max_speed=110.0)
-        trip2 = FactTrip(driver_id=d2.driver_id, vehicle_id=v2.vehicle_id, time_id=t1.time_id,
-                         distance_km=450.2, avg_speed=68.0, harsh_events=4,
-                         eco_score=70.0, safety_score=78.0, trip_duration_sec=20000, max_speed=125.0)
-        session.add_all([trip1, trip2])
-        await session.commit()
-
-        # --- SOS event ---
-        sos1 = FactSOS(driver_id=d3.driver_id, vehicle_id=v3.vehicle_id, time_id=t1.time_id,
-                       location_id=loc2.location_id, severity="moderate",
-                       signature_valid=True, anomaly_score=0.87, resolved=False)
-        session.add(sos1)
-        await session.commit()
-
-        # --- Gamification ---
-        g1 = FactGamification(driver_id=d1.driver_id, time_id=t1.time_id, badge_id=b1.badge_id,
-                              score_change=20, streak_days=5)
-        g2 = FactGamification(driver_id=d2.driver_id, time_id=t1.time_id, badge_id=b2.badge_id,
-                              score_change=15, streak_days=3)
-        g3 = FactGamification(driver_id=d3.driver_id, time_id=t1.time_id, badge_id=b3.badge_id,
-                              score_change=30, streak_days=10)
-        session.add_all([g1, g2, g3])
-        await session.commit()
-
-        # --- Emergency Numbers ---
-        emergency_numbers = [
-            ("AL", "Albania", "127"),
-            ("AD", "Andorra", "112"),
-            ("AT", "Austria", "144"),
-            ("BY", "Belarus", "103"),
-            ("BE", "Belgium", "100"),
-            ("BA", "Bosnia and Herzegovina", "124"),
-            ("BG", "Bulgaria", "112"),
-            ("HR", "Croatia", "194"),
-            ("CY", "Cyprus", "112"),
-            ("CZ", "Czechia", "155"),
-            ("DK", "Denmark", "112"),
-            ("EE", "Estonia", "112"),
-            ("FI", "Finland", "112"),
-            ("FR", "France", "15"),
-            ("DE", "Germany", "112"),
-            ("GR", "Greece", "166"),
-            ("HU", "Hungary", "104"),
-            ("IS", "Iceland", "112"),
-            ("IE", "Ireland", "112"),
-            ("IT", "Italy", "118"),
-            ("LV", "Latvia", "113"),
-            ("LT", "Lithuania", "112"),
-            ("LU", "Luxembourg", "112"),
-            ("MT", "Malta", "112"),
-            ("MD", "Moldova", "112"),
-            ("MC", "Monaco", "15"),
-            ("ME", "Montenegro", "124"),
-            ("NL", "Netherlands", "112"),
-            ("NO", "Norway", "113"),
-            ("PL", "Poland", "999"),
-            ("PT", "Portugal", "112"),
-            ("RO", "Romania", "112"),
-            ("RU", "Russia", "103"),
-            ("RS", "Serbia", "194"),
-            ("SK", "Slovakia", "155"),
-            ("SI", "Slovenia", "112"),
-            ("ES", "Spain", "061"),
-            ("SE", "Sweden", "112"),
-            ("CH", "Switzerland", "144"),
-            ("TR", "Turkey", "112"),
-            ("UA", "Ukraine", "103"),
-            ("GB", "United Kingdom", "999"),
-            ("US", "United States", "911"),
-            ("CA", "Canada", "911"),
-            ("MX", "Mexico", "911"),
-            ("BR", "Brazil", "192"),
-            ("AR", "Argentina", "107"),
-            ("AU", "Australia", "000"),
-            ("NZ", "New Zealand", "111"),
-            ("JP", "Japan", "119"),
-            ("CN", "China", "120"),
-            ("IN", "India", "102"),
-            ("ZA", "South Africa", "10177"),
-            ("SA", "Saudi Arabia", "997"),
-            ("AE", "United Arab Emirates", "998"),
-            ("KR", "South Korea", "119"),
-            ("SG", "Singapore", "995"),
-            ("MY", "Malaysia", "999"),
-            ("TH", "Thailand", "1669"),
-            ("PH", "Philippines", "911"),
-            ("VN", "Vietnam", "115"),
-            ("IL", "Israel", "101"),
-            ("HK", "Hong Kong", "999"),
-            ("TW", "Taiwan", "119"),
+import csv
+import pathlib
+import time
+from datetime import date, datetime, timedelta
+
+import asyncpg
+import numpy as np
+
+from app.core.database import build_async_db_url
+from app.data import synthetic
+from app.services.badge_rules_service import REBUILD_AGGREGATES_SQL
+from app.services.heatmap_service import bin_cells
+from app.services.risk_service import compute_counters, risk_scores
+from app.services.streak_service import EPOCH, compute_streaks
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+EMERGENCY_NUMBERS_CSV = ROOT / "emergency_numbers.csv"
+
+# (name, description, category, criteria, points); criteria syntax in app.services.badge_rules_service
+DEFAULT_BADGES = [
+    ("Eco Driver", "Maintained >80 eco score", "Eco", "trip_count >= 10 and avg_eco_score > 80", 50),
+    ("Safe Driver", "No incidents in 30 days", "Safety", "days_since_last_sos >= 30 and days_active >= 30", 50),
+    ("Marathoner", "Completed trip >500 km", "Endurance", "max_trip_distance_km > 500", 100),
+    ("Streak Keeper", "Drove 7 days in a row", "Streak", "best_streak >= 7", 25),
+]
+
+TRUNCATE_TABLES = [
+    "fact_trip", "fact_gamification", "fact_sos", "fact_security", "sync_tombstone",
+    "trip_trace", "trip_route", "driver_badge_award", "driver_aggregate", "driver_streak", "driver_risk",
+    "sos_notification", "sos_heatmap_cell",
+    "dim_contact", "dim_medical", "dim_settings", "dim_notification", "dim_privacy", "dim_emergency",
+    "dim_location", "dim_time", "dim_vehicle", "dim_driver",
+]
+
+# table -> serial primary key column, for appending after existing rows and fixing sequences
+SERIAL_KEYS = {
+    "dim_driver": "driver_id",
+    "dim_vehicle": "vehicle_id",
+    "dim_contact": "contact_id",
+    "dim_medical": "medical_id",
+    "dim_location": "location_id",
+    "dim_settings": "settings_id",
+    "dim_notification": "notification_id",
+    "dim_privacy": "privacy_id",
+    "dim_emergency": "emergency_id",
+    "fact_trip": "trip_id",
+    "fact_sos": "sos_id",
+    "fact_gamification": "gamelog_id",
+}
+
+
+class Loader:
+    """COPY-based bulk loader on a single asyncpg connection."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+        self.counts = {}
+
+    async def copy(self, table: str, columns: dict) -> int:
+        names = [name for name in columns if not name.startswith("_") and name != "hour_index"]
+        records = list(zip(*(columns[name] for name in names)))
+        if records:
+            await self.conn.copy_records_to_table(table, records=records, columns=names)
+        self.counts[table] = self.counts.get(table, 0) + len(records)
+        return len(records)
+
+    async def next_id(self, table: str) -> int:
+        key = SERIAL_KEYS[table]
+        return await self.conn.fetchval(f"SELECT coalesce(max({key}), 0) + 1 FROM {table}")
+
+    async def sync_sequences(self) -> None:
+        for table, key in SERIAL_KEYS.items():
+            await self.conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+                f"(SELECT coalesce(max({key}), 0) + 1 FROM {table}), false)"
+            )
+
+
+async def load_emergency_numbers(conn: asyncpg.Connection, path: pathlib.Path = EMERGENCY_NUMBERS_CSV) -> list:
+    """Upsert dim_emergency_number from the CSV; returns the country codes."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [
+            (row["country_code"], row["country_name"], row["ambulance_number"], row.get("notes") or None)
+            for row in csv.DictReader(f)
         ]
+    await conn.execute(
+        "CREATE TEMP TABLE _emergency_numbers (LIKE dim_emergency_number INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    await conn.copy_records_to_table(
+        "_emergency_numbers", records=rows,
+        columns=["country_code", "country_name", "ambulance_number", "notes"],
+    )
+    await conn.execute("""
+        INSERT INTO dim_emergency_number (country_code, country_name, ambulance_number, notes)
+        SELECT country_code, country_name, ambulance_number, notes FROM _emergency_numbers
+        ON CONFLICT (country_code) DO UPDATE
+        SET country_name = EXCLUDED.country_name,
+            ambulance_number = EXCLUDED.ambulance_number,
+            notes = EXCLUDED.notes
+    """)
+    return [row[0] for row in rows]
+
+
+async def ensure_badges(conn: asyncpg.Connection) -> dict:
+    """Insert the default badges that do not exist yet; returns name -> badge_id."""
+    for name, description, category, criteria, points in DEFAULT_BADGES:
+        await conn.execute(
+            """
+            INSERT INTO dim_badge (badge_name, description, category, criteria, points)
+            SELECT $1::varchar, $2::varchar, $3::varchar, $4::varchar, $5::integer
+            WHERE NOT EXISTS (SELECT 1 FROM dim_badge WHERE badge_name = $1::varchar)
+            """,
+            name, description, category, criteria, points,
+        )
+    rows = await conn.fetch("SELECT badge_name, min(badge_id) AS badge_id FROM dim_badge GROUP BY badge_name")
+    return {row["badge_name"]: row["badge_id"] for row in rows}
+
+
+async def load_time_dimension(conn: asyncpg.Connection, spec: synthetic.DatasetSpec) -> np.ndarray:
+    """Upsert the hourly time rows of the range; returns time_id indexed by hour_index."""
+    columns = synthetic.time_dimension(spec)
+    names = list(columns)
+    await conn.execute(
+        f"CREATE TEMP TABLE _dim_time ON COMMIT DROP AS SELECT {', '.join(names)} FROM dim_time WITH NO DATA"
+    )
+    await conn.copy_records_to_table("_dim_time", records=list(zip(*columns.values())), columns=names)
+    await conn.execute(f"""
+        INSERT INTO dim_time ({', '.join(names)})
+        SELECT {', '.join(names)} FROM _dim_time
+        ON CONFLICT (date_value, hour) DO NOTHING
+    """)
+    rows = await conn.fetch(
+        "SELECT date_value, hour, time_id FROM dim_time WHERE date_value BETWEEN $1 AND $2",
+        spec.start, spec.end,
+    )
+    time_ids = np.zeros(spec.hours, dtype=np.int64)
+    for row in rows:
+        time_ids[(row["date_value"] - spec.start).days * 24 + row["hour"]] = row["time_id"]
+    return time_ids
+
+
+async def ensure_partitions(conn: asyncpg.Connection, spec: synthetic.DatasetSpec) -> None:
+    await conn.execute("""
+        SELECT ensure_monthly_partition(p, p, m::date)
+        FROM unnest(ARRAY['fact_trip', 'fact_gamification']) p,
+             generate_series(date_trunc('month', $1::date), $2::date, interval '1 month') m
+    """, spec.start, spec.end)
+
+
+def _report(label: str, rows: int, started: float) -> None:
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"  {label:<22} {rows:>10,} rows  {elapsed:7.2f}s  {rows / elapsed:>12,.0f} rows/s", flush=True)
+
+
+async def generate(spec: synthetic.DatasetSpec, truncate: bool = False, chunk_size: int = 200_000) -> dict:
+    dsn = build_async_db_url().replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(dsn)
+    try:
+        async with conn.transaction():
+            loader = Loader(conn)
+            if truncate:
+                await conn.execute(f"TRUNCATE {', '.join(TRUNCATE_TABLES)} RESTART IDENTITY CASCADE")
+
+            started = time.perf_counter()
+            country_codes = await load_emergency_numbers(conn)
+            badges = await ensure_badges(conn)
+            time_ids = await load_time_dimension(conn, spec)
+            await ensure_partitions(conn, spec)
+            _report("reference data", len(country_codes) + spec.hours, started)
+
+            first = {table: await loader.next_id(table) for table in SERIAL_KEYS}
+
+            started = time.perf_counter()
+            driver_cols = synthetic.drivers(spec, first["dim_driver"])
+            driver_ids = np.asarray(driver_cols["driver_id"])
+            rows = await loader.copy("dim_driver", driver_cols)
+            rows += await loader.copy("dim_vehicle", synthetic.vehicles(spec, first["dim_vehicle"]))
+            rows += await loader.copy("dim_contact", synthetic.contacts(spec, driver_ids, first["dim_contact"]))
+            rows += await loader.copy("dim_medical", synthetic.medical(spec, driver_ids, first["dim_medical"]))
+            for table, columns in synthetic.driver_preferences(spec, driver_ids, country_codes).items():
+                rows += await loader.copy(table, columns)
+            _report("driver dimensions", rows, started)
+
+            profiles = synthetic.driver_profiles(spec)
+
+            started = time.perf_counter()
+            driver_index, days = [], []
+            risk_columns = {"distance_km": [], "harsh_events": [], "max_speed": [], "hour": []}
+            for chunk, offset in enumerate(range(0, spec.trips, chunk_size)):
+                trips = synthetic.trips_chunk(
+                    spec, profiles, chunk, min(chunk_size, spec.trips - offset),
+                    first["dim_driver"], first["dim_vehicle"],
+                )
+                trips["time_id"] = time_ids[trips["hour_index"]].tolist()
+                driver_index.append(trips["_driver_index"])
+                days.append(trips["_day"])
+                for name in ("distance_km", "harsh_events", "max_speed"):
+                    risk_columns[name].append(np.asarray(trips[name]))
+                # The range starts at midnight
+                risk_columns["hour"].append(trips["hour_index"] % 24)
+                await loader.copy("fact_trip", trips)
+            _report("fact_trip", loader.counts.get("fact_trip", 0), started)
+
+            started = time.perf_counter()
+            sos = synthetic.sos_events(
+                spec, profiles, first["dim_location"], first["dim_driver"], first["dim_vehicle"]
+            )
+            sos["fact_sos"]["time_id"] = time_ids[sos["fact_sos"]["hour_index"]].tolist()
+            rows = await loader.copy("dim_location", sos["dim_location"])
+            rows += await loader.copy("fact_sos", sos["fact_sos"])
+            _report("fact_sos + locations", rows, started)
+
+            # Added to any existing counts, like the per-SOS increments
+            started = time.perf_counter()
+            cells = bin_cells(sos["dim_location"]["latitude"], sos["dim_location"]["longitude"])
+            await conn.execute("""
+                INSERT INTO sos_heatmap_cell (zoom, x, y, count)
+                SELECT * FROM unnest($1::integer[], $2::integer[], $3::integer[], $4::integer[])
+                ON CONFLICT (zoom, x, y) DO UPDATE SET count = sos_heatmap_cell.count + EXCLUDED.count
+            """, *(cells[name].tolist() for name in ("zoom", "x", "y", "count")))
+            _report("sos_heatmap_cell", len(cells["zoom"]), started)
+
+            started = time.perf_counter()
+            driver_index = np.concatenate(driver_index) if driver_index else np.array([], dtype=np.int64)
+            days = np.concatenate(days) if days else np.array([], dtype=np.int64)
+            streaks = synthetic.gamification_streaks(
+                spec, driver_index, days, first["dim_driver"], badges.get("Streak Keeper"),
+            )
+            streaks["time_id"] = time_ids[streaks["hour_index"]].tolist()
+            _report("fact_gamification", await loader.copy("fact_gamification", streaks), started)
+
+            # New drivers only, so their whole trip history is in memory
+            started = time.perf_counter()
+            state = compute_streaks(driver_index + first["dim_driver"], days + (spec.start - EPOCH).days)
+            now = datetime.utcnow()
+            rows = await loader.copy("driver_streak", {
+                "driver_id": state["driver_id"].tolist(),
+                "last_active_day": [EPOCH + timedelta(days=int(day)) for day in state["last_day"]],
+                "current_streak": state["current"].tolist(),
+                "best_streak": state["best"].tolist(),
+                "updated_at": [now] * len(state["driver_id"]),
+            })
+            _report("driver_streak", rows, started)
+
+            started = time.perf_counter()
+            counters = compute_counters(
+                driver_index + first["dim_driver"],
+                *(np.concatenate(risk_columns[name]) if risk_columns[name] else np.array([])
+                  for name in ("distance_km", "harsh_events", "max_speed", "hour")),
+                np.asarray(sos["fact_sos"]["driver_id"], dtype=np.int64),
+            )
+            counters["score"] = risk_scores(counters)
+            rows = await loader.copy("driver_risk", {
+                **{name: values.tolist() for name, values in counters.items()},
+                "updated_at": [now] * len(counters["driver_id"]),
+            })
+            _report("driver_risk", rows, started)
+
+            await loader.sync_sequences()
+            # COPY bypasses the per-write aggregate upserts; fold the new history in
+            started = time.perf_counter()
+            await conn.execute(REBUILD_AGGREGATES_SQL)
+            _report("driver_aggregate", spec.drivers, started)
+        await conn.execute(f"ANALYZE {', '.join(TRUNCATE_TABLES)}")
+        return loader.counts
+    finally:
+        await conn.close()
+
 
-        for code, name, num in emergency_numbers:
-            session.add(EmergencyNumber(country_code=code, country_name=name, ambulance_number=num))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset")
+    parser.add_argument("--drivers", type=int, default=100)
+    parser.add_argument("--vehicles-per-driver", type=float, default=1.0)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--sos", type=int, default=100)
+    parser.add_argument("--days", type=int, default=90, help="length of the date range, ending --end")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="last day (default: today, UTC)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--truncate", action="store_true", help="wipe drivers, vehicles and facts first")
+    return parser.parse_args(argv)
 
-        await session.commit()
 
-    print("✅ Seed data inserted successfully!")
+def main(argv=None):
+    args = parse_args(argv)
+    start, end = synthetic.default_range(args.days, args.end)
+    spec = synthetic.DatasetSpec(
+        drivers=args.drivers,
+        trips=args.trips,
+        sos=args.sos,
+        start=start,
+        end=end,
+        seed=args.seed,
+        vehicles_per_driver=args.vehicles_per_driver,
+    )
+    started = time.perf_counter()
+    counts = asyncio.run(generate(spec, truncate=args.truncate, chunk_size=args.chunk_size))
+    total = sum(counts.values())
+    elapsed = time.perf_counter() - started
+    print(f"✅ Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
 
 
 if __name__ == "__main__":
-    asyncio.run(seed())
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlmodel import delete, select
+
+from app.core.database import DatabaseProvider, get_db_provider
+from app.data.repositories.archive_repository import ArchiveRepository
+from app.data.schemas.models import ArchiveBatch, FactSOS, FactTrip, Location, Time, TripTrace
+
+# An in-flight batch takes seconds; a marker this old belongs to a run that died
+INTERRUPTED_AFTER = timedelta(hours=1)
+
+# Traces are read and written this many trips at a time to bound the blobs held in memory
+TRACE_CHUNK_SIZE = 500
+
+
+def get_archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Rows with an event time before this are cold and live in the archive."""
+    days = int(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+class ArchiveService:
+    """
+    Moves cold fact rows from Postgres into the Parquet archive.
+
+    Each batch is recorded in archive_batch, written to the archive, and
+    deleted from Postgres together with its marker in the transaction that
+    selected it. A crash can at worst leave one batch in both places; its
+    marker tells readers which rows to count from Postgres only (exports
+    de-duplicate by primary key anyway), and the next run deletes the rows
+    that did reach the archive.
+
+    A trip's trace goes to the archive (trip_trace) before the trip itself,
+    so an archived trip always has its trace there too. Its trip_route
+    levels are derived from the trace and are dropped rather than archived.
+    """
+
+    def __init__(
+        self,
+        db_provider: DatabaseProvider,
+        archive: ArchiveRepository,
+        batch_size: Optional[int] = None,
+    ):
+        self.db_provider = db_provider
+        self.archive = archive
+        self.batch_size = batch_size or int(os.environ.get("ARCHIVE_BATCH_SIZE", "10000"))
+
+    async def _begin_batch(self, table: str, record_ids: List[int]) -> int:
+        """Commit the batch's marker before anything is written to the archive."""
+        async with self.db_provider.get_session() as session:
+            batch = ArchiveBatch(table_name=table, record_ids=record_ids)
+            session.add(batch)
+            await session.flush()
+            return batch.batch_id
+
+    @staticmethod
+    async def _delete_trips(session, trip_ids: List[int], cutoff: datetime) -> None:
+        # event_ts < cutoff prunes the newer partitions
+        await session.execute(delete(FactTrip).where(FactTrip.trip_id.in_(trip_ids), FactTrip.event_ts < cutoff))
+        # Traces and routes have no FK to the trip (see TripTrace); the trace is
+        # already archived (see _archive_traces) and routes are rebuilt from it
+        for table in ("trip_trace", "trip_route"):
+            await session.execute(
+                text(f"DELETE FROM {table} WHERE trip_id = ANY(CAST(:trip_ids AS integer[]))"),
+                {"trip_ids": trip_ids},
+            )
+
+    @staticmethod
+    async def _delete_sos(session, sos_ids: List[int]) -> None:
+        await session.execute(delete(FactSOS).where(FactSOS.sos_id.in_(sos_ids)))
+
+    async def recover_interrupted(self, cutoff: datetime) -> int:
+        """Finish batches a crashed run left in both places; returns the rows removed from Postgres."""
+        removed = 0
+        async with self.db_provider.get_session() as session:
+            stmt = (
+                select(ArchiveBatch)
+                .where(ArchiveBatch.created_at < datetime.utcnow() - INTERRUPTED_AFTER)
+                .with_for_update(skip_locked=True)
+            )
+            for batch in (await session.execute(stmt)).scalars().all():
+                archived_ids = await self.archive.archived_ids(batch.table_name, batch.record_ids)
+                # Rows that never reached the archive stay and go out with a later batch
+                if batch.table_name == "fact_trip":
+                    await self._delete_trips(session, archived_ids, cutoff)
+                else:
+                    await self._delete_sos(session, archived_ids)
+                removed += len(archived_ids)
+                await session.delete(batch)
+        return removed
+
+    async def _archive_traces(self, session, trips: List[FactTrip]) -> None:
+        event_ts = {trip.trip_id: trip.event_ts for trip in trips}
+        trip_ids = list(event_ts)
+        for offset in range(0, len(trip_ids), TRACE_CHUNK_SIZE):
+            chunk = trip_ids[offset:offset + TRACE_CHUNK_SIZE]
+            # Core rows, not ORM objects, so the session does not keep every blob alive
+            stmt = select(*TripTrace.__table__.columns).where(TripTrace.trip_id.in_(chunk)).order_by(TripTrace.trip_id)
+            rows = [
+                {**row, "event_ts": event_ts[row["trip_id"]]}
+                for row in (await session.execute(stmt)).mappings()
+            ]
+            await self.archive.write_rows("trip_trace", rows)
+
+    async def _archive_trip_batch(self, cutoff: datetime) -> int:
+        async with self.db_provider.get_session() as session:
+            stmt = (
+                select(FactTrip)
+                .where(FactTrip.event_ts < cutoff)
+                .order_by(FactTrip.event_ts, FactTrip.trip_id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            trips = (await session.execute(stmt)).scalars().all()
+            if not trips:
+                return 0
+            trip_ids = [trip.trip_id for trip in trips]
+            batch_id = await self._begin_batch("fact_trip", trip_ids)
+            await self._archive_traces(session, trips)
+            await self.archive.write_rows("fact_trip", [trip.model_dump() for trip in trips])
+            await self._delete_trips(session, trip_ids, cutoff)
+            await session.execute(delete(ArchiveBatch).where(ArchiveBatch.batch_id == batch_id))
+            return len(trips)
+
+    async def _archive_sos_batch(self, cutoff: datetime) -> int:
+        # Only resolved incidents are archived; open ones stay operational
+        async with self.db_provider.get_session() as session:
+            stmt = (
+                select(FactSOS, Time.date_value, Time.hour, Location.latitude, Location.longitude)
+                .join(Time, Time.time_id == FactSOS.time_id)
+                .join(Location, Location.location_id == FactSOS.location_id)
+                .where(FactSOS.resolved == True, Time.date_value < cutoff.date())
+                .order_by(FactSOS.sos_id)
+                .limit(self.batch_size)
+                .with_for_update(of=FactSOS, skip_locked=True)
+            )
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                return 0
+            records = []
+            for sos, date_value, hour, latitude, longitude in rows:
+                record = sos.model_dump()
+                record.update(
+                    event_ts=datetime.combine(date_value, datetime.min.time()) + timedelta(hours=hour),
+                    latitude=latitude,
+                    longitude=longitude,
+                )
+                records.append(record)
+            sos_ids = [record["sos_id"] for record in records]
+            batch_id = await self._begin_batch("fact_sos", sos_ids)
+            await self.archive.write_rows("fact_sos", records)
+            await self._delete_sos(session, sos_ids)
+            await session.execute(delete(ArchiveBatch).where(ArchiveBatch.batch_id == batch_id))
+            return len(records)
+
+    async def archive_cold_rows(self, now: Optional[datetime] = None) -> dict:
+        """Archive everything older than the cutoff, one bounded batch per transaction."""
+        cutoff = get_archive_cutoff(now)
+        await self.recover_interrupted(cutoff)
+        archived = {"fact_trip": 0, "fact_sos": 0}
+        for table, archive_batch in (
+            ("fact_trip", self._archive_trip_batch),
+            ("fact_sos", self._archive_sos_batch),
+        ):
+            while True:
+                moved = await archive_batch(cutoff)
+                archived[table] += moved
+                if moved < self.batch_size:
+                    break
+        return archived
+
+
+async def main():
+    db_provider = get_db_provider()
+    try:
+        archived = await ArchiveService(db_provider, ArchiveRepository()).archive_cold_rows()
+        for table, count in archived.items():
+            print(f"Archived {count} rows from {table}")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import logging
+import operator
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.core.database import get_db_provider
+from app.data.schemas.models import Badge, DriverAggregate, DriverBadgeAward, FactGamification
+from app.services.dimension_cache import get_dimension_cache
+from app.services.streak_service import effective_streak
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------
+# Metrics and criteria compilation
+# ---------------------------------------------------------------------
+def _days_between(now: datetime, then: Optional[datetime]) -> Optional[float]:
+    return (now - then).total_seconds() / 86400 if then is not None else None
+
+
+def _ratio(total: float, count: int) -> Optional[float]:
+    return total / count if count else None
+
+
+# metric -> (Python getter over a driver_aggregate row and "now", SQL over alias `a` and :now)
+METRICS: Dict[str, Tuple[Callable[[dict, datetime], Optional[float]], str]] = {
+    "trip_count": (lambda a, now: a["trip_count"], "a.trip_count"),
+    "total_distance_km": (lambda a, now: a["total_distance_km"], "a.total_distance_km"),
+    "max_trip_distance_km": (lambda a, now: a["max_trip_distance_km"], "a.max_trip_distance_km"),
+    "total_harsh_events": (lambda a, now: a["total_harsh_events"], "a.total_harsh_events"),
+    "avg_eco_score": (
+        lambda a, now: _ratio(a["eco_score_sum"], a["eco_score_count"]),
+        "a.eco_score_sum / NULLIF(a.eco_score_count, 0)",
+    ),
+    "avg_safety_score": (
+        lambda a, now: _ratio(a["safety_score_sum"], a["safety_score_count"]),
+        "a.safety_score_sum / NULLIF(a.safety_score_count, 0)",
+    ),
+    "sos_count": (lambda a, now: a["sos_count"], "a.sos_count"),
+    # From driver_streak (alias `s`); only known on the trip path, where the streak was just updated
+    "current_streak": (
+        lambda a, now: effective_streak(a["last_active_day"], a["current_streak"], now.date())
+        if "last_active_day" in a else None,
+        "CASE WHEN s.last_active_day >= CAST(CAST(:now AS timestamp) AS date) - 1 THEN s.current_streak ELSE 0 END",
+    ),
+    "best_streak": (lambda a, now: a.get("best_streak"), "s.best_streak"),
+    "days_active": (
+        lambda a, now: _days_between(now, a["first_trip_at"]),
+        "EXTRACT(EPOCH FROM (CAST(:now AS timestamp) - a.first_trip_at)) / 86400",
+    ),
+    # Incident-free days count from the first trip for drivers who never raised an SOS
+    "days_since_last_sos": (
+        lambda a, now: _days_between(now, a["last_sos_at"] or a["first_trip_at"]),
+        "EXTRACT(EPOCH FROM (CAST(:now AS timestamp) - coalesce(a.last_sos_at, a.first_trip_at))) / 86400",
+    ),
+}
+
+OPERATORS = {
+    ">=": operator.ge, "<=": operator.le, "==": operator.eq,
+    "!=": operator.ne, ">": operator.gt, "<": operator.lt,
+}
+
+_COMPARISON = re.compile(r"^\s*([a-z_]+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+@dataclass
+class Rule:
+    """A badge's criteria compiled into a Python predicate and an equivalent SQL condition."""
+    badge_id: int
+    badge_name: str
+    points: int
+    criteria: str
+    predicate: Callable[[dict, datetime], bool]
+    sql: str
+    params: dict
+
+    def matches(self, aggregate: dict, now: datetime) -> bool:
+        return self.predicate(aggregate, now)
+
+
+def compile_criteria(badge_id: int, badge_name: str, criteria: str, points: int = 0) -> Rule:
+    """
+    Compile "metric op number [and metric op number ...]" into a Rule.
+
+    Metrics are the keys of METRICS; a metric that is NULL (e.g. no trips
+    yet) never satisfies a comparison, in Python as in SQL.
+    """
+    terms = []
+    for clause in re.split(r"\band\b", criteria, flags=re.IGNORECASE):
+        match = _COMPARISON.match(clause)
+        if not match:
+            raise ValueError(f"Cannot parse badge criteria clause {clause.strip()!r}")
+        metric, op, value = match.groups()
+        if metric not in METRICS:
+            raise ValueError(f"Unknown badge metric {metric!r}; expected one of {', '.join(METRICS)}")
+        terms.append((metric, op, float(value)))
+
+    getters = [(METRICS[metric][0], OPERATORS[op], value) for metric, op, value in terms]
+
+    def predicate(aggregate: dict, now: datetime) -> bool:
+        for getter, compare, value in getters:
+            actual = getter(aggregate, now)
+            if actual is None or not compare(actual, value):
+                return False
+        return True
+
+    params = {f"v{i}": value for i, (_metric, _op, value) in enumerate(terms)}
+    sql = " AND ".join(
+        f"({METRICS[metric][1]}) {'=' if op == '==' else op} CAST(:v{i} AS double precision)"
+        for i, (metric, op, _value) in enumerate(terms)
+    )
+    return Rule(badge_id, badge_name, points, criteria, predicate, sql, params)
+
+
+# ---------------------------------------------------------------------
+# Rule cache
+# ---------------------------------------------------------------------
+_rules: List[Rule] = []
+_rules_loaded_at: Optional[float] = None
+
+
+async def load_rules(session: AsyncSession, force: bool = False) -> List[Rule]:
+    """Compiled rules of every badge with criteria, reloaded every BADGE_RULES_TTL seconds."""
+    global _rules, _rules_loaded_at
+    ttl = float(os.environ.get("BADGE_RULES_TTL", "60"))
+    if not force and _rules_loaded_at is not None and time.monotonic() - _rules_loaded_at < ttl:
+        return _rules
+
+    result = await session.execute(select(Badge).where(Badge.criteria.is_not(None)))
+    rules = []
+    for badge in result.scalars().all():
+        try:
+            rules.append(compile_criteria(badge.badge_id, badge.badge_name, badge.criteria, badge.points))
+        except ValueError as e:
+            logger.warning("Skipping badge %s (%s): %s", badge.badge_id, badge.badge_name, e)
+    _rules, _rules_loaded_at = rules, time.monotonic()
+    return rules
+
+
+# ---------------------------------------------------------------------
+# Aggregate maintenance
+# ---------------------------------------------------------------------
+_table = DriverAggregate.__table__
+
+# Rebuild every driver's aggregate from fact history in one pass. Rows moved
+# to the Parquet archive are no longer in fact_trip, so this undercounts
+# drivers with archived history; the incremental path never needs it.
+REBUILD_AGGREGATES_SQL = """
+INSERT INTO driver_aggregate (
+    driver_id, trip_count, total_distance_km, max_trip_distance_km, total_harsh_events,
+    eco_score_sum, eco_score_count, safety_score_sum, safety_score_count,
+    first_trip_at, last_trip_at, sos_count, last_sos_at, updated_at
+)
+SELECT
+    d.driver_id,
+    coalesce(t.trip_count, 0), coalesce(t.total_distance_km, 0), t.max_trip_distance_km,
+    coalesce(t.total_harsh_events, 0), coalesce(t.eco_score_sum, 0), coalesce(t.eco_score_count, 0),
+    coalesce(t.safety_score_sum, 0), coalesce(t.safety_score_count, 0),
+    t.first_trip_at, t.last_trip_at, coalesce(s.sos_count, 0), s.last_sos_at,
+    now() AT TIME ZONE 'utc'
+FROM dim_driver d
+LEFT JOIN (
+    SELECT driver_id,
+           count(*) AS trip_count,
+           sum(distance_km) AS total_distance_km,
+           max(distance_km) AS max_trip_distance_km,
+           sum(harsh_events) AS total_harsh_events,
+           sum(eco_score) AS eco_score_sum,
+           count(eco_score) AS eco_score_count,
+           sum(safety_score) AS safety_score_sum,
+           count(safety_score) AS safety_score_count,
+           min(event_ts) AS first_trip_at,
+           max(event_ts) AS last_trip_at
+    FROM fact_trip GROUP BY driver_id
+) t ON t.driver_id = d.driver_id
+LEFT JOIN (
+    SELECT f.driver_id,
+           count(*) AS sos_count,
+           max(tm.date_value + make_interval(hours => tm.hour)) AS last_sos_at
+    FROM fact_sos f JOIN dim_time tm ON tm.time_id = f.time_id
+    GROUP BY f.driver_id
+) s ON s.driver_id = d.driver_id
+WHERE t.driver_id IS NOT NULL OR s.driver_id IS NOT NULL
+ON CONFLICT (driver_id) DO UPDATE SET
+    trip_count = EXCLUDED.trip_count,
+    total_distance_km = EXCLUDED.total_distance_km,
+    max_trip_distance_km = EXCLUDED.max_trip_distance_km,
+    total_harsh_events = EXCLUDED.total_harsh_events,
+    eco_score_sum = EXCLUDED.eco_score_sum,
+    eco_score_count = EXCLUDED.eco_score_count,
+    safety_score_sum = EXCLUDED.safety_score_sum,
+    safety_score_count = EXCLUDED.safety_score_count,
+    first_trip_at = EXCLUDED.first_trip_at,
+    last_trip_at = EXCLUDED.last_trip_at,
+    sos_count = EXCLUDED.sos_count,
+    last_sos_at = EXCLUDED.last_sos_at,
+    updated_at = EXCLUDED.updated_at
+"""
+
+# One set-based statement per rule: award every eligible driver, mark the
+# fast-path array and log the award to fact_gamification
+AWARD_ELIGIBLE_SQL = """
+WITH eligible AS (
+    SELECT a.driver_id FROM driver_aggregate a
+    LEFT JOIN driver_streak s ON s.driver_id = a.driver_id
+    WHERE NOT (CAST(:badge_id AS integer) = ANY (a.awarded_badge_ids)) AND {condition}
+), awarded AS (
+    INSERT INTO driver_badge_award (driver_id, badge_id, awarded_at)
+    SELECT driver_id, :badge_id, :now FROM eligible
+    ON CONFLICT DO NOTHING
+    RETURNING driver_id
+), marked AS (
+    UPDATE driver_aggregate a SET awarded_badge_ids = array_append(a.awarded_badge_ids, :badge_id)
+    FROM awarded w WHERE a.driver_id = w.driver_id
+), logged AS (
+    INSERT INTO fact_gamification (driver_id, time_id, event_ts, badge_id, score_change)
+    SELECT driver_id, :time_id, :now, :badge_id, :points FROM awarded
+    RETURNING 1
+)
+SELECT count(*) FROM logged
+"""
+
+
+class BadgeRulesService:
+    """
+    Streaming badge awards.
+
+    record_trip / record_sos fold one write into the driver's running
+    aggregate with a single upsert and evaluate every compiled rule against
+    the returned row, so no history is rescanned. They run inside the
+    caller's transaction; awards are idempotent through driver_badge_award.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _upsert(self, driver_id: int, values: dict, additive: List[str],
+                      greatest: List[str] = (), least: List[str] = ()) -> dict:
+        stmt = pg_insert(_table).values(driver_id=driver_id, updated_at=datetime.utcnow(), **values)
+        excluded = stmt.excluded
+        updates = {"updated_at": excluded.updated_at}
+        for column in additive:
+            updates[column] = _table.c[column] + excluded[column]
+        for column in greatest:
+            updates[column] = text(f"GREATEST(driver_aggregate.{column}, EXCLUDED.{column})")
+        for column in least:
+            updates[column] = text(f"LEAST(driver_aggregate.{column}, EXCLUDED.{column})")
+        stmt = stmt.on_conflict_do_update(index_elements=[_table.c.driver_id], set_=updates)
+        result = await self.session.execute(stmt.returning(*_table.c))
+        return dict(result.mappings().one())
+
+    async def record_trip(self, trip, streak: Optional[dict] = None) -> List[Rule]:
+        aggregate = await self._upsert(
+            trip.driver_id,
+            {
+                "trip_count": 1,
+                "total_distance_km": trip.distance_km or 0.0,
+                "max_trip_distance_km": trip.distance_km,
+                "total_harsh_events": trip.harsh_events or 0,
+                "eco_score_sum": trip.eco_score or 0.0,
+                "eco_score_count": int(trip.eco_score is not None),
+                "safety_score_sum": trip.safety_score or 0.0,
+                "safety_score_count": int(trip.safety_score is not None),
+                "first_trip_at": trip.event_ts,
+                "last_trip_at": trip.event_ts,
+            },
+            additive=["trip_count", "total_distance_km", "total_harsh_events",
+                      "eco_score_sum", "eco_score_count", "safety_score_sum", "safety_score_count"],
+            greatest=["max_trip_distance_km", "last_trip_at"],
+            least=["first_trip_at"],
+        )
+        if streak is not None:
+            aggregate.update(streak)
+        return await self._evaluate(aggregate, trip.event_ts, trip.time_id)
+
+    async def record_sos(self, sos, ts: datetime) -> List[Rule]:
+        aggregate = await self._upsert(
+            sos.driver_id,
+            {"sos_count": 1, "last_sos_at": ts},
+            additive=["sos_count"],
+            greatest=["last_sos_at"],
+        )
+        return await self._evaluate(aggregate, ts, sos.time_id)
+
+    async def _evaluate(self, aggregate: dict, now: datetime, time_id: int) -> List[Rule]:
+        awarded = []
+        held = set(aggregate["awarded_badge_ids"] or ())
+        for rule in await load_rules(self.session):
+            if rule.badge_id in held or not rule.matches(aggregate, now):
+                continue
+            if await self._award(aggregate["driver_id"], rule, now, time_id):
+                awarded.append(rule)
+        return awarded
+
+    async def _award(self, driver_id: int, rule: Rule, now: datetime, time_id: int) -> bool:
+        result = await self.session.execute(
+            pg_insert(DriverBadgeAward.__table__)
+            .values(driver_id=driver_id, badge_id=rule.badge_id, awarded_at=now)
+            .on_conflict_do_nothing()
+            .returning(DriverBadgeAward.__table__.c.badge_id)
+        )
+        if result.first() is None:
+            return False
+        await self.session.execute(
+            text(
+                "UPDATE driver_aggregate SET awarded_badge_ids = array_append(awarded_badge_ids, :badge_id) "
+                "WHERE driver_id = :driver_id"
+            ),
+            {"badge_id": rule.badge_id, "driver_id": driver_id},
+        )
+        self.session.add(FactGamification(
+            driver_id=driver_id,
+            time_id=time_id,
+            event_ts=now,
+            badge_id=rule.badge_id,
+            score_change=rule.points,
+        ))
+        logger.info("Awarded badge %s to driver %s", rule.badge_name, driver_id)
+        return True
+
+    # -----------------------------------------------------------------
+    # Batched re-evaluation
+    # -----------------------------------------------------------------
+    async def rebuild_aggregates(self) -> None:
+        await self.session.execute(text(REBUILD_AGGREGATES_SQL))
+
+    async def evaluate_all(self, badge_ids: Optional[List[int]] = None, rebuild: bool = False) -> Dict[str, int]:
+        """
+        Award rules to every eligible driver in one set-based statement per
+        rule, e.g. after adding a badge. Returns badge name -> awards made.
+        """
+        if rebuild:
+            await self.rebuild_aggregates()
+        now = datetime.utcnow()
+        time_id = await get_dimension_cache().time_id(self.session, now)
+        counts = {}
+        for rule in await load_rules(self.session, force=True):
+            if badge_ids and rule.badge_id not in badge_ids:
+                continue
+            result = await self.session.execute(
+                text(AWARD_ELIGIBLE_SQL.format(condition=rule.sql)),
+                {**rule.params, "badge_id": rule.badge_id, "now": now, "time_id": time_id, "points": rule.points},
+            )
+            counts[rule.badge_name] = result.scalar_one()
+        await self.session.commit()
+        return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate badge rules over all drivers")
+    parser.add_argument("--badge", type=int, action="append", dest="badge_ids",
+                        help="only this badge id (repeatable; default: every badge with criteria)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute driver aggregates from fact_trip/fact_sos first")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    db_provider = get_db_provider()
+    try:
+        async with db_provider.get_session_factory()() as session:
+            counts = await BadgeRulesService(session).evaluate_all(args.badge_ids, rebuild=args.rebuild)
+        for name, count in counts.items():
+            print(f"✅ {name}: {count} awarded")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from prometheus_client import Histogram
+
+from app.core.route_classes import INTERACTIVE, SUB_REQUEST, current_route_class
+
+BATCH_SIZE = Histogram(
+    "batch_sub_requests", "Sub-requests per /batch call",
+    buckets=(1, 2, 4, 6, 8, 12, 16, 20),
+)
+
+# Headers of the batch call that sub-requests inherit (auth and client identity)
+FORWARDED_HEADERS = {b"authorization", b"x-admin-token", b"x-forwarded-for", b"user-agent", b"accept-language"}
+
+
+class BatchService:
+    """
+    Runs GET sub-requests through the application in-process and collects
+    their responses.
+
+    Each sub-request goes through the ASGI stack like a normal request, so it
+    resolves its own dependencies (and so its own pooled session), is charged
+    to its own rate-limit buckets, and turns errors into its own status code.
+    It is marked as a sub-request, so it runs under the batch's admission
+    slot instead of queueing for another slot behind it, but takes its
+    connection from the interactive pool: the bulk pool (3+2 by default)
+    is too small for several batches' worth of concurrent reads and would
+    time them out. Sub-requests run concurrently, at most `concurrency` at
+    a time per batch, each bounded by `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_requests: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.app = app
+        self.max_requests = max_requests if max_requests is not None else int(os.environ.get("BATCH_MAX_REQUESTS", "20"))
+        self.concurrency = concurrency if concurrency is not None else int(os.environ.get("BATCH_CONCURRENCY", "6"))
+        self.timeout = timeout if timeout is not None else float(os.environ.get("BATCH_ITEM_TIMEOUT", "10"))
+
+    def validate(self, items: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Normalise `items` to [{"id", "path"}]; raises ValueError for a malformed batch."""
+        if not items:
+            raise ValueError("Batch is empty")
+        if len(items) > self.max_requests:
+            raise ValueError(f"At most {self.max_requests} requests per batch")
+        normalised, seen = [], set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+                raise ValueError(f"Request {index} needs a path")
+            method = str(item.get("method", "GET")).upper()
+            if method != "GET":
+                raise ValueError(f"Request {index}: only GET is supported, got {method}")
+            path = item["path"]
+            parts = urlsplit(path)
+            if not path.startswith("/") or parts.scheme or parts.netloc:
+                raise ValueError(f"Request {index}: path must be relative to the API, e.g. /drivers/1")
+            if parts.path.rstrip("/") == "/batch":
+                raise ValueError(f"Request {index}: batches cannot be nested")
+            request_id = str(item.get("id", index))
+            if request_id in seen:
+                raise ValueError(f"Duplicate request id {request_id!r}")
+            seen.add(request_id)
+            normalised.append({"id": request_id, "path": path})
+        return normalised
+
+    async def run(self, items: List[Dict[str, Any]], parent_scope: dict) -> List[dict]:
+        items = self.validate(items)
+        BATCH_SIZE.observe(len(items))
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(item: Dict[str, str]) -> dict:
+            async with slots:
+                try:
+                    result = await asyncio.wait_for(self._dispatch(item["path"], parent_scope), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    result = {"status": 504, "body": {"detail": "Sub-request timed out"}}
+                except Exception as e:
+                    result = {"status": 500, "body": {"detail": f"Sub-request failed: {str(e)}"}}
+            return {"id": item["id"], "path": item["path"], **result}
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+    async def _dispatch(self, path: str, parent_scope: dict) -> dict:
+        parts = urlsplit(path)
+        scope = {
+            "type": "http",
+            "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+            "http_version": parent_scope.get("http_version", "1.1"),
+            "method": "GET",
+            "scheme": parent_scope.get("scheme", "http"),
+            "server": parent_scope.get("server"),
+            "client": parent_scope.get("client"),
+            "root_path": parent_scope.get("root_path", ""),
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            # The batch response is compressed as a whole, never the parts
+            "headers": [(k, v) for k, v in parent_scope["headers"] if k in FORWARDED_HEADERS]
+            + [(b"accept", b"application/json")],
+            "state": {},
+            SUB_REQUEST: True,
+        }
+        status, headers, chunks = 500, [], []
+        done = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        # Runs in its own task (wait_for), so this does not leak into the batch's context
+        current_route_class.set(INTERACTIVE)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            done.set()
+
+        body = b"".join(chunks)
+        content_type = next((v.decode() for k, v in headers if k.lower() == b"content-type"), "")
+        if not body:
+            parsed = None
+        elif content_type.startswith("application/json"):
+            parsed = json.loads(body)
+        else:
+            parsed = body.decode("utf-8", errors="replace")
+        result = {"status": status, "body": parsed}
+        etag = next((v.decode() for k, v in headers if k.lower() == b"etag"), None)
+        if etag:
+            result["etag"] = etag
+        return result
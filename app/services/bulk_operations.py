@@ -0,0 +1,118 @@
+from typing import Annotated, Any, Dict, FrozenSet, List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_IDS = 10000
+DELETE_CHUNK_SIZE = 1000
+
+
+class BulkDeleteConflict(Exception):
+    """Rows in a chunk are still referenced elsewhere; earlier chunks stay deleted."""
+
+    def __init__(self, deleted: int):
+        super().__init__(f"Rows are still referenced by other records; {deleted} deleted before the conflict")
+        self.deleted = deleted
+
+
+def coerce_value(model, name: str, value: Any) -> Any:
+    """`value` validated against the model field's type and constraints (e.g. max_length)."""
+    field = model.model_fields[name]
+    try:
+        return TypeAdapter(Annotated[field.annotation, field]).validate_python(value)
+    except ValidationError as e:
+        raise ValueError(f"Invalid value for {name!r}: {e.errors()[0]['msg']}")
+
+
+def _check_fields(names, allowed: FrozenSet[str], kind: str) -> None:
+    unknown = sorted(set(names) - allowed)
+    if unknown:
+        raise ValueError(f"Cannot {kind} {', '.join(unknown)}; allowed: {', '.join(sorted(allowed))}")
+
+
+def build_selection(
+    model,
+    key: str,
+    ids: Optional[List[int]],
+    filters: Optional[Dict[str, Any]],
+    filterable: FrozenSet[str],
+):
+    """
+    WHERE clause for `ids` and/or `filters` (ANDed). A filter value is matched
+    by equality, a list by IN and null by IS NULL. One of the two is required
+    so a bulk call can never silently address the whole table.
+    """
+    if not ids and not filters:
+        raise ValueError("Provide ids or a non-empty filter")
+    conditions = []
+    if ids:
+        if len(ids) > MAX_IDS:
+            raise ValueError(f"At most {MAX_IDS} ids per request")
+        conditions.append(getattr(model, key).in_(ids))
+    if filters:
+        _check_fields(filters, filterable, "filter on")
+        for name, value in filters.items():
+            column = getattr(model, name)
+            if value is None:
+                conditions.append(column.is_(None))
+            elif isinstance(value, list):
+                conditions.append(column.in_([coerce_value(model, name, v) for v in value]))
+            else:
+                conditions.append(column == coerce_value(model, name, value))
+    return and_(*conditions)
+
+
+async def bulk_update(
+    session: AsyncSession,
+    model,
+    key: str,
+    selection,
+    updates: Dict[str, Any],
+    updatable: FrozenSet[str],
+) -> List[int]:
+    """One UPDATE ... RETURNING for every selected row; returns the updated keys."""
+    if not updates:
+        raise ValueError("No fields to update")
+    _check_fields(updates, updatable, "update")
+    values = {name: coerce_value(model, name, value) for name, value in updates.items()}
+    stmt = (
+        update(model)
+        .where(selection)
+        .values(**values)
+        .returning(getattr(model, key))
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    keys = list(result.scalars().all())
+    await session.commit()
+    return keys
+
+
+async def bulk_delete(
+    session: AsyncSession,
+    model,
+    key: str,
+    selection,
+    chunk_size: int = DELETE_CHUNK_SIZE,
+) -> int:
+    """
+    Delete the selected rows `chunk_size` at a time, committing each chunk so
+    locks are held briefly and a large delete never becomes one long
+    transaction. Returns the number of rows deleted.
+    """
+    column = getattr(model, key)
+    deleted = 0
+    while True:
+        chunk = select(column).where(selection).order_by(column).limit(chunk_size).scalar_subquery()
+        stmt = delete(model).where(column.in_(chunk)).execution_options(synchronize_session=False)
+        try:
+            result = await session.execute(stmt)
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            raise BulkDeleteConflict(deleted)
+        deleted += result.rowcount
+        if result.rowcount < chunk_size:
+            return deleted
@@ -1,18 +1,34 @@
-from typing import Optional, List
+import json
+from typing import Any, Optional, List
 
-from app.core.caching import redis_client
+from app.core.caching import async_redis_client
+
+# Write only when the value is at least as new as what is cached, so a slow
+# reader cannot overwrite a newer entry stored after it read the database
+SET_IF_NEWER_LUA = """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    local ok, decoded = pcall(cjson.decode, cached)
+    if ok and type(decoded) == 'table' and tonumber(decoded['version']) and tonumber(decoded['version']) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
 
 
 class CacheService:
     """Service for caching operations."""
     
     def __init__(self):
-        self.redis = redis_client()
+        self.redis = async_redis_client()
+        self._set_if_newer = self.redis.register_script(SET_IF_NEWER_LUA)
     
     async def get_templates_cache(self, cache_key: str) -> Optional[List[dict]]:
         """Get cached templates."""
         try:
-            cached = self.redis.get(cache_key)
+            cached = await self.redis.get(cache_key)
             if cached:
                 # Parse the custom serialization format
                 items = []
@@ -39,13 +55,39 @@ class CacheService:
                 f"{item['id']}::{item['title']}::{item['status']}::{item['created_at']}"
                 for item in templates
             ])
-            self.redis.set(cache_key, serialized, ex=ttl)
+            await self.redis.set(cache_key, serialized, ex=ttl)
         except Exception:
             pass
     
     async def invalidate_cache(self, cache_key: str) -> None:
         """Invalidate cache entry."""
         try:
-            self.redis.delete(cache_key)
+            await self.redis.delete(cache_key)
+        except Exception:
+            pass
+
+    async def get_json(self, cache_key: str) -> Optional[Any]:
+        """Get a JSON-encoded cache entry; None on miss or when Redis is unavailable."""
+        try:
+            cached = await self.redis.get(cache_key)
+            if cached:
+                return json.loads(cached)
+        except Exception:
+            pass
+        return None
+
+    async def set_json(self, cache_key: str, value: Any, ttl: int = 30) -> None:
+        """Set a JSON-encoded cache entry."""
+        try:
+            await self.redis.set(cache_key, json.dumps(value, default=str), ex=ttl)
+        except Exception:
+            pass
+
+    async def set_json_if_newer(self, cache_key: str, value: dict, ttl: int = 30) -> None:
+        """Set a JSON-encoded entry carrying a "version" unless the cached one is newer."""
+        try:
+            await self._set_if_newer(
+                keys=[cache_key], args=[json.dumps(value, default=str), value["version"], ttl],
+            )
         except Exception:
             pass
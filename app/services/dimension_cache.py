@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from datetime import date, datetime, timedelta
+from app.data.schemas.models import Badge, EmergencyNumber, Time
+
+
+class DimensionCache:
+    """
+    In-process cache of small, rarely changing dimension rows.
+
+    dim_time rows are immutable once created, so (date_value, hour) -> time_id
+    lookups are served from memory after the first hit; badges and emergency
+    numbers are loaded by the startup warm-up (see WarmupService).
+    """
+
+    def __init__(self, max_time_entries: int = 50_000):
+        self.max_time_entries = max_time_entries
+        self._time_ids: Dict[Tuple[date, int], int] = {}
+        self.badges: Optional[List[Badge]] = None
+        self.emergency_numbers: Dict[str, EmergencyNumber] = {}
+
+    # -----------------------------------------------------------------
+    # Time dimension
+    # -----------------------------------------------------------------
+    def _remember_time(self, key: Tuple[date, int], time_id: int) -> None:
+        if len(self._time_ids) >= self.max_time_entries:
+            self._time_ids.clear()
+        self._time_ids[key] = time_id
+
+    async def time_id(self, session: AsyncSession, ts: datetime) -> int:
+        """
+        Return the time_id for ts's (date, hour), creating the dim_time row if
+        needed in the caller's transaction (the caller commits).
+        """
+        key = (ts.date(), ts.hour)
+        cached = self._time_ids.get(key)
+        if cached is not None:
+            return cached
+
+        stmt = select(Time.time_id).where(Time.date_value == key[0], Time.hour == key[1])
+        time_id = (await session.execute(stmt)).scalar_one_or_none()
+        if time_id is not None:
+            self._remember_time(key, time_id)
+            return time_id
+
+        # Concurrent requests for a new hour race here; the loser waits on the
+        # winner's row and gets nothing back instead of a unique violation
+        insert = (
+            pg_insert(Time)
+            .values(date_value=key[0], year=ts.year, month=ts.month, day=ts.day, hour=key[1], weekday=ts.weekday())
+            .on_conflict_do_nothing(index_elements=[Time.date_value, Time.hour])
+            .returning(Time.time_id)
+        )
+        time_id = (await session.execute(insert)).scalar_one_or_none()
+        if time_id is not None:
+            # Not cached: the row is only ours until the caller commits, and may roll back
+            return time_id
+        time_id = (await session.execute(stmt)).scalar_one()
+        self._remember_time(key, time_id)
+        return time_id
+
+    async def load_recent_times(self, session: AsyncSession, days: int = 7) -> int:
+        since = datetime.utcnow().date() - timedelta(days=days)
+        result = await session.execute(
+            select(Time.date_value, Time.hour, Time.time_id).where(Time.date_value >= since)
+        )
+        rows = result.all()
+        for date_value, hour, time_id in rows:
+            self._remember_time((date_value, hour), time_id)
+        return len(rows)
+
+    # -----------------------------------------------------------------
+    # Reference data
+    # -----------------------------------------------------------------
+    async def load_badges(self, session: AsyncSession) -> int:
+        result = await session.execute(select(Badge).order_by(Badge.badge_id))
+        self.badges = result.scalars().all()
+        return len(self.badges)
+
+    async def load_emergency_numbers(self, session: AsyncSession) -> int:
+        result = await session.execute(select(EmergencyNumber))
+        self.emergency_numbers = {row.country_code: row for row in result.scalars().all()}
+        return len(self.emergency_numbers)
+
+    def get_emergency_number(self, country_code: str) -> Optional[EmergencyNumber]:
+        return self.emergency_numbers.get(country_code.upper())
+
+
+_dimension_cache: Optional[DimensionCache] = None
+
+
+def get_dimension_cache() -> DimensionCache:
+    """Return the process-wide DimensionCache (singleton)."""
+    global _dimension_cache
+    if _dimension_cache is None:
+        _dimension_cache = DimensionCache()
+    return _dimension_cache
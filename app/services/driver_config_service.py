@@ -0,0 +1,139 @@
+import os
+from typing import Dict, Optional
+from sqlalchemy import Boolean, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+from app.data.schemas.models import Emergency, Notification, Privacy, Settings
+from app.services.bulk_operations import coerce_value
+from app.services.cache_service import CacheService
+
+
+# bundle section -> per-driver config table
+SECTIONS: Dict[str, type] = {
+    "settings": Settings,
+    "notification": Notification,
+    "privacy": Privacy,
+    "emergency": Emergency,
+}
+
+# Bookkeeping columns left out of the bundle sent to the device
+_INTERNAL_FIELDS = {"settings_id", "notification_id", "privacy_id", "emergency_id", "driver_id", "config_version"}
+
+
+def _section_subquery(name: str, model) -> str:
+    table = model.__tablename__
+    key = next(iter(model.__table__.primary_key.columns)).name
+    # Latest row wins if a driver somehow has several
+    return (
+        f"(SELECT to_jsonb(t) FROM {table} t WHERE t.driver_id = :driver_id "
+        f"ORDER BY t.{key} DESC LIMIT 1) AS {name}"
+    )
+
+
+# All four sections plus the driver's existence in one statement / one round trip
+BUNDLE_SQL = text(
+    "SELECT EXISTS (SELECT 1 FROM dim_driver WHERE driver_id = :driver_id) AS driver_exists, "
+    + ", ".join(_section_subquery(name, model) for name, model in SECTIONS.items())
+).columns(driver_exists=Boolean, **{name: JSONB for name in SECTIONS})
+
+
+def config_cache_key(driver_id: int) -> str:
+    return f"driver_config:{driver_id}"
+
+
+class DriverConfigService:
+    """
+    Versioned per-driver device configuration bundle.
+
+    Each section row carries a config_version drawn from one shared sequence
+    (bumped by trigger on update), so the bundle version is the max over its
+    sections and clients can ask for only the sections newer than what they hold.
+    """
+
+    def __init__(self, session: AsyncSession, cache_service: Optional[CacheService] = None):
+        self.session = session
+        self.cache_service = cache_service
+        self.cache_ttl = int(os.environ.get("DRIVER_CONFIG_CACHE_TTL", "300"))
+
+    async def get_bundle(self, driver_id: int, use_cache: bool = True) -> Optional[dict]:
+        """Full bundle {driver_id, version, sections: {name: {version, data} | None}}; None if no such driver."""
+        if use_cache and self.cache_service is not None:
+            cached = await self.cache_service.get_json(config_cache_key(driver_id))
+            if cached is not None:
+                return cached
+
+        result = await self.session.execute(BUNDLE_SQL, {"driver_id": driver_id})
+        row = result.mappings().one()
+        if not row["driver_exists"]:
+            return None
+
+        sections = {}
+        for name in SECTIONS:
+            data = row[name]
+            if data is None:
+                sections[name] = None
+                continue
+            sections[name] = {
+                "version": data["config_version"],
+                "data": {k: v for k, v in data.items() if k not in _INTERNAL_FIELDS},
+            }
+        bundle = {
+            "driver_id": driver_id,
+            "version": max((s["version"] for s in sections.values() if s), default=0),
+            "sections": sections,
+        }
+        if self.cache_service is not None:
+            # A read that raced a PATCH must not replace the fresher bundle the PATCH cached
+            await self.cache_service.set_json_if_newer(config_cache_key(driver_id), bundle, ttl=self.cache_ttl)
+        return bundle
+
+    @staticmethod
+    def delta(bundle: dict, since: Optional[int]) -> Optional[dict]:
+        """
+        The bundle narrowed to sections newer than `since`; None when the
+        client is already current. Without `since` the full bundle is returned.
+        """
+        if since is None:
+            return {**bundle, "full": True}
+        if bundle["version"] <= since:
+            return None
+        changed = {
+            name: section for name, section in bundle["sections"].items()
+            if section is not None and section["version"] > since
+        }
+        return {**bundle, "sections": changed, "full": False}
+
+    async def update_section(self, driver_id: int, section: str, updates: dict) -> Optional[dict]:
+        """Apply updates to one section (creating its row if missing); returns the new bundle."""
+        model = SECTIONS[section]
+        allowed = set(model.model_fields) - _INTERNAL_FIELDS
+        unknown = set(updates) - allowed
+        if unknown:
+            raise ValueError(f"Unknown {section} fields: {', '.join(sorted(unknown))}")
+        values = {field: coerce_value(model, field, value) for field, value in updates.items()}
+
+        key = next(iter(model.__table__.primary_key.columns)).name
+        stmt = (
+            select(model)
+            .where(model.driver_id == driver_id)
+            .order_by(getattr(model, key).desc())
+            .limit(1)
+        )
+        result = await self.session.execute(stmt)
+        row: Optional[SQLModel] = result.scalar_one_or_none()
+        if row is None:
+            row = model(driver_id=driver_id)
+            self.session.add(row)
+        for field, value in values.items():
+            setattr(row, field, value)
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # e.g. an emergency_country_code with no dim_emergency_number row
+            await self.session.rollback()
+            raise ValueError(f"Invalid {section} values: referenced record does not exist")
+
+        # Re-read and overwrite the cached bundle rather than just dropping it
+        return await self.get_bundle(driver_id, use_cache=False)
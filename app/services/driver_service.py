@@ -1,14 +1,24 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from app.core.projection import columns
 from app.data.schemas.models import Driver
+from app.services.bulk_operations import build_selection, bulk_delete, bulk_update
+
+# Columns the bulk endpoints may set or select on
+BULK_UPDATABLE = frozenset({"name", "license_type", "date_of_birth"})
+BULK_FILTERABLE = frozenset({"license_type", "date_of_birth"})
 
 
 class DriverService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_all_drivers(self, limit: int = 100) -> List[Driver]:
+    async def get_all_drivers(self, limit: int = 100, fields: Optional[List[str]] = None) -> list:
+        """Drivers, or only `fields` of each as mappings when given."""
+        if fields:
+            stmt = select(*columns(Driver, fields)).limit(limit)
+            return (await self.session.execute(stmt)).mappings().all()
         stmt = select(Driver).limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
@@ -47,3 +57,14 @@ class DriverService:
         await self.session.delete(driver)
         await self.session.commit()
         return True
+
+    async def bulk_update_drivers(
+        self, ids: Optional[List[int]], filters: Optional[Dict[str, Any]], updates: Dict[str, Any],
+    ) -> List[int]:
+        """Apply `updates` to every selected driver in one statement; returns the updated ids."""
+        selection = build_selection(Driver, "driver_id", ids, filters, BULK_FILTERABLE)
+        return await bulk_update(self.session, Driver, "driver_id", selection, updates, BULK_UPDATABLE)
+
+    async def bulk_delete_drivers(self, ids: Optional[List[int]], filters: Optional[Dict[str, Any]]) -> int:
+        selection = build_selection(Driver, "driver_id", ids, filters, BULK_FILTERABLE)
+        return await bulk_delete(self.session, Driver, "driver_id", selection)
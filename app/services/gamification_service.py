@@ -1,15 +1,34 @@
+import os
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select, func
-from datetime import datetime, timedelta
-from app.data.schemas.models import FactGamification, Badge, Driver, Time
+from datetime import datetime, timedelta, timezone
+from app.data.schemas.models import FactGamification, Badge, Driver
+from app.services.cache_service import CacheService
+from app.services.dimension_cache import DimensionCache, get_dimension_cache
+from app.services.streak_service import StreakService, effective_streak
+
+
+def leaderboard_cache_key(days: int, limit: int) -> str:
+    return f"leaderboard:{days}:{limit}"
 
 
 class GamificationService:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache_service: Optional[CacheService] = None,
+        dimensions: Optional[DimensionCache] = None,
+    ):
         self.session = session
+        self.cache_service = cache_service
+        self.dimensions = dimensions or get_dimension_cache()
+        # Leaderboards are served up to this many seconds stale
+        self.leaderboard_ttl = int(os.environ.get("LEADERBOARD_CACHE_TTL", "30"))
 
     async def get_badges(self, limit: int = 100) -> List[Badge]:
+        if self.dimensions.badges is not None:
+            return self.dimensions.badges[:limit]
         stmt = select(Badge).limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
@@ -23,55 +42,51 @@ class GamificationService:
         timestamp: Optional[datetime] = None,
     ) -> FactGamification:
         ts = timestamp or datetime.utcnow()
+        if ts.tzinfo is not None:
+            # event_ts is stored as naive UTC
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
 
-        # ensure time row exists
-        stmt = select(Time).where(
-            Time.date == ts.date(),
-            Time.year == ts.year,
-            Time.month == ts.month,
-            Time.day == ts.day,
-            Time.hour == ts.hour,
-            Time.weekday == ts.weekday()
-        )
-        res = await self.session.execute(stmt)
-        time_row = res.scalar_one_or_none()
-
-        if not time_row:
-            time_row = Time(
-                date=ts.date(),
-                year=ts.year,
-                month=ts.month,
-                day=ts.day,
-                hour=ts.hour,
-                weekday=ts.weekday()
-            )
-            self.session.add(time_row)
-            await self.session.commit()
-            await self.session.refresh(time_row)
+        time_id = await self.dimensions.time_id(self.session, ts)
+        # The event is an activity day like a trip, and the server-maintained
+        # streak is authoritative; a client-supplied value is ignored
+        streak = await StreakService(self.session).record_activity(driver_id, ts)
 
         event = FactGamification(
             driver_id=driver_id,
-            time_id=time_row.time_id,
+            time_id=time_id,
+            event_ts=ts,
             badge_id=badge_id,
             score_change=score_change,
-            streak_days=streak_days,
+            streak_days=effective_streak(streak["last_active_day"], streak["current_streak"], ts.date()),
         )
         self.session.add(event)
         await self.session.commit()
         await self.session.refresh(event)
         return event
 
+    async def get_streak(self, driver_id: int) -> dict:
+        return await StreakService(self.session).get_streak(driver_id)
+
     async def get_leaderboard(self, days: int = 7, limit: int = 10):
-        cutoff = datetime.utcnow().date() - timedelta(days=days)
+        if self.cache_service is not None:
+            cached = await self.cache_service.get_json(leaderboard_cache_key(days, limit))
+            if cached is not None:
+                return cached
+        leaderboard = await self.compute_leaderboard(days, limit)
+        if self.cache_service is not None:
+            await self.cache_service.set_json(leaderboard_cache_key(days, limit), leaderboard, ttl=self.leaderboard_ttl)
+        return leaderboard
 
-        sub_time_ids = select(Time.time_id).where(Time.date >= cutoff)
+    async def compute_leaderboard(self, days: int = 7, limit: int = 10):
+        cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
 
         stmt = (
             select(
                 FactGamification.driver_id,
                 func.sum(FactGamification.score_change).label("total_score")
             )
-            .where(FactGamification.time_id.in_(sub_time_ids))
+            # Filtering on the partition key prunes months outside the window
+            .where(FactGamification.event_ts >= cutoff)
             .group_by(FactGamification.driver_id)
             .order_by(func.sum(FactGamification.score_change).desc())
             .limit(limit)
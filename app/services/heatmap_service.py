@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db_provider
+from app.data.repositories.archive_repository import ArchiveRepository
+from app.services.cache_service import CacheService
+
+# A tile is split into 2**CELL_BITS x 2**CELL_BITS cells (32 x 32: 8 px cells on a 256 px tile),
+# so tile z/x/y is read from the counts of zoom z + CELL_BITS
+CELL_BITS = 5
+MAX_TILE_ZOOM = 14
+CELL_ZOOMS = tuple(range(CELL_BITS, MAX_TILE_ZOOM + CELL_BITS + 1))
+MAX_LATITUDE = 85.05112878
+REBUILD_CHUNK_SIZE = 100_000
+
+ADD_CELLS_SQL = text("""
+INSERT INTO sos_heatmap_cell (zoom, x, y, count)
+SELECT * FROM unnest(CAST(:zooms AS integer[]), CAST(:xs AS integer[]), CAST(:ys AS integer[]),
+                     CAST(:counts AS integer[]))
+ON CONFLICT (zoom, x, y) DO UPDATE SET count = sos_heatmap_cell.count + EXCLUDED.count
+""")
+
+# The rebuild fills a staging table and swaps it in, so readers and the
+# increments of new SOS never wait on the bulk load
+CREATE_STAGING_SQL = """
+DROP TABLE IF EXISTS sos_heatmap_cell_new;
+CREATE TABLE sos_heatmap_cell_new (
+    zoom integer NOT NULL, x integer NOT NULL, y integer NOT NULL, count integer NOT NULL DEFAULT 0
+)
+"""
+
+STAGE_CELLS_SQL = text("""
+INSERT INTO sos_heatmap_cell_new (zoom, x, y, count)
+SELECT * FROM unnest(CAST(:zooms AS integer[]), CAST(:xs AS integer[]), CAST(:ys AS integer[]),
+                     CAST(:counts AS integer[]))
+""")
+
+# Incidents committed after the snapshot, added once the staging table has its key
+ADD_STAGED_CELLS_SQL = text("""
+INSERT INTO sos_heatmap_cell_new (zoom, x, y, count)
+SELECT * FROM unnest(CAST(:zooms AS integer[]), CAST(:xs AS integer[]), CAST(:ys AS integer[]),
+                     CAST(:counts AS integer[]))
+ON CONFLICT (zoom, x, y) DO UPDATE SET count = sos_heatmap_cell_new.count + EXCLUDED.count
+""")
+
+# Holds off increments from here to the end of the swap
+LOCK_LIVE_SQL = """
+SET LOCAL lock_timeout = '5s';
+LOCK TABLE sos_heatmap_cell IN ACCESS EXCLUSIVE MODE
+"""
+
+SWAP_STAGING_SQL = """
+ALTER TABLE sos_heatmap_cell RENAME TO sos_heatmap_cell_old;
+ALTER TABLE sos_heatmap_cell_new RENAME TO sos_heatmap_cell;
+DROP TABLE sos_heatmap_cell_old;
+ALTER TABLE sos_heatmap_cell RENAME CONSTRAINT sos_heatmap_cell_new_pkey TO sos_heatmap_cell_pkey
+"""
+
+TILE_SQL = text("""
+SELECT x - :x0 AS col, y - :y0 AS row, count
+FROM sos_heatmap_cell
+WHERE zoom = :zoom AND x BETWEEN :x0 AND :x0 + :span - 1 AND y BETWEEN :y0 AND :y0 + :span - 1
+""")
+
+# Only resolved incidents are ever archived; max_sos_id marks the snapshot's end
+SOS_LOCATIONS_SQL = text("""
+SELECT array_agg(l.latitude) AS latitude, array_agg(l.longitude) AS longitude,
+       array_agg(s.sos_id) FILTER (WHERE s.resolved) AS archivable_id,
+       coalesce(max(s.sos_id), 0) AS max_sos_id
+FROM fact_sos s
+JOIN dim_location l ON l.location_id = s.location_id
+""")
+
+NEW_SOS_LOCATIONS_SQL = text("""
+SELECT array_agg(l.latitude) AS latitude, array_agg(l.longitude) AS longitude
+FROM fact_sos s
+JOIN dim_location l ON l.location_id = s.location_id
+WHERE s.sos_id > :max_sos_id
+""")
+
+
+def tile_cache_key(z: int, x: int, y: int) -> str:
+    return f"heatmap:sos:{z}:{x}:{y}"
+
+
+def tile_coordinates(lat, lon, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Slippy-map (x, y) of each point at `zoom`."""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    lon = np.asarray(lon, dtype=np.float64)
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def bin_cells(lat, lon, zooms=CELL_ZOOMS) -> Dict[str, np.ndarray]:
+    """
+    Event counts per (zoom, x, y) cell: a 2-D histogram per zoom over the
+    occupied cells only (x and y packed into one key, counted with np.unique).
+    """
+    parts = {"zoom": [], "x": [], "y": [], "count": []}
+    for zoom in zooms:
+        x, y = tile_coordinates(lat, lon, zoom)
+        keys, counts = np.unique((x << zoom) | y, return_counts=True)
+        parts["zoom"].append(np.full(len(keys), zoom, dtype=np.int64))
+        parts["x"].append(keys >> zoom)
+        parts["y"].append(keys & ((1 << zoom) - 1))
+        parts["count"].append(counts)
+    return {name: np.concatenate(values) for name, values in parts.items()}
+
+
+class HeatmapService:
+    """
+    SOS density heatmap as pre-aggregated slippy-map cell counts.
+
+    sos_heatmap_cell holds the number of incidents per cell for every cell
+    zoom; each new SOS increments its cell at every zoom right after it is
+    committed, best-effort, so hot cells never hold up the SOS transaction.
+    rebuild() recounts from the facts and corrects any lost increment. A
+    tile is a range read of one zoom's cells, cached in Redis for a short
+    time. Counts survive archiving.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache_service: Optional[CacheService] = None,
+        archive: Optional[ArchiveRepository] = None,
+    ):
+        self.session = session
+        self.cache_service = cache_service
+        self.archive = archive
+        self.tile_cache_ttl = int(os.environ.get("HEATMAP_TILE_CACHE_TTL", "60"))
+
+    async def _add_cells(self, cells: Dict[str, np.ndarray], statement=ADD_CELLS_SQL) -> None:
+        await self.session.execute(statement, {
+            "zooms": cells["zoom"].tolist(),
+            "xs": cells["x"].tolist(),
+            "ys": cells["y"].tolist(),
+            "counts": cells["count"].tolist(),
+        })
+
+    async def record_sos(self, latitude: float, longitude: float) -> None:
+        """Count one incident at every zoom; the caller commits."""
+        await self._add_cells(bin_cells([latitude], [longitude]))
+
+    async def get_tile(self, z: int, x: int, y: int) -> dict:
+        """Cell counts of tile z/x/y as sparse [col, row, count]; raises ValueError for a tile off the map."""
+        if not 0 <= z <= MAX_TILE_ZOOM:
+            raise ValueError(f"Zoom must be between 0 and {MAX_TILE_ZOOM}")
+        if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"Tile {x}/{y} is outside zoom {z}")
+        cache_key = tile_cache_key(z, x, y)
+        if self.cache_service is not None:
+            cached = await self.cache_service.get_json(cache_key)
+            if cached is not None:
+                return cached
+
+        span = 2 ** CELL_BITS
+        result = await self.session.execute(TILE_SQL, {"zoom": z + CELL_BITS, "x0": x * span, "y0": y * span, "span": span})
+        cells = [[row.col, row.row, row.count] for row in result]
+        tile = {
+            "z": z,
+            "x": x,
+            "y": y,
+            "resolution": span,
+            "total": sum(cell[2] for cell in cells),
+            "max": max((cell[2] for cell in cells), default=0),
+            "cells": cells,
+        }
+        if self.cache_service is not None:
+            await self.cache_service.set_json(cache_key, tile, ttl=self.tile_cache_ttl)
+        return tile
+
+    async def rebuild(self) -> int:
+        """Recount every cell from fact_sos and the archive in one NumPy pass; returns incidents counted."""
+        row = (await self.session.execute(SOS_LOCATIONS_SQL)).mappings().one()
+        latitude = [np.asarray(row["latitude"] or [], dtype=np.float64)]
+        longitude = [np.asarray(row["longitude"] or [], dtype=np.float64)]
+        if self.archive is not None:
+            # A crash between writing an archive batch and deleting it leaves rows in
+            # both places; count those from Postgres only
+            archived = await self.archive.column_arrays(
+                "fact_sos", ["latitude", "longitude"], exclude_ids=row["archivable_id"],
+            )
+            latitude.append(archived["latitude"].astype(np.float64))
+            longitude.append(archived["longitude"].astype(np.float64))
+        latitude, longitude = np.concatenate(latitude), np.concatenate(longitude)
+        cells = await asyncio.to_thread(bin_cells, latitude, longitude)
+        for statement in CREATE_STAGING_SQL.split(";"):
+            await self.session.execute(text(statement))
+        for first in range(0, len(cells["zoom"]), REBUILD_CHUNK_SIZE):
+            chunk = {name: values[first:first + REBUILD_CHUNK_SIZE] for name, values in cells.items()}
+            await self._add_cells(chunk, STAGE_CELLS_SQL)
+        # Built after the load, in one pass
+        await self.session.execute(text(
+            "ALTER TABLE sos_heatmap_cell_new ADD CONSTRAINT sos_heatmap_cell_new_pkey PRIMARY KEY (zoom, x, y)"
+        ))
+        await self.session.commit()
+        # Only the swap takes the table lock, so tiles never show a partial count
+        # and increments wait at most for the swap itself. Incidents committed
+        # since the snapshot had their increments applied to the table being
+        # replaced, so they are counted again into the staging table under the
+        # lock; an increment still queued behind the lock may count one twice
+        # until the next rebuild.
+        for statement in LOCK_LIVE_SQL.split(";"):
+            await self.session.execute(text(statement))
+        new = (await self.session.execute(NEW_SOS_LOCATIONS_SQL, {"max_sos_id": row["max_sos_id"]})).mappings().one()
+        if new["latitude"]:
+            await self._add_cells(bin_cells(new["latitude"], new["longitude"]), ADD_STAGED_CELLS_SQL)
+        for statement in SWAP_STAGING_SQL.split(";"):
+            await self.session.execute(text(statement))
+        await self.session.commit()
+        return len(latitude) + len(new["latitude"] or [])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recount the SOS heatmap cells")
+    parser.add_argument("--no-archive", action="store_true", help="count only incidents still in Postgres")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    db_provider = get_db_provider()
+    started = time.perf_counter()
+    try:
+        archive = None if args.no_archive else ArchiveRepository()
+        async with db_provider.get_session_factory()() as session:
+            incidents = await HeatmapService(session, archive=archive).rebuild()
+        print(f"✅ Heatmap rebuilt from {incidents} SOS incidents in {time.perf_counter() - started:.1f}s")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.database import DatabaseProvider, get_db_provider
+
+logger = logging.getLogger(__name__)
+
+# Parent tables range-partitioned by month on event_ts (revision b2a9fbd6cdfe)
+PARTITIONED_TABLES = ("fact_trip", "fact_gamification")
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class PartitionService:
+    """
+    Keeps the monthly partitions of the fact tables ahead of incoming data
+    and detaches partitions that fall out of the retention window.
+
+    Detached partitions stay behind as plain tables so they can be archived
+    before being dropped.
+
+    Each parent also has a DEFAULT partition for out-of-range client
+    timestamps. Postgres refuses DETACH ... CONCURRENTLY while one exists, so
+    each partition is detached in its own short transaction under a
+    lock_timeout; one that cannot get the lock is retried on the next run.
+    ensure_monthly_partition moves rows of the new month out of the default
+    partition (revision c8f2d4a7b915).
+    """
+
+    def __init__(
+        self,
+        db_provider: DatabaseProvider,
+        premake_months: Optional[int] = None,
+        retain_months: Optional[int] = None,
+    ):
+        self.db_provider = db_provider
+        self.premake_months = (
+            premake_months if premake_months is not None
+            else int(os.environ.get("PARTITION_PREMAKE_MONTHS", "3"))
+        )
+        # 0 disables detaching
+        self.retain_months = (
+            retain_months if retain_months is not None
+            else int(os.environ.get("PARTITION_RETAIN_MONTHS", "24"))
+        )
+        self.lock_timeout_ms = int(os.environ.get("PARTITION_DETACH_LOCK_TIMEOUT_MS", "2000"))
+
+    async def ensure_future_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Create partitions from the current month up to premake_months ahead; returns the new ones."""
+        current = (today or datetime.utcnow().date()).replace(day=1)
+        created = []
+        async with self.db_provider.get_session() as session:
+            for table in PARTITIONED_TABLES:
+                for offset in range(self.premake_months + 1):
+                    result = await session.execute(
+                        text("SELECT ensure_monthly_partition(:parent, :parent, :month_start)"),
+                        {"parent": table, "month_start": _add_months(current, offset)},
+                    )
+                    name = result.scalar()
+                    if name:
+                        created.append(name)
+        return created
+
+    async def list_partitions(self, table: str) -> List[Dict]:
+        """Attached range partitions of a parent table with their lower bound."""
+        async with self.db_provider.get_session() as session:
+            result = await session.execute(
+                text("""
+                    SELECT c.relname,
+                           (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \\(''([^'']+)''\\)'))[1]
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(:parent)
+                """),
+                {"parent": table},
+            )
+            return [
+                {"name": name, "lower_bound": datetime.fromisoformat(lower).date() if lower else None}
+                for name, lower in result.all()
+            ]
+
+    async def detach_old_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Detach partitions whose whole month is older than retain_months; returns the detached names."""
+        if self.retain_months <= 0:
+            return []
+        cutoff = _add_months((today or datetime.utcnow().date()).replace(day=1), -self.retain_months)
+        detached = []
+        engine = self.db_provider.get_engine()
+        for table in PARTITIONED_TABLES:
+            for partition in await self.list_partitions(table):
+                lower = partition["lower_bound"]
+                # The DEFAULT partition has no bound and is never detached
+                if lower is None or _add_months(lower, 1) > cutoff:
+                    continue
+                # DETACH locks the parent; give up quickly rather than queue writers behind it
+                try:
+                    async with engine.begin() as conn:
+                        await conn.exec_driver_sql(f"SET LOCAL lock_timeout = {self.lock_timeout_ms}")
+                        await conn.exec_driver_sql(f'ALTER TABLE {table} DETACH PARTITION "{partition["name"]}"')
+                except DBAPIError as e:
+                    if getattr(e.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                        raise
+                    logger.warning("Could not detach %s, retrying next run: %s", partition["name"], e)
+                    continue
+                detached.append(partition["name"])
+        return detached
+
+    async def run_maintenance(self) -> dict:
+        created = await self.ensure_future_partitions()
+        detached = await self.detach_old_partitions()
+        return {"created": created, "detached": detached}
+
+
+async def main():
+    db_provider = get_db_provider()
+    try:
+        result = await PartitionService(db_provider).run_maintenance()
+        print(f"Partitions created: {result['created'] or 'none'}")
+        print(f"Partitions detached: {result['detached'] or 'none'}")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db_provider
+from app.data.repositories.archive_repository import ArchiveRepository
+from app.services.archive_service import get_archive_cutoff
+
+# A trip counts as speeding when its max_speed exceeds this (km/h)
+SPEEDING_KMH = float(os.environ.get("RISK_SPEEDING_KMH", "120"))
+# Night driving: trips starting at or after NIGHT_START or before NIGHT_END (dim_time.hour)
+NIGHT_START, NIGHT_END = 22, 5
+# Contribution of each rate to the raw risk; the score is 100 * (1 - exp(-raw))
+WEIGHTS = {
+    "harsh_per_100km": 0.5,
+    "speeding_ratio": 1.5,
+    "night_ratio": 0.5,
+    "sos_per_100_trips": 0.3,
+}
+# Drivers with few trips are pulled towards PRIOR_RAW; at CREDIBILITY_TRIPS trips it is 50/50.
+# Raw risk is capped first so a single bad short trip cannot outweigh the prior.
+PRIOR_RAW = 0.5
+CREDIBILITY_TRIPS = 20
+RAW_CAP = 5.0
+
+COUNTERS = ("trips", "distance_km", "harsh_events", "speeding_trips", "night_trips", "sos_count")
+
+# Whole trip history as one row of column arrays: one round trip, decoded in C.
+# Rows past the archive cutoff may also sit in the archive (see rescore_all).
+TRIP_HISTORY_SQL = text("""
+SELECT array_agg(t.driver_id) AS driver_id,
+       array_agg(coalesce(t.distance_km, 0)) AS distance_km,
+       array_agg(coalesce(t.harsh_events, 0)) AS harsh_events,
+       array_agg(coalesce(t.max_speed, 0)) AS max_speed,
+       array_agg(d.hour) AS hour,
+       array_agg(t.trip_id) FILTER (WHERE t.event_ts < :cutoff) AS archivable_id
+FROM fact_trip t
+JOIN dim_time d ON d.time_id = t.time_id
+""")
+
+# Only resolved incidents are ever archived
+SOS_HISTORY_SQL = text("""
+SELECT array_agg(driver_id) AS driver_id, array_agg(sos_id) FILTER (WHERE resolved) AS archivable_id
+FROM fact_sos
+""")
+
+ARCHIVED_TRIP_COLUMNS = ["driver_id", "distance_km", "harsh_events", "max_speed", "event_ts"]
+
+# Counter upserts for the write paths; the score is refreshed from the returned counters
+RECORD_TRIP_SQL = text("""
+INSERT INTO driver_risk (driver_id, trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count, updated_at)
+VALUES (:driver_id, 1, :distance_km, :harsh_events, :speeding, :night, 0, :now)
+ON CONFLICT (driver_id) DO UPDATE SET
+    trips = driver_risk.trips + 1,
+    distance_km = driver_risk.distance_km + EXCLUDED.distance_km,
+    harsh_events = driver_risk.harsh_events + EXCLUDED.harsh_events,
+    speeding_trips = driver_risk.speeding_trips + EXCLUDED.speeding_trips,
+    night_trips = driver_risk.night_trips + EXCLUDED.night_trips,
+    updated_at = EXCLUDED.updated_at
+RETURNING trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count
+""")
+
+RECORD_SOS_SQL = text("""
+INSERT INTO driver_risk (driver_id, trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count, updated_at)
+VALUES (:driver_id, 0, 0, 0, 0, 0, 1, :now)
+ON CONFLICT (driver_id) DO UPDATE SET
+    sos_count = driver_risk.sos_count + 1,
+    updated_at = EXCLUDED.updated_at
+RETURNING trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count
+""")
+
+SET_SCORE_SQL = text("UPDATE driver_risk SET score = :score WHERE driver_id = :driver_id")
+
+# Rows touched by the incremental path after the rescore started are newer than its snapshot
+RESCORE_UPSERT_SQL = text("""
+INSERT INTO driver_risk (driver_id, trips, distance_km, harsh_events, speeding_trips, night_trips, sos_count, score, updated_at)
+SELECT u.*, :now
+FROM unnest(
+    CAST(:driver_id AS integer[]), CAST(:trips AS integer[]), CAST(:distance_km AS double precision[]),
+    CAST(:harsh_events AS integer[]), CAST(:speeding_trips AS integer[]), CAST(:night_trips AS integer[]),
+    CAST(:sos_count AS integer[]), CAST(:score AS double precision[])
+) AS u
+ON CONFLICT (driver_id) DO UPDATE SET
+    trips = EXCLUDED.trips,
+    distance_km = EXCLUDED.distance_km,
+    harsh_events = EXCLUDED.harsh_events,
+    speeding_trips = EXCLUDED.speeding_trips,
+    night_trips = EXCLUDED.night_trips,
+    sos_count = EXCLUDED.sos_count,
+    score = EXCLUDED.score,
+    updated_at = EXCLUDED.updated_at
+WHERE driver_risk.updated_at <= :started
+""")
+
+# Drivers with counters but no facts left (all trips and SOS deleted) are reset
+RESCORE_ZERO_SQL = text("""
+UPDATE driver_risk
+SET trips = 0, distance_km = 0, harsh_events = 0, speeding_trips = 0, night_trips = 0, sos_count = 0,
+    score = :score, updated_at = :now
+WHERE NOT (driver_id = ANY(CAST(:driver_id AS integer[])))
+  AND (trips, sos_count) <> (0, 0)
+  AND updated_at <= :started
+""")
+
+
+def is_night(hour) -> np.ndarray:
+    hour = np.asarray(hour)
+    return (hour >= NIGHT_START) | (hour < NIGHT_END)
+
+
+def compute_counters(
+    driver_ids: np.ndarray,
+    distance_km: np.ndarray,
+    harsh_events: np.ndarray,
+    max_speed: np.ndarray,
+    hour: np.ndarray,
+    sos_driver_ids: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Per-driver risk counters from per-trip columns (any order) and the
+    driver of every SOS. Returns equal-length arrays keyed by COUNTERS plus
+    driver_id, sorted by driver_id.
+    """
+    driver_ids = np.asarray(driver_ids, dtype=np.int64)
+    sos_driver_ids = np.asarray(sos_driver_ids if sos_driver_ids is not None else [], dtype=np.int64)
+    drivers, inverse = np.unique(np.concatenate([driver_ids, sos_driver_ids]), return_inverse=True)
+    trip_index, sos_index = inverse[:len(driver_ids)], inverse[len(driver_ids):]
+    n = len(drivers)
+
+    def per_driver(weights=None) -> np.ndarray:
+        return np.bincount(trip_index, weights=weights, minlength=n)
+
+    return {
+        "driver_id": drivers,
+        "trips": per_driver().astype(np.int64),
+        "distance_km": per_driver(np.asarray(distance_km, dtype=np.float64)),
+        "harsh_events": per_driver(np.asarray(harsh_events, dtype=np.float64)).astype(np.int64),
+        "speeding_trips": per_driver((np.asarray(max_speed) > SPEEDING_KMH).astype(np.float64)).astype(np.int64),
+        "night_trips": per_driver(is_night(hour).astype(np.float64)).astype(np.int64),
+        "sos_count": np.bincount(sos_index, minlength=n).astype(np.int64),
+    }
+
+
+def risk_features(counters: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Rates behind the score; drivers without trips get zero rates."""
+    trips = np.asarray(counters["trips"], dtype=np.float64)
+    per_trip = np.maximum(trips, 1)
+    return {
+        "harsh_per_100km": 100 * np.asarray(counters["harsh_events"]) / np.maximum(counters["distance_km"], 1.0),
+        "speeding_ratio": np.asarray(counters["speeding_trips"]) / per_trip,
+        "night_ratio": np.asarray(counters["night_trips"]) / per_trip,
+        "sos_per_100_trips": 100 * np.asarray(counters["sos_count"]) / per_trip,
+    }
+
+
+def risk_scores(counters: Dict[str, np.ndarray]) -> np.ndarray:
+    """0 (safest) to 100 (riskiest) for every driver in `counters`, in one vectorised pass."""
+    features = risk_features(counters)
+    raw = np.minimum(sum(WEIGHTS[name] * values for name, values in features.items()), RAW_CAP)
+    trips = np.asarray(counters["trips"], dtype=np.float64)
+    credibility = trips / (trips + CREDIBILITY_TRIPS)
+    blended = credibility * raw + (1 - credibility) * PRIOR_RAW
+    return np.round(100 * (1 - np.exp(-blended)), 2)
+
+
+def _score_one(row) -> float:
+    return float(risk_scores({name: np.array([row[name]]) for name in COUNTERS})[0])
+
+
+class RiskService:
+    """
+    Per-driver risk scores kept in driver_risk.
+
+    The table holds additive counters (trips, km, harsh events, speeding and
+    night trips, SOS), so a new trip or SOS is one upsert plus a score
+    refresh for that driver in the caller's transaction. rescore_all loads
+    the full trip history (Postgres plus, when given, the archive) as column
+    arrays and recomputes every driver's counters and score in one
+    vectorised pass, so scores cover the same lifetime history as the
+    incremental path.
+    """
+
+    def __init__(self, session: AsyncSession, archive: Optional[ArchiveRepository] = None):
+        self.session = session
+        self.archive = archive
+
+    async def record_trip(self, driver_id: int, distance_km: Optional[float], harsh_events: Optional[int],
+                          max_speed: Optional[float], hour: int) -> float:
+        result = await self.session.execute(RECORD_TRIP_SQL, {
+            "driver_id": driver_id,
+            "distance_km": distance_km or 0.0,
+            "harsh_events": harsh_events or 0,
+            "speeding": int((max_speed or 0) > SPEEDING_KMH),
+            "night": int(is_night(hour)),
+            "now": datetime.utcnow(),
+        })
+        return await self._set_score(driver_id, result.mappings().one())
+
+    async def record_sos(self, driver_id: int) -> float:
+        result = await self.session.execute(RECORD_SOS_SQL, {"driver_id": driver_id, "now": datetime.utcnow()})
+        return await self._set_score(driver_id, result.mappings().one())
+
+    async def _set_score(self, driver_id: int, row) -> float:
+        score = _score_one(row)
+        await self.session.execute(SET_SCORE_SQL, {"driver_id": driver_id, "score": score})
+        return score
+
+    async def get_risk(self, driver_id: int) -> Optional[dict]:
+        result = await self.session.execute(
+            text(f"SELECT {', '.join(COUNTERS)}, score, updated_at FROM driver_risk WHERE driver_id = :driver_id"),
+            {"driver_id": driver_id},
+        )
+        row = result.mappings().one_or_none()
+        if row is None:
+            return None
+        features = risk_features({name: np.array([row[name]]) for name in COUNTERS})
+        return {
+            "driver_id": driver_id,
+            "score": row["score"] if row["score"] is not None else _score_one(row),
+            **{name: row[name] for name in COUNTERS},
+            **{name: round(float(values[0]), 4) for name, values in features.items()},
+            "updated_at": row["updated_at"],
+        }
+
+    async def riskiest(self, limit: int = 50, min_trips: int = 0) -> List[dict]:
+        result = await self.session.execute(
+            text(f"""
+                SELECT driver_id, score, {', '.join(COUNTERS)} FROM driver_risk
+                WHERE score IS NOT NULL AND trips >= :min_trips
+                ORDER BY score DESC LIMIT :limit
+            """),
+            {"limit": limit, "min_trips": min_trips},
+        )
+        return [dict(row) for row in result.mappings().all()]
+
+    async def rescore_all(self, chunk_size: int = 50_000) -> Tuple[int, int]:
+        """
+        Recompute every driver's counters and score from fact_trip, fact_sos
+        and the archive, and reset drivers with no facts left. Returns
+        (trips read, drivers written).
+        """
+        started = datetime.utcnow()
+        trips = (await self.session.execute(TRIP_HISTORY_SQL, {"cutoff": get_archive_cutoff()})).mappings().one()
+        sos = (await self.session.execute(SOS_HISTORY_SQL)).mappings().one()
+        history = {
+            "driver_id": np.asarray(trips["driver_id"] or [], dtype=np.int64),
+            "distance_km": np.asarray(trips["distance_km"] or [], dtype=np.float64),
+            "harsh_events": np.asarray(trips["harsh_events"] or [], dtype=np.int64),
+            "max_speed": np.asarray(trips["max_speed"] or [], dtype=np.float64),
+            "hour": np.asarray(trips["hour"] or [], dtype=np.int64),
+        }
+        sos_driver_ids = np.asarray(sos["driver_id"] or [], dtype=np.int64)
+        if self.archive is not None:
+            # A crash between writing an archive batch and deleting it leaves rows in
+            # both places; count those from Postgres only
+            archived = await self.archive.column_arrays(
+                "fact_trip", ARCHIVED_TRIP_COLUMNS, exclude_ids=trips["archivable_id"],
+            )
+            # dim_time.hour is the hour of event_ts
+            archived["hour"] = archived.pop("event_ts").astype("datetime64[h]").astype(np.int64) % 24
+            history = {name: np.concatenate([values, archived[name]]) for name, values in history.items()}
+            archived_sos = await self.archive.column_arrays("fact_sos", ["driver_id"], exclude_ids=sos["archivable_id"])
+            sos_driver_ids = np.concatenate([sos_driver_ids, archived_sos["driver_id"]])
+        counters = compute_counters(
+            history["driver_id"], history["distance_km"], history["harsh_events"], history["max_speed"],
+            history["hour"], sos_driver_ids,
+        )
+        counters["score"] = risk_scores(counters)
+
+        written = len(counters["driver_id"])
+        for offset in range(0, written, chunk_size):
+            window = slice(offset, offset + chunk_size)
+            await self.session.execute(RESCORE_UPSERT_SQL, {
+                **{name: values[window].tolist() for name, values in counters.items()},
+                "now": datetime.utcnow(),
+                "started": started,
+            })
+        result = await self.session.execute(RESCORE_ZERO_SQL, {
+            "driver_id": counters["driver_id"].tolist(),
+            "score": _score_one({name: 0 for name in COUNTERS}),
+            "now": datetime.utcnow(),
+            "started": started,
+        })
+        written += result.rowcount
+        await self.session.commit()
+        return len(history["driver_id"]), written
+
+
+def synthetic_benchmark(trips: int, drivers: int, seed: int = 42) -> Dict[str, float]:
+    """Time compute_counters + risk_scores on random history of the given size (no database)."""
+    rng = np.random.default_rng(seed)
+    columns = (
+        rng.integers(1, drivers + 1, trips),
+        rng.gamma(2.0, 12.0, trips),
+        rng.poisson(0.6, trips),
+        rng.normal(95, 20, trips),
+        rng.integers(0, 24, trips),
+        rng.integers(1, drivers + 1, trips // 50),
+    )
+    started = time.perf_counter()
+    counters = compute_counters(*columns)
+    counted = time.perf_counter()
+    risk_scores(counters)
+    scored = time.perf_counter()
+    return {"counters_s": counted - started, "scores_s": scored - counted, "drivers": len(counters["driver_id"])}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute every driver's risk score")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--no-archive", action="store_true", help="count only history still in Postgres")
+    parser.add_argument("--synthetic", nargs=2, type=int, metavar=("TRIPS", "DRIVERS"),
+                        help="time the vectorised pass on random data instead of the database")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    if args.synthetic:
+        timing = synthetic_benchmark(*args.synthetic)
+        print(f"✅ {args.synthetic[0]} trips, {timing['drivers']} drivers: counters {timing['counters_s']:.3f}s, "
+              f"scores {timing['scores_s']:.3f}s")
+        return
+    db_provider = get_db_provider()
+    started = time.perf_counter()
+    try:
+        async with db_provider.get_session_factory()() as session:
+            archive = None if args.no_archive else ArchiveRepository()
+            trips, drivers = await RiskService(session, archive).rescore_all(args.chunk_size)
+        print(f"✅ {drivers} driver risk scores from {trips} trips in {time.perf_counter() - started:.1f}s")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict
+
+from prometheus_client import Gauge
+
+from app.core.database import DatabaseProvider
+from app.core.jobs import Job, JobRunner, parse_schedule
+from app.data.repositories.archive_repository import ArchiveRepository
+from app.services.archive_service import ArchiveService
+from app.services.badge_rules_service import BadgeRulesService
+from app.services.cache_service import CacheService
+from app.services.gamification_service import GamificationService, leaderboard_cache_key
+from app.services.heatmap_service import HeatmapService
+from app.services.partition_service import PartitionService
+from app.services.risk_service import RiskService
+from app.services.sos_notification_service import get_sos_notifier
+from app.services.sos_service import SOSService
+from app.services.streak_service import StreakService
+
+logger = logging.getLogger(__name__)
+
+STALE_SOS_OPEN = Gauge("sos_stale_unresolved", "Unresolved SOS older than SOS_STALE_MINUTES")
+
+# job name -> (default schedule, timeout seconds)
+DEFAULT_SCHEDULES: Dict[str, tuple] = {
+    "leaderboard_refresh": ("@every 30s", 60),
+    "stale_sos_check": ("@every 1m", 60),
+    "sos_notification_recovery": ("@every 1m", 300),
+    "badge_rules": ("15 * * * *", 900),
+    "partition_maintenance": ("0 2 * * *", 900),
+    "archive_cold_rows": ("30 2 * * *", 3600),
+    "streak_backfill": ("0 4 * * *", 1800),
+    "risk_rescore": ("30 4 * * *", 1800),
+    "heatmap_rebuild": ("0 5 * * *", 1800),
+}
+
+
+def parse_job_schedules(raw: str) -> Dict[str, str]:
+    """Overrides like "archive_cold_rows=0 3 * * *;leaderboard_refresh=@every 1m;streak_backfill=off"."""
+    schedules = {name: schedule for name, (schedule, _timeout) in DEFAULT_SCHEDULES.items()}
+    for item in filter(None, (part.strip() for part in raw.split(";"))):
+        name, _, schedule = item.partition("=")
+        if name.strip() not in schedules:
+            raise ValueError(f"Unknown job {name.strip()!r} in JOB_SCHEDULES")
+        schedules[name.strip()] = schedule.strip()
+    return schedules
+
+
+class ScheduledJobs:
+    """The periodic maintenance work of the service, as JobRunner jobs."""
+
+    def __init__(self, db_provider: DatabaseProvider, cache_service: CacheService):
+        self.db_provider = db_provider
+        self.cache_service = cache_service
+        self.sos_stale_minutes = int(os.environ.get("SOS_STALE_MINUTES", "15"))
+
+    async def leaderboard_refresh(self) -> int:
+        """Recompute the default leaderboard into Redis so readers never pay for the aggregate."""
+        async with self.db_provider.get_session_factory()() as session:
+            service = GamificationService(session, self.cache_service)
+            leaderboard = await service.compute_leaderboard()
+            # Default /gamification/leaderboard parameters; outlives the refresh interval
+            await self.cache_service.set_json(
+                leaderboard_cache_key(7, 10), leaderboard, ttl=service.leaderboard_ttl * 2,
+            )
+            return len(leaderboard)
+
+    async def stale_sos_check(self) -> dict:
+        cutoff = datetime.utcnow() - timedelta(minutes=self.sos_stale_minutes)
+        async with self.db_provider.get_session_factory()() as session:
+            count, oldest = await SOSService(session).stale_unresolved(cutoff)
+        STALE_SOS_OPEN.set(count)
+        if count:
+            logger.warning("%d SOS unresolved for over %d minutes (oldest raised %s)",
+                           count, self.sos_stale_minutes, oldest)
+        return {"stale": count, "oldest": oldest.isoformat() if oldest else None}
+
+    async def sos_notification_recovery(self) -> dict:
+        """Send contact emails that missed the in-process queue or were abandoned mid-send."""
+        return await get_sos_notifier().recover()
+
+    async def badge_rules(self) -> dict:
+        """Time-based criteria (e.g. days_since_last_sos) become true without any write to trigger them."""
+        async with self.db_provider.get_session_factory()() as session:
+            return await BadgeRulesService(session).evaluate_all()
+
+    async def partition_maintenance(self) -> dict:
+        return await PartitionService(self.db_provider).run_maintenance()
+
+    async def archive_cold_rows(self) -> dict:
+        return await ArchiveService(self.db_provider, ArchiveRepository()).archive_cold_rows()
+
+    async def streak_backfill(self) -> dict:
+        async with self.db_provider.get_session_factory()() as session:
+            days, drivers = await StreakService(session).backfill()
+        return {"active_days": days, "drivers": drivers}
+
+    async def risk_rescore(self) -> dict:
+        """Rebuilds counters from the facts, dropping deleted trips the incremental path still counts."""
+        async with self.db_provider.get_session_factory()() as session:
+            trips, drivers = await RiskService(session, ArchiveRepository()).rescore_all()
+        return {"trips": trips, "drivers": drivers}
+
+    async def heatmap_rebuild(self) -> dict:
+        """Recounts the SOS heatmap, restoring increments lost after an SOS commit."""
+        async with self.db_provider.get_session_factory()() as session:
+            incidents = await HeatmapService(session, archive=ArchiveRepository()).rebuild()
+        return {"incidents": incidents}
+
+    def build_runner(self) -> JobRunner:
+        runner = JobRunner()
+        schedules = parse_job_schedules(os.environ.get("JOB_SCHEDULES", ""))
+        for name, (_default, timeout) in DEFAULT_SCHEDULES.items():
+            if schedules[name].lower() == "off":
+                continue
+            runner.add(Job(name, getattr(self, name), parse_schedule(schedules[name]), timeout=timeout))
+        return runner
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import DatabaseProvider, get_db_provider
+from app.core.mailer import SMTPPool, get_smtp_pool
+from app.core.route_classes import CRITICAL
+
+logger = logging.getLogger(__name__)
+
+SOS_NOTIFICATIONS = Counter("sos_notifications_total", "SOS contact email attempts by outcome", ["outcome"])
+SOS_NOTIFICATION_DELAY = Histogram(
+    "sos_notification_delay_seconds", "Time from SOS to the contact email being accepted by SMTP",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+
+# Delivery log rows for the driver's primary contacts, written in the SOS transaction
+QUEUE_SQL = text("""
+INSERT INTO sos_notification (sos_id, contact_id, email, status, attempts, created_at)
+SELECT :sos_id, contact_id, email, 'pending', 0, :now
+FROM dim_contact
+WHERE driver_id = :driver_id AND is_primary AND coalesce(email, '') <> ''
+""")
+
+# SKIP LOCKED lets several workers claim disjoint rows without waiting on each other
+CLAIM_SQL = """
+UPDATE sos_notification SET status = 'sending', claimed_at = :now
+WHERE notification_id IN (
+    SELECT notification_id FROM sos_notification
+    WHERE {condition}
+    ORDER BY notification_id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING notification_id, sos_id, email, attempts, created_at
+"""
+CLAIM_FOR_SOS = text(CLAIM_SQL.format(condition="sos_id = :sos_id AND status = 'pending'"))
+# Rows the request path never handed over (queue full, worker restarted) or whose worker died
+CLAIM_ABANDONED = text(CLAIM_SQL.format(
+    condition="(status = 'pending' AND created_at < :pending_before) "
+              "OR (status = 'sending' AND claimed_at < :sending_before)"
+))
+
+ALERT_SQL = text("""
+SELECT d.name AS driver_name, s.severity, l.latitude, l.longitude
+FROM fact_sos s
+JOIN dim_driver d ON d.driver_id = s.driver_id
+LEFT JOIN dim_location l ON l.location_id = s.location_id
+WHERE s.sos_id = :sos_id
+""")
+
+RECORD_SQL = text("""
+UPDATE sos_notification
+SET status = :status, attempts = :attempts, last_error = :last_error, sent_at = :sent_at
+WHERE notification_id = :notification_id
+""")
+
+
+async def queue_notifications(session: AsyncSession, sos_id: int, driver_id: int, now: datetime) -> int:
+    """Write pending delivery-log rows for an SOS; call inside its transaction."""
+    result = await session.execute(QUEUE_SQL, {"sos_id": sos_id, "driver_id": driver_id, "now": now})
+    return result.rowcount
+
+
+def build_alert(email: str, alert: Optional[dict], raised_at: datetime) -> EmailMessage:
+    driver_name = alert["driver_name"] if alert else "A driver"
+    message = EmailMessage()
+    message["To"] = email
+    message["Subject"] = f"SOS alert from {driver_name}"
+    lines = [f"{driver_name} raised an SOS at {raised_at:%Y-%m-%d %H:%M} UTC."]
+    if alert and alert["severity"]:
+        lines.append(f"Severity: {alert['severity']}")
+    if alert and alert["latitude"] is not None:
+        lat, lon = alert["latitude"], alert["longitude"]
+        lines.append(f"Location: {lat:.5f}, {lon:.5f}  https://maps.google.com/?q={lat},{lon}")
+    lines += ["", "You are receiving this because you are listed as an emergency contact."]
+    message.set_content("\n".join(lines))
+    return message
+
+
+class SOSNotifier:
+    """
+    Sends SOS alert emails to the driver's primary contacts outside the
+    request path.
+
+    create_sos writes the delivery-log rows in its own transaction and hands
+    the sos_id to enqueue(); a few worker tasks claim the rows, send over the
+    pooled SMTP connections and record the outcome. Each email is retried
+    with exponential backoff. Rows that never reached a worker, or whose
+    worker died mid-send, are picked up by recover() (run as a scheduled job).
+    """
+
+    def __init__(
+        self,
+        db_provider: DatabaseProvider,
+        smtp: SMTPPool,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        queue_size: int = 1000,
+    ):
+        self.db_provider = db_provider
+        self.smtp = smtp
+        self.workers = workers if workers is not None else int(os.environ.get("SOS_NOTIFY_WORKERS", "4"))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.environ.get("SOS_NOTIFY_MAX_ATTEMPTS", "5"))
+        self.retry_delay = retry_delay if retry_delay is not None else float(os.environ.get("SOS_NOTIFY_RETRY_DELAY", "2"))
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def _session(self) -> AsyncSession:
+        # SOS work keeps to the critical pool even though it runs in the background
+        return self.db_provider.get_session_factory(CRITICAL)()
+
+    # -----------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(), name=f"sos-notify-{i}") for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.smtp.close()
+
+    def enqueue(self, sos_id: int) -> None:
+        """Hand an SOS to the workers; never blocks the caller."""
+        try:
+            self._queue.put_nowait(sos_id)
+        except asyncio.QueueFull:
+            logger.warning("SOS notification queue full; SOS %s will be sent by recovery", sos_id)
+
+    async def _worker(self) -> None:
+        while True:
+            sos_id = await self._queue.get()
+            try:
+                await self.deliver_sos(sos_id)
+            except Exception:
+                logger.exception("Failed to deliver notifications for SOS %s", sos_id)
+            finally:
+                self._queue.task_done()
+
+    # -----------------------------------------------------------------
+    # Delivery
+    # -----------------------------------------------------------------
+    async def _claim(self, statement, params: dict) -> List[dict]:
+        async with self._session() as session:
+            result = await session.execute(statement, {"now": datetime.utcnow(), **params})
+            rows = [dict(row) for row in result.mappings().all()]
+            await session.commit()
+            return rows
+
+    async def _alert(self, sos_id: int) -> Optional[dict]:
+        async with self._session() as session:
+            row = (await session.execute(ALERT_SQL, {"sos_id": sos_id})).mappings().one_or_none()
+            return dict(row) if row else None
+
+    async def _record(self, row: dict, status: str, attempts: int, error: Optional[str]) -> None:
+        async with self._session() as session:
+            await session.execute(RECORD_SQL, {
+                "notification_id": row["notification_id"],
+                "status": status,
+                "attempts": attempts,
+                "last_error": error,
+                "sent_at": datetime.utcnow() if status == "sent" else None,
+            })
+            await session.commit()
+
+    async def _send_one(self, row: dict, alert: Optional[dict]) -> bool:
+        attempts, error = row["attempts"], None
+        while attempts < self.max_attempts:
+            if attempts > row["attempts"]:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempts - row["attempts"] - 1))
+            attempts += 1
+            try:
+                await self.smtp.send(build_alert(row["email"], alert, row["created_at"]))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                SOS_NOTIFICATIONS.labels("retry" if attempts < self.max_attempts else "failed").inc()
+                logger.warning("SOS %s email to contact attempt %d failed: %s", row["sos_id"], attempts, error)
+                continue
+            SOS_NOTIFICATIONS.labels("sent").inc()
+            SOS_NOTIFICATION_DELAY.observe((datetime.utcnow() - row["created_at"]).total_seconds())
+            await self._record(row, "sent", attempts, None)
+            return True
+        await self._record(row, "failed", attempts, error or "No attempts left")
+        return False
+
+    async def _deliver(self, rows: List[dict]) -> int:
+        alerts: Dict[int, Optional[dict]] = {}
+        for sos_id in {row["sos_id"] for row in rows}:
+            alerts[sos_id] = await self._alert(sos_id)
+        # Concurrency is bounded by the SMTP pool
+        results = await asyncio.gather(*(self._send_one(row, alerts[row["sos_id"]]) for row in rows))
+        return sum(results)
+
+    async def deliver_sos(self, sos_id: int) -> int:
+        """Send every pending email of one SOS; returns how many were delivered."""
+        rows = await self._claim(CLAIM_FOR_SOS, {"sos_id": sos_id, "limit": 100})
+        return await self._deliver(rows) if rows else 0
+
+    async def recover(self, pending_after: float = 60, sending_after: float = 600, limit: int = 100) -> dict:
+        """Deliver rows left pending or stuck in sending; run periodically."""
+        now = datetime.utcnow()
+        rows = await self._claim(CLAIM_ABANDONED, {
+            "pending_before": now - timedelta(seconds=pending_after),
+            "sending_before": now - timedelta(seconds=sending_after),
+            "limit": limit,
+        })
+        delivered = await self._deliver(rows) if rows else 0
+        return {"claimed": len(rows), "delivered": delivered}
+
+
+_notifier: Optional[SOSNotifier] = None
+
+
+def get_sos_notifier() -> SOSNotifier:
+    global _notifier
+    if _notifier is None:
+        _notifier = SOSNotifier(get_db_provider(), get_smtp_pool())
+    return _notifier
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SOS contact notifications")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--test-email", metavar="ADDRESS", help="send a sample alert through the SMTP pool")
+    group.add_argument("--recover", action="store_true", help="deliver pending or stuck notifications once")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    smtp = get_smtp_pool()
+    db_provider = get_db_provider()
+    try:
+        if args.test_email:
+            sample = {"driver_name": "Test Driver", "severity": "test", "latitude": 52.52, "longitude": 13.405}
+            await smtp.send(build_alert(args.test_email, sample, datetime.utcnow()))
+            print(f"✅ Sent test alert to {args.test_email} via {smtp.host}:{smtp.port}")
+        else:
+            result = await SOSNotifier(db_provider, smtp).recover(pending_after=0, sending_after=600)
+            print(f"✅ Claimed {result['claimed']}, delivered {result['delivered']}")
+    finally:
+        await smtp.close()
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
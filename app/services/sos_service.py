@@ -1,19 +1,60 @@
-from typing import List, Optional
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy import DateTime, type_coerce
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
-from datetime import datetime
+from sqlmodel import func, select
+from datetime import datetime, timedelta
+from app.core.projection import columns
+from app.data.repositories.archive_repository import ArchiveRepository
 from app.data.schemas.models import FactSOS, Time, Location
+from app.services.archive_service import get_archive_cutoff
+from app.services.badge_rules_service import BadgeRulesService
+from app.services.dimension_cache import DimensionCache, get_dimension_cache
+from app.services.heatmap_service import HeatmapService
+from app.services.risk_service import RiskService
+from app.services.sos_notification_service import get_sos_notifier, queue_notifications
+
+logger = logging.getLogger(__name__)
 
 
 class SOSService:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        archive: Optional[ArchiveRepository] = None,
+        dimensions: Optional[DimensionCache] = None,
+    ):
         self.session = session
+        self.archive = archive
+        self.dimensions = dimensions or get_dimension_cache()
 
-    async def get_all_unresolved(self) -> List[FactSOS]:
+    async def get_all_unresolved(self, fields: Optional[List[str]] = None) -> list:
+        """Unresolved SOS, or only `fields` of each as mappings when given."""
+        if fields:
+            stmt = select(*columns(FactSOS, fields)).where(FactSOS.resolved == False)
+            return (await self.session.execute(stmt)).mappings().all()
         stmt = select(FactSOS).where(FactSOS.resolved == False)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def stale_unresolved(self, older_than: datetime) -> Tuple[int, Optional[datetime]]:
+        """
+        Count of unresolved SOS certainly raised before `older_than` and the start
+        of the oldest one's hour. fact_sos only records the hour (dim_time), so an
+        SOS counts once its whole hour lies before the cutoff; one raised minutes
+        ago never looks up to an hour old.
+        """
+        raised_at = type_coerce(Time.date_value + func.make_interval(0, 0, 0, 0, Time.hour), DateTime())
+        raised_by = type_coerce(Time.date_value + func.make_interval(0, 0, 0, 0, Time.hour + 1), DateTime())
+        stmt = (
+            select(func.count(), func.min(raised_at))
+            .select_from(FactSOS)
+            .join(Time, Time.time_id == FactSOS.time_id)
+            .where(FactSOS.resolved == False, raised_by < older_than)
+        )
+        count, oldest = (await self.session.execute(stmt)).one()
+        return count, oldest
+
     async def get_by_id(self, sos_id: int) -> Optional[FactSOS]:
         stmt = select(FactSOS).where(FactSOS.sos_id == sos_id)
         result = await self.session.execute(stmt)
@@ -31,29 +72,7 @@ class SOSService:
     ) -> FactSOS:
         ts = datetime.utcnow()
 
-        # Ensure time entry
-        time_stmt = select(Time).where(
-            Time.date == ts.date(),
-            Time.year == ts.year,
-            Time.month == ts.month,
-            Time.day == ts.day,
-            Time.hour == ts.hour,
-            Time.weekday == ts.weekday()
-        )
-        time_result = await self.session.execute(time_stmt)
-        time_row = time_result.scalar_one_or_none()
-        if not time_row:
-            time_row = Time(
-                date=ts.date(),
-                year=ts.year,
-                month=ts.month,
-                day=ts.day,
-                hour=ts.hour,
-                weekday=ts.weekday()
-            )
-            self.session.add(time_row)
-            await self.session.commit()
-            await self.session.refresh(time_row)
+        time_id = await self.dimensions.time_id(self.session, ts)
 
         # Create location entry
         loc = Location(latitude=latitude, longitude=longitude)
@@ -64,7 +83,7 @@ class SOSService:
         sos = FactSOS(
             driver_id=driver_id,
             vehicle_id=vehicle_id,
-            time_id=time_row.time_id,
+            time_id=time_id,
             location_id=loc.location_id,
             severity=severity,
             signature_valid=signature_valid,
@@ -72,10 +91,30 @@ class SOSService:
             resolved=False,
         )
         self.session.add(sos)
+        await BadgeRulesService(self.session).record_sos(sos, ts)
+        await RiskService(self.session).record_sos(driver_id)
+        await self.session.flush()
+        # The delivery log commits with the SOS; the emails go out after the response
+        await queue_notifications(self.session, sos.sos_id, driver_id, ts)
         await self.session.commit()
+        get_sos_notifier().enqueue(sos.sos_id)
+        await self._record_heatmap(latitude, longitude)
         await self.session.refresh(sos)
         return sos
 
+    async def _record_heatmap(self, latitude: float, longitude: float) -> None:
+        """
+        Count the committed SOS on the heatmap in its own short transaction,
+        so contention on hot cells never delays or fails the SOS itself. A
+        lost increment is corrected by the heatmap rebuild.
+        """
+        try:
+            await HeatmapService(self.session).record_sos(latitude, longitude)
+            await self.session.commit()
+        except Exception:
+            logger.exception("Failed to count SOS on the heatmap; the next rebuild will")
+            await self.session.rollback()
+
     async def resolve_sos(self, sos_id: int) -> Optional[FactSOS]:
         stmt = select(FactSOS).where(FactSOS.sos_id == sos_id)
         result = await self.session.execute(stmt)
@@ -87,3 +126,39 @@ class SOSService:
         await self.session.commit()
         await self.session.refresh(sos)
         return sos
+
+    async def export_sos(
+        self,
+        driver_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 10000,
+    ) -> List[dict]:
+        """SOS events in [start, end) with their location, including archived history."""
+        stmt = (
+            select(FactSOS, Time.date_value, Time.hour, Location.latitude, Location.longitude)
+            .join(Time, Time.time_id == FactSOS.time_id)
+            .join(Location, Location.location_id == FactSOS.location_id)
+            .order_by(Time.date_value, Time.hour)
+            .limit(limit)
+        )
+        if driver_id is not None:
+            stmt = stmt.where(FactSOS.driver_id == driver_id)
+        # dim_time has hourly resolution; the exact bounds are applied below
+        if start is not None:
+            stmt = stmt.where(Time.date_value >= start.date())
+        if end is not None:
+            stmt = stmt.where(Time.date_value <= end.date())
+        result = await self.session.execute(stmt)
+
+        events = {}
+        for sos, date_value, hour, latitude, longitude in result.all():
+            event_ts = datetime.combine(date_value, datetime.min.time()) + timedelta(hours=hour)
+            if (start is None or event_ts >= start) and (end is None or event_ts < end):
+                events[sos.sos_id] = {**sos.model_dump(), "event_ts": event_ts,
+                                      "latitude": latitude, "longitude": longitude}
+
+        if self.archive is not None and (start is None or start < get_archive_cutoff()):
+            for row in await self.archive.query("fact_sos", driver_id, start, end, limit=limit):
+                events.setdefault(row["sos_id"], row)
+        return sorted(events.values(), key=lambda event: event["event_ts"])[:limit]
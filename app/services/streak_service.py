@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db_provider
+
+EPOCH = date(1970, 1, 1)
+
+# One row per driver; the CASE arms read the pre-update row, so activity on
+# the day after last_active_day extends the run, a later day restarts it and
+# the same day (or a late, out-of-order trip or event) leaves it as is.
+RECORD_ACTIVITY_SQL = text("""
+INSERT INTO driver_streak (driver_id, last_active_day, current_streak, best_streak, updated_at)
+VALUES (:driver_id, :day, 1, 1, :now)
+ON CONFLICT (driver_id) DO UPDATE SET
+    current_streak = CASE
+        WHEN EXCLUDED.last_active_day = driver_streak.last_active_day + 1 THEN driver_streak.current_streak + 1
+        WHEN EXCLUDED.last_active_day > driver_streak.last_active_day THEN 1
+        ELSE driver_streak.current_streak
+    END,
+    best_streak = GREATEST(
+        driver_streak.best_streak,
+        CASE WHEN EXCLUDED.last_active_day = driver_streak.last_active_day + 1
+             THEN driver_streak.current_streak + 1 ELSE 1 END
+    ),
+    last_active_day = GREATEST(driver_streak.last_active_day, EXCLUDED.last_active_day),
+    updated_at = EXCLUDED.updated_at
+RETURNING driver_id, last_active_day, current_streak, best_streak
+""")
+
+# Distinct active days per driver as integers (days since 1970-01-01); a
+# gamification event counts as activity just like a trip
+ACTIVE_DAYS_SQL = text("""
+SELECT driver_id, (CAST(event_ts AS date) - DATE '1970-01-01') AS day
+FROM fact_trip
+UNION
+SELECT driver_id, (CAST(event_ts AS date) - DATE '1970-01-01') AS day
+FROM fact_gamification
+""")
+
+# Rows touched by the incremental path after the backfill started are newer than its snapshot
+BACKFILL_UPSERT_SQL = text("""
+INSERT INTO driver_streak (driver_id, last_active_day, current_streak, best_streak, updated_at)
+SELECT u.driver_id, DATE '1970-01-01' + u.day, u.current_streak, u.best_streak, :now
+FROM unnest(
+    CAST(:driver_ids AS integer[]), CAST(:days AS integer[]),
+    CAST(:current AS integer[]), CAST(:best AS integer[])
+) AS u(driver_id, day, current_streak, best_streak)
+ON CONFLICT (driver_id) DO UPDATE SET
+    last_active_day = EXCLUDED.last_active_day,
+    current_streak = EXCLUDED.current_streak,
+    best_streak = EXCLUDED.best_streak,
+    updated_at = EXCLUDED.updated_at
+WHERE driver_streak.updated_at <= :started
+""")
+
+
+def compute_streaks(driver_ids: np.ndarray, days: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Streak state for every driver from (driver_id, day number) activity pairs,
+    in any order and with repeats. Returns equal-length arrays driver_id,
+    last_day, current and best, sorted by driver_id.
+    """
+    driver_ids = np.asarray(driver_ids, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    if len(driver_ids) == 0:
+        empty = np.array([], dtype=np.int64)
+        return {"driver_id": empty, "last_day": empty, "current": empty, "best": empty}
+
+    order = np.lexsort((days, driver_ids))
+    driver, day = driver_ids[order], days[order]
+    distinct = np.ones(len(driver), dtype=bool)
+    distinct[1:] = (driver[1:] != driver[:-1]) | (day[1:] != day[:-1])
+    driver, day = driver[distinct], day[distinct]
+
+    # A run of consecutive days starts at each new driver or each gap
+    new_run = np.ones(len(driver), dtype=bool)
+    new_run[1:] = (driver[1:] != driver[:-1]) | (day[1:] != day[:-1] + 1)
+    run_starts = np.flatnonzero(new_run)
+    run_length = np.diff(np.append(run_starts, len(driver)))
+    run_driver = driver[run_starts]
+
+    first_run = np.flatnonzero(np.r_[True, run_driver[1:] != run_driver[:-1]])
+    last_run = np.r_[first_run[1:], len(run_starts)] - 1
+    last_row = np.r_[np.flatnonzero(driver[1:] != driver[:-1]), len(driver) - 1]
+    return {
+        "driver_id": run_driver[first_run],
+        "last_day": day[last_row],
+        "current": run_length[last_run],
+        "best": np.maximum.reduceat(run_length, first_run),
+    }
+
+
+def effective_streak(last_active_day: Optional[date], current_streak: int, today: Optional[date] = None) -> int:
+    """The stored streak as of `today`: still alive if the driver drove today or yesterday."""
+    if last_active_day is None:
+        return 0
+    today = today or datetime.utcnow().date()
+    return current_streak if last_active_day >= today - timedelta(days=1) else 0
+
+
+class StreakService:
+    """
+    Per-driver driving streaks kept in driver_streak.
+
+    record_activity is one upsert per trip or gamification event (O(1), no
+    history read) and runs in the caller's transaction; backfill recomputes
+    every driver from fact_trip and fact_gamification in a single vectorised pass.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def record_activity(self, driver_id: int, ts: datetime) -> dict:
+        result = await self.session.execute(
+            RECORD_ACTIVITY_SQL, {"driver_id": driver_id, "day": ts.date(), "now": datetime.utcnow()}
+        )
+        return dict(result.mappings().one())
+
+    async def get_streak(self, driver_id: int, today: Optional[date] = None) -> dict:
+        result = await self.session.execute(
+            text("SELECT last_active_day, current_streak, best_streak FROM driver_streak WHERE driver_id = :driver_id"),
+            {"driver_id": driver_id},
+        )
+        row = result.mappings().one_or_none()
+        if row is None:
+            return {"driver_id": driver_id, "last_active_day": None, "current_streak": 0, "best_streak": 0}
+        return {
+            "driver_id": driver_id,
+            "last_active_day": row["last_active_day"],
+            "current_streak": effective_streak(row["last_active_day"], row["current_streak"], today),
+            "best_streak": row["best_streak"],
+        }
+
+    async def backfill(self, chunk_size: int = 50_000) -> Tuple[int, int]:
+        """
+        Recompute all streaks from fact_trip and fact_gamification. Trips moved to the Parquet
+        archive are not seen, so runs reaching into archived months are
+        shortened. Returns (active driver-days read, drivers written).
+        """
+        started = datetime.utcnow()
+        result = await self.session.execute(ACTIVE_DAYS_SQL)
+        rows = result.all()
+        pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        streaks = compute_streaks(pairs[:, 0], pairs[:, 1])
+
+        written = len(streaks["driver_id"])
+        for offset in range(0, written, chunk_size):
+            window = slice(offset, offset + chunk_size)
+            await self.session.execute(BACKFILL_UPSERT_SQL, {
+                "driver_ids": streaks["driver_id"][window].tolist(),
+                "days": streaks["last_day"][window].tolist(),
+                "current": streaks["current"][window].tolist(),
+                "best": streaks["best"][window].tolist(),
+                "now": datetime.utcnow(),
+                "started": started,
+            })
+        await self.session.commit()
+        return len(rows), written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute every driver's streak from fact_trip and fact_gamification")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    db_provider = get_db_provider()
+    started = time.perf_counter()
+    try:
+        async with db_provider.get_session_factory()() as session:
+            days, drivers = await StreakService(session).backfill(args.chunk_size)
+        print(f"✅ {drivers} driver streaks from {days} active days in {time.perf_counter() - started:.1f}s")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
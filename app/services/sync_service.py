@@ -0,0 +1,143 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from app.data.schemas.models import FactGamification, FactTrip, SyncTombstone
+
+
+# Columns sent to devices per synced table, in wire order
+TRIP_COLUMNS = [
+    "trip_id", "vehicle_id", "event_ts", "distance_km", "avg_speed", "harsh_events",
+    "eco_score", "safety_score", "trip_duration_sec", "max_speed",
+]
+GAMIFICATION_COLUMNS = ["gamelog_id", "event_ts", "badge_id", "score_change", "streak_days"]
+
+# table_name stored in sync_tombstone -> key in the response's "deleted" map
+TOMBSTONE_KEYS = {"fact_trip": "trips", "fact_gamification": "gamification"}
+
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+# Oldest transaction still running; every writer below it has committed or aborted
+SNAPSHOT_XMIN_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def _base36(value: int) -> str:
+    out = ""
+    while True:
+        value, rem = divmod(value, 36)
+        out = DIGITS[rem] + out
+        if not value:
+            return out
+
+
+def encode_cursor(position: Tuple[int, int]) -> str:
+    """Opaque, compact cursor: the (change_xid, change_seq) position in base 36."""
+    change_xid, change_seq = position
+    return f"{_base36(change_xid)}.{_base36(change_seq)}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    if not cursor:
+        return (0, 0)
+    try:
+        if "." not in cursor:
+            # Cursor from before change_xid: rows from pre-migration transactions
+            # (change_xid 1) resume at its change_seq, later ones are resent
+            return (1, int(cursor, 36))
+        change_xid, change_seq = cursor.split(".")
+        return (int(change_xid, 36), int(change_seq, 36))
+    except ValueError:
+        raise ValueError("Invalid sync cursor")
+
+
+class SyncService:
+    """
+    Per-driver change feed over fact_trip, fact_gamification and tombstones.
+
+    Every insert/update of a synced row and every tombstone records its
+    writer's transaction id (change_xid) and draws from one sequence
+    (fact_change_seq), so a single (change_xid, change_seq) cursor orders all
+    of a driver's changes and each page is an index range scan on
+    (driver_id, change_xid, change_seq).
+
+    Sequence values are handed out before commit, so a slow transaction can
+    commit behind one that was already synced. The feed therefore stops below
+    the oldest transaction still running: everything before that point has
+    either committed or aborted, and nothing can appear behind the cursor
+    later. A long write transaction delays the feed until it ends.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _changed(self, model, columns: List[str], driver_id: int, after: Tuple[int, int], horizon: int, limit: int) -> List[tuple]:
+        stmt = (
+            select(model.change_xid, model.change_seq, *(getattr(model, c) for c in columns))
+            .where(
+                model.driver_id == driver_id,
+                tuple_(model.change_xid, model.change_seq) > tuple_(*after),
+                model.change_xid < horizon,
+            )
+            .order_by(model.change_xid, model.change_seq)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def _deleted(self, driver_id: int, after: Tuple[int, int], horizon: int, limit: int) -> List[tuple]:
+        stmt = (
+            select(SyncTombstone.change_xid, SyncTombstone.change_seq, SyncTombstone.table_name, SyncTombstone.record_id)
+            .where(
+                SyncTombstone.driver_id == driver_id,
+                tuple_(SyncTombstone.change_xid, SyncTombstone.change_seq) > tuple_(*after),
+                SyncTombstone.change_xid < horizon,
+            )
+            .order_by(SyncTombstone.change_xid, SyncTombstone.change_seq)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def changes_since(self, driver_id: int, cursor: Optional[str], limit: int = 500) -> dict:
+        """
+        One page of changes after `cursor`, encoded column-wise:
+            {"cursor", "has_more",
+             "trips": {"columns": [...], "rows": [[...], ...]},
+             "gamification": {...},
+             "deleted": {"trips": [ids], "gamification": [ids]}}
+        """
+        since = decode_cursor(cursor)
+        # Read once: rows written below it are final for every query of this page
+        horizon = (await self.session.execute(SNAPSHOT_XMIN_SQL)).scalar_one()
+
+        # Each stream is ordered by (change_xid, change_seq); fetching limit + 1 from
+        # each and merging gives the first `limit` changes overall and tells us if more remain
+        streams: List[Tuple[str, List[tuple]]] = [
+            ("trips", await self._changed(FactTrip, TRIP_COLUMNS, driver_id, since, horizon, limit + 1)),
+            ("gamification", await self._changed(FactGamification, GAMIFICATION_COLUMNS, driver_id, since, horizon, limit + 1)),
+            ("deleted", await self._deleted(driver_id, since, horizon, limit + 1)),
+        ]
+        merged = sorted(
+            ((row[:2], kind, row[2:]) for kind, rows in streams for row in rows),
+            key=lambda item: item[0],
+        )
+        page, has_more = merged[:limit], len(merged) > limit
+
+        trips, gamification = [], []
+        deleted = {key: [] for key in TOMBSTONE_KEYS.values()}
+        for _position, kind, row in page:
+            if kind == "trips":
+                trips.append(list(row))
+            elif kind == "gamification":
+                gamification.append(list(row))
+            else:
+                deleted[TOMBSTONE_KEYS[row[0]]].append(row[1])
+
+        return {
+            "cursor": encode_cursor(tuple(page[-1][0]) if page else since),
+            "has_more": has_more,
+            "trips": {"columns": TRIP_COLUMNS, "rows": trips},
+            "gamification": {"columns": GAMIFICATION_COLUMNS, "rows": gamification},
+            "deleted": deleted,
+        }
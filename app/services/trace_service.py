@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.core.database import get_db_provider
+from app.data import route_geometry, trace_codec
+from app.data.schemas.models import FactTrip, TripRoute
+from app.services.cache_service import CacheService
+
+UPSERT_TRACE_SQL = text("""
+INSERT INTO trip_trace (trip_id, start_ts, end_ts, point_count, block_size, encoding, compressed,
+                        block_index, data, created_at)
+VALUES (:trip_id, :start_ts, :end_ts, :point_count, :block_size, :encoding, :compressed,
+        :block_index, :data, :now)
+ON CONFLICT (trip_id) DO UPDATE SET
+    start_ts = EXCLUDED.start_ts,
+    end_ts = EXCLUDED.end_ts,
+    point_count = EXCLUDED.point_count,
+    block_size = EXCLUDED.block_size,
+    encoding = EXCLUDED.encoding,
+    compressed = EXCLUDED.compressed,
+    block_index = EXCLUDED.block_index,
+    data = EXCLUDED.data,
+    created_at = EXCLUDED.created_at
+""")
+
+# Everything but the data column
+TRACE_META_SQL = text("""
+SELECT start_ts, end_ts, point_count, block_size, encoding, compressed, block_index, octet_length(data) AS size
+FROM trip_trace WHERE trip_id = :trip_id
+""")
+
+# Only the byte ranges of the requested blocks leave the TOAST table
+TRACE_BLOCKS_SQL = text("""
+SELECT b.number, substring(t.data FROM b.byte_offset + 1 FOR b.length) AS bytes
+FROM trip_trace t,
+     unnest(CAST(:numbers AS integer[]), CAST(:offsets AS integer[]), CAST(:lengths AS integer[]))
+         AS b(number, byte_offset, length)
+WHERE t.trip_id = :trip_id
+""")
+
+
+INSERT_ROUTE_SQL = text("""
+INSERT INTO trip_route (trip_id, zoom, point_count, polyline) VALUES (:trip_id, :zoom, :point_count, :polyline)
+""")
+
+
+def route_cache_key(trip_id: int, zoom: int) -> str:
+    return f"trip_route:{trip_id}:{zoom}"
+
+
+def build_routes(encoded: trace_codec.EncodedTrace) -> List[dict]:
+    """Simplified polyline per zoom level, from the stored (quantised) points."""
+    points = trace_codec.decode(encoded)
+    levels = route_geometry.simplify_levels(points["lat"], points["lon"])
+    return [
+        {
+            "zoom": zoom,
+            "point_count": len(kept),
+            "polyline": route_geometry.encode_polyline(points["lat"][kept], points["lon"][kept]),
+        }
+        for zoom, kept in levels.items()
+    ]
+
+
+def encode_trace(t, lat, lon, speed, encoding: str, compress: bool) -> Tuple[trace_codec.EncodedTrace, List[dict]]:
+    encoded = trace_codec.encode(t, lat, lon, speed, encoding=encoding, compress=compress)
+    return encoded, build_routes(encoded)
+
+
+def to_epoch_ms(ts: datetime) -> int:
+    """Epoch milliseconds; naive datetimes are UTC like event_ts."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(round(ts.timestamp() * 1000))
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+class TraceService:
+    """
+    Per-trip GPS/speed traces stored as block-encoded blobs in trip_trace.
+
+    Reads fetch the block index first, then only the blocks that overlap the
+    requested time range or hold the points kept by downsampling, each
+    pulled with substring() from the uncompressed TOAST value.
+
+    Map geometry is simplified per zoom level when the trace is stored and
+    kept in trip_route as encoded polylines, cached in Redis on read, so map
+    requests never simplify on the fly.
+    """
+
+    def __init__(self, session: AsyncSession, cache_service: Optional[CacheService] = None):
+        self.session = session
+        self.cache_service = cache_service
+        self.route_cache_ttl = int(os.environ.get("TRACE_ROUTE_CACHE_TTL", "3600"))
+
+    async def store_trace(
+        self,
+        trip_id: int,
+        t: Sequence[int],
+        lat: Sequence[float],
+        lon: Sequence[float],
+        speed: Sequence[float],
+        encoding: str = trace_codec.VARINT,
+        compress: bool = True,
+    ) -> Optional[dict]:
+        """Replace the trip's trace; t is epoch ms. Returns None if the trip does not exist."""
+        found = await self.session.execute(select(FactTrip.trip_id).where(FactTrip.trip_id == trip_id))
+        if found.scalar_one_or_none() is None:
+            return None
+        # Encoding and simplification are CPU-bound; keep them off the event loop
+        encoded, routes = await asyncio.to_thread(encode_trace, t, lat, lon, speed, encoding, compress)
+        index = trace_codec.read_index(encoded.index)
+        end_ms = encoded.start_ms + int(index["last_ms"][-1])
+        await self.session.execute(UPSERT_TRACE_SQL, {
+            "trip_id": trip_id,
+            "start_ts": from_epoch_ms(encoded.start_ms),
+            "end_ts": from_epoch_ms(end_ms),
+            "point_count": encoded.point_count,
+            "block_size": encoded.block_size,
+            "encoding": encoded.encoding,
+            "compressed": encoded.compressed,
+            "block_index": encoded.index,
+            "data": encoded.data,
+            "now": datetime.utcnow(),
+        })
+        await self.session.execute(text("DELETE FROM trip_route WHERE trip_id = :trip_id"), {"trip_id": trip_id})
+        await self.session.execute(INSERT_ROUTE_SQL, [{"trip_id": trip_id, **route} for route in routes])
+        await self.session.commit()
+        await self.invalidate_routes(trip_id)
+        return {
+            "trip_id": trip_id,
+            "point_count": encoded.point_count,
+            "blocks": len(index),
+            "encoding": encoded.encoding,
+            "compressed": encoded.compressed,
+            "size_bytes": len(encoded.data) + len(encoded.index),
+            "route_levels": {route["zoom"]: route["point_count"] for route in routes},
+        }
+
+    async def _fetch_blocks(self, trip_id: int, index: np.ndarray, numbers: Iterable[int]) -> Dict[int, bytes]:
+        numbers = sorted(set(int(n) for n in numbers))
+        if not numbers:
+            return {}
+        result = await self.session.execute(TRACE_BLOCKS_SQL, {
+            "trip_id": trip_id,
+            "numbers": numbers,
+            "offsets": [int(index[n]["offset"]) for n in numbers],
+            "lengths": [int(index[n]["length"]) for n in numbers],
+        })
+        return {row.number: bytes(row.bytes) for row in result}
+
+    async def get_trace(
+        self,
+        trip_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        Points in [start, end), evenly thinned to at most `max_points`
+        (always keeping the first and last). None if the trip has no trace.
+        """
+        meta = (await self.session.execute(TRACE_META_SQL, {"trip_id": trip_id})).mappings().one_or_none()
+        if meta is None:
+            return None
+        index = trace_codec.read_index(meta["block_index"])
+        block_size = meta["block_size"]
+        start_ms = to_epoch_ms(meta["start_ts"])
+        start_rel = to_epoch_ms(start) - start_ms if start is not None else None
+        end_rel = to_epoch_ms(end) - start_ms if end is not None else None
+
+        def decode(blocks: Dict[int, bytes]) -> Dict[int, Dict[str, np.ndarray]]:
+            return trace_codec.decode_blocks(blocks, index, meta["encoding"], meta["compressed"])
+
+        candidates = trace_codec.blocks_for_range(index, start_rel, end_rel)
+        decoded: Dict[int, Dict[str, np.ndarray]] = {}
+        if len(candidates):
+            first_block, last_block = int(candidates[0]), int(candidates[-1])
+            # Only the edge blocks are needed to turn the time range into point positions
+            if start_rel is not None or end_rel is not None:
+                decoded.update(decode(await self._fetch_blocks(trip_id, index, {first_block, last_block})))
+            lo = first_block * block_size
+            if start_rel is not None:
+                lo += int(np.searchsorted(decoded[first_block]["t"], start_rel, side="left"))
+            hi = last_block * block_size + int(index[last_block]["points"])
+            if end_rel is not None:
+                hi = last_block * block_size + int(np.searchsorted(decoded[last_block]["t"], end_rel, side="left"))
+        else:
+            lo = hi = 0
+
+        if hi <= lo:
+            positions = np.zeros(0, dtype=np.int64)
+        elif max_points and hi - lo > max_points:
+            positions = np.unique(np.linspace(lo, hi - 1, max_points).round().astype(np.int64))
+        else:
+            positions = np.arange(lo, hi, dtype=np.int64)
+
+        blocks_of = positions // block_size
+        missing = set(np.unique(blocks_of).tolist()) - set(decoded)
+        decoded.update(decode(await self._fetch_blocks(trip_id, index, missing)))
+
+        columns: Dict[str, List[np.ndarray]] = {name: [] for name in trace_codec.COLUMNS}
+        for number in np.unique(blocks_of):
+            local = positions[blocks_of == number] - number * block_size
+            for name in trace_codec.COLUMNS:
+                columns[name].append(decoded[int(number)][name][local])
+        points = {
+            name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in columns.items()
+        }
+        return {
+            "trip_id": trip_id,
+            "start_ts": meta["start_ts"],
+            "end_ts": meta["end_ts"],
+            "point_count": meta["point_count"],
+            "returned": len(positions),
+            "blocks_read": len(decoded),
+            "blocks_total": len(index),
+            "t": (points["t"].astype(np.int64) + start_ms).tolist(),
+            "lat": np.round(points["lat"].astype(np.float64), 6).tolist(),
+            "lon": np.round(points["lon"].astype(np.float64), 6).tolist(),
+            "speed": np.round(points["speed"].astype(np.float64), 1).tolist(),
+        }
+
+    async def get_route(self, trip_id: int, zoom: int) -> Optional[dict]:
+        """Precomputed polyline of the level that draws exactly at `zoom`; None if the trip has no trace."""
+        level = route_geometry.level_for_zoom(zoom)
+        cache_key = route_cache_key(trip_id, level)
+        if self.cache_service is not None:
+            cached = await self.cache_service.get_json(cache_key)
+            if cached is not None:
+                return {**cached, "zoom": zoom}
+
+        result = await self.session.execute(
+            select(TripRoute).where(TripRoute.trip_id == trip_id, TripRoute.zoom == level)
+        )
+        route = result.scalar_one_or_none()
+        if route is None:
+            return None
+        payload = {
+            "trip_id": trip_id,
+            "level": level,
+            "point_count": route.point_count,
+            "polyline": route.polyline,
+        }
+        if self.cache_service is not None:
+            await self.cache_service.set_json(cache_key, payload, ttl=self.route_cache_ttl)
+        return {**payload, "zoom": zoom}
+
+    async def rebuild_routes(self, trip_id: int) -> bool:
+        """Recompute the zoom levels of an already stored trace."""
+        row = (await self.session.execute(
+            text("SELECT start_ts, point_count, block_size, encoding, compressed, block_index, data "
+                 "FROM trip_trace WHERE trip_id = :trip_id"),
+            {"trip_id": trip_id},
+        )).mappings().one_or_none()
+        if row is None:
+            return False
+        encoded = trace_codec.EncodedTrace(
+            start_ms=to_epoch_ms(row["start_ts"]),
+            point_count=row["point_count"],
+            block_size=row["block_size"],
+            encoding=row["encoding"],
+            compressed=row["compressed"],
+            index=bytes(row["block_index"]),
+            data=bytes(row["data"]),
+        )
+        routes = await asyncio.to_thread(build_routes, encoded)
+        await self.session.execute(text("DELETE FROM trip_route WHERE trip_id = :trip_id"), {"trip_id": trip_id})
+        await self.session.execute(INSERT_ROUTE_SQL, [{"trip_id": trip_id, **route} for route in routes])
+        await self.session.commit()
+        await self.invalidate_routes(trip_id)
+        return True
+
+    async def invalidate_routes(self, trip_id: int) -> None:
+        if self.cache_service is not None:
+            for zoom in route_geometry.ZOOM_LEVELS:
+                await self.cache_service.invalidate_cache(route_cache_key(trip_id, zoom))
+
+    async def delete_trace(self, trip_id: int) -> None:
+        """Drop the trace and its routes in the caller's transaction; invalidate_routes() after commit."""
+        await self.session.execute(text("DELETE FROM trip_trace WHERE trip_id = :trip_id"), {"trip_id": trip_id})
+        await self.session.execute(text("DELETE FROM trip_route WHERE trip_id = :trip_id"), {"trip_id": trip_id})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the map zoom levels of stored trip traces")
+    parser.add_argument("--all", action="store_true", help="rebuild every trace, not only those without levels")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    db_provider = get_db_provider()
+    started = time.perf_counter()
+    try:
+        async with db_provider.get_session_factory()() as session:
+            sql = "SELECT trip_id FROM trip_trace"
+            if not args.all:
+                sql += " t WHERE NOT EXISTS (SELECT 1 FROM trip_route r WHERE r.trip_id = t.trip_id)"
+            trip_ids = (await session.execute(text(sql))).scalars().all()
+            service = TraceService(session, CacheService())
+            for trip_id in trip_ids:
+                await service.rebuild_routes(trip_id)
+        print(f"✅ Rebuilt route levels for {len(trip_ids)} traces in {time.perf_counter() - started:.1f}s")
+    finally:
+        await db_provider.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
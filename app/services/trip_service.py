@@ -1,16 +1,38 @@
 from typing import List, Optional
+from sqlalchemy import any_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
-from datetime import datetime
-from app.data.schemas.models import FactTrip, Time
+from sqlmodel import select, func
+from datetime import datetime, timezone
+from app.core.projection import columns
+from app.data.repositories.archive_repository import ArchiveRepository
+from app.data.schemas.models import ArchiveBatch, FactTrip, SyncTombstone
+from app.services.archive_service import get_archive_cutoff
+from app.services.badge_rules_service import BadgeRulesService
+from app.services.cache_service import CacheService
+from app.services.dimension_cache import DimensionCache, get_dimension_cache
+from app.services.risk_service import RiskService
+from app.services.streak_service import StreakService
+from app.services.trace_service import TraceService
 
 
 class TripService:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        archive: Optional[ArchiveRepository] = None,
+        dimensions: Optional[DimensionCache] = None,
+    ):
         self.session = session
+        self.archive = archive
+        self.dimensions = dimensions or get_dimension_cache()
 
-    async def get_all_trips(self, limit: int = 100) -> List[FactTrip]:
-        stmt = select(FactTrip).limit(limit)
+    async def get_all_trips(self, limit: int = 100, fields: Optional[List[str]] = None) -> list:
+        """Most recent trips, or only `fields` of each as mappings when given."""
+        if fields:
+            stmt = select(*columns(FactTrip, fields)).order_by(FactTrip.event_ts.desc()).limit(limit)
+            return (await self.session.execute(stmt)).mappings().all()
+        # Most recent first; ix_fact_trip_event_ts lets Postgres read the newest partitions first
+        stmt = select(FactTrip).order_by(FactTrip.event_ts.desc()).limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
@@ -34,35 +56,16 @@ class TripService:
     ) -> FactTrip:
         """Insert trip and auto-manage time dimension entry."""
         ts = timestamp or datetime.utcnow()
-        # Create or reuse time_id
-        time_stmt = select(Time).where(
-            Time.date == ts.date(),
-            Time.year == ts.year,
-            Time.month == ts.month,
-            Time.day == ts.day,
-            Time.hour == ts.hour,
-            Time.weekday == ts.weekday()
-        )
-        time_result = await self.session.execute(time_stmt)
-        time_row = time_result.scalar_one_or_none()
-
-        if not time_row:
-            time_row = Time(
-                date=ts.date(),
-                year=ts.year,
-                month=ts.month,
-                day=ts.day,
-                hour=ts.hour,
-                weekday=ts.weekday()
-            )
-            self.session.add(time_row)
-            await self.session.commit()
-            await self.session.refresh(time_row)
+        if ts.tzinfo is not None:
+            # event_ts is stored as naive UTC
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        time_id = await self.dimensions.time_id(self.session, ts)
 
         trip = FactTrip(
             driver_id=driver_id,
             vehicle_id=vehicle_id,
-            time_id=time_row.time_id,
+            time_id=time_id,
+            event_ts=ts,
             distance_km=distance_km,
             avg_speed=avg_speed,
             harsh_events=harsh_events,
@@ -72,6 +75,11 @@ class TripService:
             max_speed=max_speed,
         )
         self.session.add(trip)
+        # Same transaction: streaks, aggregates, risk and badge awards stay consistent with the facts
+        streak = await StreakService(self.session).record_activity(driver_id, ts)
+        # dim_time.hour is the hour of ts
+        await RiskService(self.session).record_trip(driver_id, distance_km, harsh_events, max_speed, ts.hour)
+        await BadgeRulesService(self.session).record_trip(trip, streak)
         await self.session.commit()
         await self.session.refresh(trip)
         return trip
@@ -83,5 +91,101 @@ class TripService:
         if not trip:
             return False
         await self.session.delete(trip)
+        traces = TraceService(self.session, CacheService())
+        await traces.delete_trace(trip_id)
+        # Same transaction as the delete: synced devices drop the trip on their next sync
+        self.session.add(SyncTombstone(table_name="fact_trip", record_id=trip.trip_id, driver_id=trip.driver_id))
         await self.session.commit()
+        await traces.invalidate_routes(trip_id)
         return True
+
+    def _reaches_archive(self, start: Optional[datetime]) -> bool:
+        return self.archive is not None and (start is None or start < get_archive_cutoff())
+
+    async def export_trips(
+        self,
+        driver_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 10000,
+    ) -> List[dict]:
+        """Trips in [start, end) from Postgres, falling back to the archive for cold history."""
+        stmt = select(FactTrip).order_by(FactTrip.event_ts).limit(limit)
+        if driver_id is not None:
+            stmt = stmt.where(FactTrip.driver_id == driver_id)
+        if start is not None:
+            stmt = stmt.where(FactTrip.event_ts >= start)
+        if end is not None:
+            stmt = stmt.where(FactTrip.event_ts < end)
+        result = await self.session.execute(stmt)
+        trips = {trip.trip_id: trip.model_dump() for trip in result.scalars().all()}
+
+        if self._reaches_archive(start):
+            for row in await self.archive.query("fact_trip", driver_id, start, end, limit=limit):
+                trips.setdefault(row["trip_id"], row)
+        return sorted(trips.values(), key=lambda trip: trip["event_ts"])[:limit]
+
+    async def get_trip_stats(
+        self,
+        driver_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> dict:
+        """Trip aggregates over [start, end), combining Postgres and archived history."""
+        stmt = select(
+            func.count(FactTrip.trip_id),
+            func.coalesce(func.sum(FactTrip.distance_km), 0.0),
+            func.coalesce(func.sum(FactTrip.harsh_events), 0),
+            func.coalesce(func.sum(FactTrip.eco_score), 0.0),
+            func.count(FactTrip.eco_score),
+            func.coalesce(func.sum(FactTrip.safety_score), 0.0),
+            func.count(FactTrip.safety_score),
+            func.max(FactTrip.max_speed),
+        )
+        if driver_id is not None:
+            stmt = stmt.where(FactTrip.driver_id == driver_id)
+        if start is not None:
+            stmt = stmt.where(FactTrip.event_ts >= start)
+        if end is not None:
+            stmt = stmt.where(FactTrip.event_ts < end)
+        row = (await self.session.execute(stmt)).one()
+        totals = dict(zip(
+            ("trip_count", "total_distance_km", "total_harsh_events", "eco_score_sum",
+             "eco_score_count", "safety_score_sum", "safety_score_count", "max_speed"),
+            row,
+        ))
+
+        if self._reaches_archive(start):
+            # A crash between the Parquet write and the Postgres delete can leave one batch
+            # in both places until the next archive run; its marker lists the rows to count
+            # from Postgres only. Normally there is none and nothing is excluded.
+            pending = (
+                select(FactTrip.trip_id)
+                .join(ArchiveBatch, FactTrip.trip_id == any_(ArchiveBatch.record_ids))
+                .where(ArchiveBatch.table_name == "fact_trip", FactTrip.event_ts < get_archive_cutoff())
+            )
+            if driver_id is not None:
+                pending = pending.where(FactTrip.driver_id == driver_id)
+            if start is not None:
+                pending = pending.where(FactTrip.event_ts >= start)
+            if end is not None:
+                pending = pending.where(FactTrip.event_ts < end)
+            pending_ids = (await self.session.execute(pending)).scalars().all()
+            archived = await self.archive.trip_totals(driver_id, start, end, exclude_trip_ids=pending_ids)
+            speeds = [v for v in (totals["max_speed"], archived.pop("max_speed")) if v is not None]
+            totals["max_speed"] = max(speeds) if speeds else None
+            for key, value in archived.items():
+                totals[key] += value
+
+        return {
+            "trip_count": totals["trip_count"],
+            "total_distance_km": float(totals["total_distance_km"]),
+            "total_harsh_events": int(totals["total_harsh_events"]),
+            "avg_eco_score": (
+                totals["eco_score_sum"] / totals["eco_score_count"] if totals["eco_score_count"] else None
+            ),
+            "avg_safety_score": (
+                totals["safety_score_sum"] / totals["safety_score_count"] if totals["safety_score_count"] else None
+            ),
+            "max_speed": totals["max_speed"],
+        }
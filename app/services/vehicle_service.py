@@ -1,15 +1,25 @@
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from app.core.projection import columns
 from app.data.schemas.models import Vehicle
+from app.services.bulk_operations import build_selection, bulk_delete, bulk_update
+
+# Columns the bulk endpoints may set or select on
+BULK_UPDATABLE = frozenset({"make", "model", "year", "type"})
+BULK_FILTERABLE = frozenset({"make", "model", "year", "type"})
 
 
 class VehicleService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_all_vehicles(self, limit: int = 100) -> List[Vehicle]:
+    async def get_all_vehicles(self, limit: int = 100, fields: Optional[List[str]] = None) -> list:
+        """Vehicles, or only `fields` of each as mappings when given."""
+        if fields:
+            stmt = select(*columns(Vehicle, fields)).limit(limit)
+            return (await self.session.execute(stmt)).mappings().all()
         stmt = select(Vehicle).limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
@@ -48,3 +58,14 @@ class VehicleService:
         await self.session.delete(vehicle)
         await self.session.commit()
         return True
+
+    async def bulk_update_vehicles(
+        self, ids: Optional[List[int]], filters: Optional[Dict[str, Any]], updates: Dict[str, Any],
+    ) -> List[int]:
+        """Apply `updates` to every selected vehicle in one statement; returns the updated ids."""
+        selection = build_selection(Vehicle, "vehicle_id", ids, filters, BULK_FILTERABLE)
+        return await bulk_update(self.session, Vehicle, "vehicle_id", selection, updates, BULK_UPDATABLE)
+
+    async def bulk_delete_vehicles(self, ids: Optional[List[int]], filters: Optional[Dict[str, Any]]) -> int:
+        selection = build_selection(Vehicle, "vehicle_id", ids, filters, BULK_FILTERABLE)
+        return await bulk_delete(self.session, Vehicle, "vehicle_id", selection)
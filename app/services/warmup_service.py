@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import DatabaseProvider
+from app.core.route_classes import CRITICAL, INTERACTIVE
+from app.services.cache_service import CacheService
+from app.services.dimension_cache import DimensionCache
+from app.services.driver_service import DriverService
+from app.services.gamification_service import GamificationService
+from app.services.sos_service import SOSService
+from app.services.trip_service import TripService
+
+logger = logging.getLogger(__name__)
+
+# Hot request-path statements. asyncpg caches prepared statements per
+# connection keyed by SQL text, so running these once on every pooled
+# connection means the first real requests skip the parse/plan round trip.
+PRIME_QUERIES: List[Callable[[AsyncSession, DimensionCache], Awaitable]] = [
+    lambda session, dims: DriverService(session).get_driver_by_id(0),
+    lambda session, dims: TripService(session, dimensions=dims).get_trip_by_id(0),
+    lambda session, dims: TripService(session, dimensions=dims).get_all_trips(limit=1),
+    lambda session, dims: SOSService(session, dimensions=dims).get_by_id(0),
+    lambda session, dims: GamificationService(session, dimensions=dims).compute_leaderboard(days=7, limit=1),
+]
+
+
+class WarmupService:
+    """
+    Startup warm-up: pre-opens pooled connections and primes their prepared
+    statements, preloads dimension rows into the DimensionCache and computes
+    the default leaderboard into Redis. `ready` flips once it has completed;
+    /readyz reports it.
+    """
+
+    def __init__(
+        self,
+        db_provider: DatabaseProvider,
+        cache_service: CacheService,
+        dimensions: DimensionCache,
+        pool_connections: Optional[int] = None,
+        time_days: Optional[int] = None,
+    ):
+        self.db_provider = db_provider
+        self.cache_service = cache_service
+        self.dimensions = dimensions
+        self.pool_connections = (
+            pool_connections if pool_connections is not None
+            else int(os.environ.get("WARMUP_POOL_CONNECTIONS", "10"))
+        )
+        self.time_days = time_days if time_days is not None else int(os.environ.get("WARMUP_TIME_DAYS", "7"))
+        self.ready = False
+        self.report: dict = {}
+        self.error: Optional[str] = None
+
+    async def _step(self, name: str, coro) -> None:
+        started = time.perf_counter()
+        result = await coro
+        self.report[name] = {"result": result, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    # -----------------------------------------------------------------
+    # Steps
+    # -----------------------------------------------------------------
+    async def warm_pools(self) -> dict:
+        """The interactive pool and the SOS pool, which must not pay connection setup on a first alert."""
+        return {route_class: await self.warm_pool(route_class) for route_class in (INTERACTIVE, CRITICAL)}
+
+    async def warm_pool(self, route_class: str = INTERACTIVE) -> int:
+        """Check out `pool_connections` connections at once so the pool opens that many, priming each."""
+        engine = self.db_provider.get_engine(route_class)
+        # Never ask for more than the steady-state pool keeps, or overflow connections get discarded
+        target = min(self.pool_connections, engine.pool.size())
+        all_open = asyncio.Event()
+        opened = 0
+
+        async def hold_one():
+            nonlocal opened
+            try:
+                async with engine.connect() as conn:
+                    opened += 1
+                    if opened == target:
+                        all_open.set()
+                    async with AsyncSession(bind=conn) as session:
+                        for prime in PRIME_QUERIES:
+                            await prime(session, self.dimensions)
+                    # Keep the connection checked out until every one is open,
+                    # otherwise the pool would hand the same connection back
+                    await all_open.wait()
+            except BaseException:
+                all_open.set()  # release the others so the failure surfaces
+                raise
+
+        if target > 0:
+            await asyncio.gather(*(hold_one() for _ in range(target)))
+        return opened
+
+    async def load_dimensions(self) -> dict:
+        async with self.db_provider.get_session_factory()() as session:
+            return {
+                "dim_badge": await self.dimensions.load_badges(session),
+                "dim_emergency_number": await self.dimensions.load_emergency_numbers(session),
+                "dim_time": await self.dimensions.load_recent_times(session, self.time_days),
+            }
+
+    async def cache_leaderboard(self) -> int:
+        async with self.db_provider.get_session_factory()() as session:
+            # Default /gamification/leaderboard parameters
+            leaderboard = await GamificationService(session, self.cache_service, self.dimensions).get_leaderboard()
+            return len(leaderboard)
+
+    # -----------------------------------------------------------------
+    # Entry point
+    # -----------------------------------------------------------------
+    async def run(self, retry_delay: float = 1.0, max_delay: float = 30.0) -> None:
+        """Run all steps, retrying with backoff until the database is reachable."""
+        started = time.perf_counter()
+        delay = retry_delay
+        while True:
+            try:
+                await self._step("pools", self.warm_pools())
+                await self._step("dimensions", self.load_dimensions())
+                await self._step("leaderboard", self.cache_leaderboard())
+                break
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                logger.warning("Warm-up failed, retrying in %.0fs: %s", delay, self.error)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+        self.error = None
+        self.ready = True
+        self.report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.report["completed_at"] = datetime.utcnow().isoformat()
+        logger.info("Warm-up complete: %s", self.report)
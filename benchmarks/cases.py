@@ -0,0 +1,122 @@
+# cases.py
+"""Benchmark cases: one service-level operation each, run with a fresh session like a request."""
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict
+
+from app.core.database import DatabaseProvider
+from app.services.cache_service import CacheService
+from app.services.driver_service import DriverService
+from app.services.gamification_service import GamificationService
+from app.services.sos_service import SOSService
+from app.services.trip_service import TripService
+from app.services.vehicle_service import VehicleService
+
+
+@dataclass
+class BenchContext:
+    db_provider: DatabaseProvider
+    cache_service: CacheService
+    dataset: dict
+    rng: random.Random
+
+    def session(self):
+        return self.db_provider.get_session_factory()()
+
+    def driver_id(self) -> int:
+        return self.rng.randint(1, self.dataset["drivers"])
+
+    def vehicle_id(self) -> int:
+        return self.rng.randint(1, self.dataset["vehicles"])
+
+
+Case = Callable[[BenchContext], Awaitable[None]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+    return register
+
+
+@case("create_trip")
+async def create_trip(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await TripService(session).create_trip(
+            driver_id=ctx.driver_id(),
+            vehicle_id=ctx.vehicle_id(),
+            distance_km=ctx.rng.uniform(5, 120),
+            avg_speed=ctx.rng.uniform(30, 100),
+            harsh_events=ctx.rng.randint(0, 5),
+            eco_score=ctx.rng.uniform(50, 100),
+            safety_score=ctx.rng.uniform(50, 100),
+            trip_duration_sec=ctx.rng.randint(600, 7800),
+            max_speed=ctx.rng.uniform(60, 150),
+        )
+
+
+@case("create_sos")
+async def create_sos(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await SOSService(session).create_sos(
+            driver_id=ctx.driver_id(),
+            vehicle_id=ctx.vehicle_id(),
+            latitude=ctx.rng.uniform(44, 48),
+            longitude=ctx.rng.uniform(21, 28),
+            severity="moderate",
+            anomaly_score=ctx.rng.random(),
+            signature_valid=True,
+        )
+
+
+@case("leaderboard_7d")
+async def leaderboard_7d(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await GamificationService(session).get_leaderboard(days=7, limit=10)
+
+
+@case("leaderboard_90d")
+async def leaderboard_90d(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await GamificationService(session).get_leaderboard(days=90, limit=100)
+
+
+@case("list_drivers")
+async def list_drivers(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await DriverService(session).get_all_drivers()
+
+
+@case("list_vehicles")
+async def list_vehicles(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await VehicleService(session).get_all_vehicles()
+
+
+@case("list_trips")
+async def list_trips(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await TripService(session).get_all_trips()
+
+
+@case("list_trips_fields")
+async def list_trips_fields(ctx: BenchContext) -> None:
+    # The dashboard projection of /trips/?fields=...
+    async with ctx.session() as session:
+        await TripService(session).get_all_trips(fields=["trip_id", "driver_id", "eco_score"])
+
+
+@case("list_unresolved_sos")
+async def list_unresolved_sos(ctx: BenchContext) -> None:
+    async with ctx.session() as session:
+        await SOSService(session).get_all_unresolved()
+
+
+@case("cache_hit")
+async def cache_hit(ctx: BenchContext) -> None:
+    # Primed once by the runner; every iteration should be a Redis hit
+    cached = await ctx.cache_service.get_templates_cache("bench:templates")
+    if cached is None:
+        raise RuntimeError("cache_hit missed; is Redis reachable?")
@@ -0,0 +1,24 @@
+# dataset.py
+"""Benchmark datasets, produced by the synthetic generator behind app.seed_db."""
+from app.data import synthetic
+from app.seed_db import generate
+
+
+async def seed(trips: int, seed: int = 42) -> dict:
+    """
+    Reseed the benchmark database with a dataset scaled by the number of trips.
+
+    Drivers scale at 1 per 20 trips and SOS events at 1 per 50 trips over the
+    last 90 days; gamification streaks follow from the generated trips.
+    """
+    start, end = synthetic.default_range(90)
+    spec = synthetic.DatasetSpec(
+        drivers=max(trips // 20, 10),
+        trips=trips,
+        sos=max(trips // 50, 10),
+        start=start,
+        end=end,
+        seed=seed,
+    )
+    await generate(spec, truncate=True)
+    return {"drivers": spec.drivers, "vehicles": spec.vehicles, "trips": spec.trips, "sos": spec.sos}
@@ -0,0 +1,82 @@
+# environment.py
+"""
+Database/Redis environment for the benchmark suite.
+
+The suite truncates and reseeds its database, so it never runs against the
+application database. Either BENCH_POSTGRES_DB names a throwaway database on
+the Postgres configured through the usual POSTGRES_* / REDIS_URL variables
+(e.g. the docker compose stack), or --containers starts disposable
+postgres:15 and redis:7 containers via testcontainers.
+"""
+import os
+import pathlib
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _use_database(host: str, port: str, user: str, password: str, database: str) -> None:
+    os.environ.update(
+        POSTGRES_HOST=host,
+        POSTGRES_PORT=str(port),
+        POSTGRES_USER=user,
+        POSTGRES_PASSWORD=password,
+        POSTGRES_DB=database,
+    )
+
+
+@contextmanager
+def containers():
+    """Start throwaway Postgres/Redis containers and point the app's env vars at them."""
+    try:
+        from testcontainers.postgres import PostgresContainer
+        from testcontainers.redis import RedisContainer
+    except ImportError as e:
+        raise SystemExit("--containers needs `pip install testcontainers[postgres,redis]`") from e
+
+    with PostgresContainer("postgres:15") as pg, RedisContainer("redis:7") as redis:
+        _use_database(
+            pg.get_container_host_ip(),
+            pg.get_exposed_port(5432),
+            pg.username,
+            pg.password,
+            pg.dbname,
+        )
+        os.environ["REDIS_URL"] = (
+            f"redis://{redis.get_container_host_ip()}:{redis.get_exposed_port(6379)}/0"
+        )
+        yield
+
+
+def throwaway_database(variable: str = "BENCH_POSTGRES_DB") -> str:
+    """
+    The database named by `variable`; refuses to go on without one, or when
+    it is the application's own POSTGRES_DB, since it is about to be truncated.
+    """
+    database = os.environ.get(variable, "").strip()
+    app_database = os.environ.get("POSTGRES_DB", "appdb")
+    if not database:
+        raise SystemExit(
+            f"Refusing to run against the application database: set {variable} to a throwaway "
+            "database (it is truncated and reseeded) or pass --containers"
+        )
+    if database == app_database:
+        raise SystemExit(f"{variable}={database} is the application's POSTGRES_DB; use a throwaway database")
+    return database
+
+
+@contextmanager
+def local():
+    """Use the configured Postgres/Redis with the throwaway database named by BENCH_POSTGRES_DB."""
+    os.environ["POSTGRES_DB"] = throwaway_database()
+    yield
+
+
+def migrate() -> None:
+    """Bring the benchmark database to the latest schema (must run outside an event loop)."""
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    command.upgrade(config, "head")
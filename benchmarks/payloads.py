@@ -0,0 +1,121 @@
+# payloads.py
+"""
+Payload size and latency of the list endpoints through the full ASGI app.
+
+    python -m benchmarks.payloads --size 10000 --output payloads.json
+    python -m benchmarks.payloads --containers --iterations 100
+
+Each list endpoint is requested whole and with a `?fields=` projection,
+uncompressed and with gzip and brotli, and the bytes on the wire and p50/p99
+latency are reported with the saving against the uncompressed full response.
+Needs the same database/Redis setup as benchmarks.run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+from benchmarks import environment
+from benchmarks.run import percentile
+
+ENDPOINTS = {
+    "/drivers/": "driver_id,name",
+    "/vehicles/": "vehicle_id,make,model",
+    "/trips/": "trip_id,driver_id,eco_score",
+    "/sos/unresolved": "sos_id,driver_id,severity",
+}
+ENCODINGS = ("identity", "gzip", "br")
+
+
+async def run_payloads(args) -> List[dict]:
+    # Requests all come from one client; keep the rate limiter out of the measurement
+    os.environ.setdefault("RATE_LIMITS", "interactive.all=1000000:1000000,interactive.ip=1000000:1000000")
+    import httpx
+
+    from app.core.caching import close_async_redis_client
+    from app.core.compression import brotli
+    from app.core.database import get_db_provider
+    from app.main import app
+    from benchmarks import dataset
+
+    encodings = [e for e in ENCODINGS if e != "br" or brotli is not None]
+    if len(encodings) < len(ENCODINGS):
+        print("brotli is not installed; measuring gzip only", flush=True)
+
+    print(f"== seeding {args.size} trips", flush=True)
+    await dataset.seed(args.size, args.seed)
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path, fields in ENDPOINTS.items():
+                baseline_bytes = None
+                for projection in (None, fields):
+                    for encoding in encodings:
+                        params = {"fields": projection} if projection else {}
+                        headers = {"Accept-Encoding": encoding}
+                        latencies, wire_bytes = [], 0
+                        for i in range(args.warmup + args.iterations):
+                            started = time.perf_counter()
+                            async with client.stream("GET", path, params=params, headers=headers) as response:
+                                response.raise_for_status()
+                                # Raw bytes: what went over the wire, before httpx decodes them
+                                raw = b"".join([chunk async for chunk in response.aiter_raw()])
+                            elapsed = time.perf_counter() - started
+                            if i >= args.warmup:
+                                latencies.append(elapsed)
+                                wire_bytes = len(raw)
+                        if baseline_bytes is None:
+                            baseline_bytes = wire_bytes
+                        result = {
+                            "path": path,
+                            "fields": projection,
+                            "encoding": encoding,
+                            "bytes": wire_bytes,
+                            "saving": round(1 - wire_bytes / baseline_bytes, 3) if baseline_bytes else 0.0,
+                            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+                        }
+                        results.append(result)
+                        print(
+                            f"{path:<16} {'fields' if projection else 'full':<6} {encoding:<8} "
+                            f"{wire_bytes:>9} B {result['saving']:>+7.1%} "
+                            f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms",
+                            flush=True,
+                        )
+    finally:
+        await close_async_redis_client()
+        await get_db_provider().close()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="List endpoint payload benchmark")
+    parser.add_argument("--size", type=int, default=10000, help="dataset size (number of trips)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--containers", action="store_true",
+                        help="run against throwaway testcontainers Postgres/Redis")
+    parser.add_argument("--output", help="write results JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with (environment.containers() if args.containers else environment.local()):
+        environment.migrate()
+        results = asyncio.run(run_payloads(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "iterations": args.iterations, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
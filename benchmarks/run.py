@@ -0,0 +1,191 @@
+# run.py
+"""
+Service-level benchmark runner.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.run --compare benchmarks/baselines/main.json
+    python -m benchmarks.run --containers --save-baseline benchmarks/baselines/main.json
+
+Each case is run at every dataset size; results are written as JSON
+(ops/sec, p50/p99/mean latency). --compare exits non-zero when a case
+regresses by more than --threshold against the stored baseline.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from benchmarks import environment
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted sample list."""
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(case: str, size: int, latencies: List[float], wall_seconds: float) -> dict:
+    return {
+        "case": case,
+        "size": size,
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / wall_seconds, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+async def measure(op, ctx, iterations: int, concurrency: int) -> tuple:
+    """Run `iterations` calls of op spread over `concurrency` workers; returns (latencies, wall seconds)."""
+    latencies: List[float] = []
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            await op(ctx)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def run_suite(args) -> List[dict]:
+    # Imported here so the app reads the env vars set up by the environment
+    from app.core.caching import close_async_redis_client
+    from app.core.database import DatabaseProvider
+    from app.services.cache_service import CacheService
+    from benchmarks import dataset
+    from benchmarks.cases import CASES, BenchContext
+
+    selected = args.cases.split(",") if args.cases else list(CASES)
+    unknown = set(selected) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+    db_provider = DatabaseProvider()
+    cache_service = CacheService()
+    results = []
+    try:
+        for size in args.sizes:
+            print(f"== seeding {size} trips", flush=True)
+            sizes = await dataset.seed(size, args.seed)
+            await cache_service.set_templates_cache(
+                "bench:templates",
+                [{"id": i, "title": f"t{i}", "status": "PUBLISHED", "created_at": "2025-01-01"} for i in range(50)],
+                ttl=3600,
+            )
+            for name in selected:
+                ctx = BenchContext(db_provider, cache_service, sizes, random.Random(args.seed))
+                await measure(CASES[name], ctx, args.warmup, args.concurrency)
+                latencies, wall = await measure(CASES[name], ctx, args.iterations, args.concurrency)
+                result = summarize(name, size, latencies, wall)
+                results.append(result)
+                print(
+                    f"{name:<22} size={size:<8} {result['ops_per_sec']:>10.1f} ops/s "
+                    f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms",
+                    flush=True,
+                )
+    finally:
+        await cache_service.invalidate_cache("bench:templates")
+        await close_async_redis_client()
+        await db_provider.close()
+    return results
+
+
+def compare(results: List[dict], baseline: dict, threshold: float) -> List[str]:
+    """Regressions of ops/sec or p99 beyond `threshold` (fractional) versus the baseline."""
+    previous: Dict[tuple, dict] = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'case':<22} {'size':>8} {'ops/s':>10} {'Δops/s':>8} {'p99 ms':>9} {'Δp99':>8}")
+    for result in results:
+        base = previous.get((result["case"], result["size"]))
+        if base is None:
+            print(f"{result['case']:<22} {result['size']:>8} {result['ops_per_sec']:>10.1f} {'new':>8}")
+            continue
+        throughput_delta = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        p99_delta = result["p99_ms"] / base["p99_ms"] - 1 if base["p99_ms"] else 0.0
+        print(
+            f"{result['case']:<22} {result['size']:>8} {result['ops_per_sec']:>10.1f} "
+            f"{throughput_delta:>+8.1%} {result['p99_ms']:>9.2f} {p99_delta:>+8.1%}"
+        )
+        if throughput_delta < -threshold:
+            regressions.append(f"{result['case']}@{result['size']}: ops/sec {throughput_delta:+.1%}")
+        if p99_delta > threshold:
+            regressions.append(f"{result['case']}@{result['size']}: p99 {p99_delta:+.1%}")
+    return regressions
+
+
+def _git_sha() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=environment.ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service-level benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        type=lambda s: [int(x) for x in s.split(",")],
+                        help="comma-separated dataset sizes (number of trips)")
+    parser.add_argument("--cases", default=None, help="comma-separated case names (default: all)")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--containers", action="store_true",
+                        help="run against throwaway testcontainers Postgres/Redis")
+    parser.add_argument("--output", help="write results JSON to this path")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed fractional regression before --compare fails")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with (environment.containers() if args.containers else environment.local()):
+        environment.migrate()
+        results = asyncio.run(run_suite(args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_sha": _git_sha(),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
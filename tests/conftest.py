@@ -0,0 +1,48 @@
+"""
+Integration tests run against a real Postgres (and Redis / MailHog where a
+test needs them), never the application database:
+
+    TEST_POSTGRES_DB=appdb_test pytest        # throwaway database on the configured server
+    TEST_CONTAINERS=1 pytest                  # disposable testcontainers Postgres/Redis
+
+Without either, database tests are skipped.
+"""
+import asyncio
+import os
+from contextlib import ExitStack
+from datetime import timedelta
+
+import pytest
+
+from benchmarks import environment
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Migrated and seeded throwaway database; the app's POSTGRES_* point at it."""
+    with ExitStack() as stack:
+        if os.environ.get("TEST_CONTAINERS"):
+            stack.enter_context(environment.containers())
+        elif os.environ.get("TEST_POSTGRES_DB"):
+            try:
+                os.environ["POSTGRES_DB"] = environment.throwaway_database("TEST_POSTGRES_DB")
+            except SystemExit as e:
+                pytest.exit(str(e), returncode=2)
+        else:
+            pytest.skip("set TEST_POSTGRES_DB or TEST_CONTAINERS=1 to run database tests")
+        environment.migrate()
+
+        from app.data import synthetic
+        from app.seed_db import generate
+
+        start, end = synthetic.default_range(30)
+        spec = synthetic.DatasetSpec(drivers=200, trips=20_000, sos=500, start=start, end=end, seed=7)
+        asyncio.run(generate(spec, truncate=True))
+        yield {"start": start, "end": end + timedelta(days=1)}
+
+
+@pytest.fixture
+def dsn(database) -> str:
+    """asyncpg DSN of the test database."""
+    from app.core.database import build_async_db_url
+    return build_async_db_url().replace("postgresql+asyncpg://", "postgresql://")
@@ -0,0 +1,59 @@
+"""The fact/dimension indexes are the ones the planner picks for the hot queries."""
+import json
+
+import asyncpg
+import pytest
+
+# Partition indexes are attached to the parent index; report that name instead
+PARENT_INDEX_SQL = """
+SELECT c.relname AS name,
+       coalesce((SELECT p.relname FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhparent
+                 WHERE i.inhrelid = c.oid), c.relname) AS parent
+FROM pg_class c
+WHERE c.relname = ANY($1::text[])
+"""
+
+QUERIES = {
+    "ix_fact_trip_driver_history": (
+        "SELECT trip_id, event_ts, distance_km, eco_score FROM fact_trip "
+        "WHERE driver_id = $1 ORDER BY event_ts DESC LIMIT 20",
+        (1,),
+    ),
+    "ix_fact_trip_event_ts": ("SELECT * FROM fact_trip ORDER BY event_ts DESC LIMIT 100", ()),
+    "ix_fact_sos_unresolved": ("SELECT sos_id, time_id FROM fact_sos WHERE resolved = false", ()),
+    "ix_fact_sos_driver_id": ("SELECT * FROM fact_sos WHERE driver_id = $1", (1,)),
+    "uq_dim_time_date_value_hour": (
+        "SELECT time_id FROM dim_time WHERE date_value = current_date AND hour = $1",
+        (0,),
+    ),
+    "ix_fact_gamification_leaderboard": (
+        "SELECT driver_id, sum(score_change) FROM fact_gamification "
+        "WHERE event_ts >= now() - interval '7 days' GROUP BY driver_id",
+        (),
+    ),
+    "ix_dim_contact_driver_id": ("SELECT * FROM dim_contact WHERE driver_id = $1", (1,)),
+}
+
+
+def _index_names(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index", sorted(QUERIES))
+async def test_query_uses_index(dsn, index):
+    sql, args = QUERIES[index]
+    conn = await asyncpg.connect(dsn)
+    try:
+        # The test dataset is small enough that a sequential scan would win on cost alone
+        await conn.execute("SET enable_seqscan = off")
+        explain = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+        plan = json.loads(explain)[0]["Plan"]
+        used = _index_names(plan)
+        parents = {row["parent"] for row in await conn.fetch(PARENT_INDEX_SQL, list(used))}
+    finally:
+        await conn.close()
+    assert index in parents | used, f"{index} not used; plan used {sorted(used)}"
@@ -0,0 +1,46 @@
+"""Nightly partition maintenance works on the migrated schema, DEFAULT partition included."""
+from datetime import date, datetime
+
+import asyncpg
+import pytest
+
+from app.core.database import DatabaseProvider
+from app.services.partition_service import PartitionService, _add_months
+
+# Far enough back that no seeded data lives there, so detaching it is harmless
+OLD_MONTH = date(2001, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_run_maintenance(dsn):
+    this_month = datetime.utcnow().date().replace(day=1)
+    future_month = _add_months(this_month, 8)
+    future_partition = f"fact_trip_y{future_month:%Y}m{future_month:%m}"
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("SELECT ensure_monthly_partition('fact_trip', 'fact_trip', $1)", OLD_MONTH)
+        # A client timestamp beyond the premade months lands in the DEFAULT partition
+        trip_id = await conn.fetchval(
+            "INSERT INTO fact_trip (driver_id, vehicle_id, time_id, event_ts) "
+            "SELECT driver_id, vehicle_id, time_id, $1 FROM fact_trip LIMIT 1 RETURNING trip_id",
+            datetime.combine(future_month.replace(day=15), datetime.min.time()),
+        )
+        assert await conn.fetchval(
+            "SELECT tableoid::regclass::text FROM fact_trip WHERE trip_id = $1", trip_id,
+        ) == "fact_trip_default"
+
+        db_provider = DatabaseProvider()
+        try:
+            result = await PartitionService(db_provider, premake_months=9, retain_months=24).run_maintenance()
+        finally:
+            await db_provider.close()
+
+        location = await conn.fetchval("SELECT tableoid::regclass::text FROM fact_trip WHERE trip_id = $1", trip_id)
+        await conn.execute("DROP TABLE IF EXISTS fact_trip_y2001m01")
+    finally:
+        await conn.close()
+
+    assert future_partition in result["created"]
+    assert location == future_partition
+    assert "fact_trip_y2001m01" in result["detached"]
@@ -0,0 +1,63 @@
+"""SOS contact emails reach the SMTP server and the delivery log records them as sent."""
+import os
+import uuid
+
+import asyncpg
+import httpx
+import pytest
+
+from app.core.database import DatabaseProvider
+from app.core.mailer import SMTPPool
+from app.services.sos_notification_service import SOSNotifier
+
+MAILHOG_API_URL = os.environ.get("MAILHOG_API_URL", "http://localhost:8025")
+
+
+@pytest.fixture
+def mailhog(database) -> str:
+    """MailHog's HTTP API; skips when it is not running."""
+    try:
+        httpx.get(f"{MAILHOG_API_URL}/api/v2/messages", params={"limit": 1}, timeout=2).raise_for_status()
+    except httpx.HTTPError:
+        pytest.skip(f"MailHog not reachable at {MAILHOG_API_URL} (set MAILHOG_API_URL)")
+    return MAILHOG_API_URL
+
+
+@pytest.mark.asyncio
+async def test_sos_email_delivered(dsn, mailhog):
+    email = f"sos-{uuid.uuid4().hex}@contacts.test"
+    conn = await asyncpg.connect(dsn)
+    try:
+        sos_id = await conn.fetchval("SELECT sos_id FROM fact_sos ORDER BY sos_id LIMIT 1")
+        # No FK on contact_id; a unique address makes the message easy to find
+        notification_id = await conn.fetchval(
+            "INSERT INTO sos_notification (sos_id, contact_id, email, status, attempts, created_at) "
+            "VALUES ($1, 0, $2, 'pending', 0, now() AT TIME ZONE 'utc') RETURNING notification_id",
+            sos_id, email,
+        )
+
+        db_provider = DatabaseProvider()
+        smtp = SMTPPool(host=os.environ.get("SMTP_HOST") or "localhost")
+        try:
+            delivered = await SOSNotifier(db_provider, smtp, max_attempts=1).deliver_sos(sos_id)
+        finally:
+            await smtp.close()
+            await db_provider.close()
+
+        row = await conn.fetchrow(
+            "SELECT status, attempts, sent_at FROM sos_notification WHERE notification_id = $1", notification_id,
+        )
+    finally:
+        await conn.close()
+
+    assert delivered >= 1
+    assert row["status"] == "sent"
+    assert row["attempts"] == 1
+    assert row["sent_at"] is not None
+
+    async with httpx.AsyncClient(base_url=mailhog) as client:
+        response = await client.get("/api/v2/search", params={"kind": "to", "query": email})
+    response.raise_for_status()
+    messages = response.json()["items"]
+    assert len(messages) == 1
+    assert messages[0]["Content"]["Headers"]["Subject"][0].startswith("SOS alert from ")